@@ -0,0 +1,192 @@
+#  ScratchToCatrobat: A tool for converting Scratch projects into Catrobat programs.
+#  Copyright (C) 2013-2017 The Catrobat Team
+#  (http://developer.catrobat.org/credits)
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Affero General Public License as
+#  published by the Free Software Foundation, either version 3 of the
+#  License, or (at your option) any later version.
+#
+#  An additional term exception under section 7 of the GNU Affero
+#  General Public License, version 3, is available at
+#  http://developer.catrobat.org/license_additional_term
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU Affero General Public License for more details.
+#
+#  You should have received a copy of the GNU Affero General Public License
+#  along with this program.  If not, see http://www.gnu.org/licenses/.
+
+"""
+  Batch conversion mode.
+  Converts a whole set of Scratch projects (either all .sb2/.sb3 files of a directory or
+  all URLs/IDs listed in a manifest file) inside one single Jython interpreter by using
+  a pool of worker threads. One .catrobat file is written per input and a summary JSON
+  file reports the status and timings of each project.
+"""
+
+import json
+import os
+import Queue
+import threading
+import time
+
+from scratchtocatrobat.tools import helpers
+from scratchtocatrobat.tools import logger
+
+log = logger.log
+
+PROJECT_FILE_EXTENSIONS = (".sb2", ".sb3", ".zip")
+MANIFEST_COMMENT_PREFIX = "#"
+SUMMARY_FILE_NAME = "batch_summary.json"
+MAX_CONCURRENT_CONVERSIONS = int(helpers.config.get("BATCH", "max_concurrent_conversions"))
+
+
+class BatchStatus(object):
+    SUCCESS = "success"
+    FAILURE = "failure"
+
+
+class BatchItem(object):
+
+    def __init__(self, source, archive_name):
+        self.source = source
+        self.archive_name = archive_name
+        self.status = None
+        self.exit_code = None
+        self.output_path = None
+        self.duration = None
+
+    def as_dict(self):
+        return {
+            "source": self.source,
+            "archiveName": self.archive_name,
+            "status": self.status,
+            "exitCode": self.exit_code,
+            "outputPath": self.output_path,
+            "durationSeconds": self.duration
+        }
+
+
+def _item_from_manifest_entry(entry):
+    if entry.isdigit():
+        project_url = helpers.config.get("SCRATCH_API", "project_base_url") + entry
+        return BatchItem(project_url, entry)
+    if os.path.isfile(entry):
+        return BatchItem(entry, os.path.splitext(os.path.basename(entry))[0])
+    from scratchtocatrobat.scratch import scratchwebapi
+    project_url = entry.replace("http://", "https://")
+    return BatchItem(project_url, scratchwebapi.extract_project_id_from_url(project_url))
+
+
+def collect_batch_items(batch_input):
+    if os.path.isdir(batch_input):
+        file_names = sorted(file_name for file_name in os.listdir(batch_input)
+                            if file_name.lower().endswith(PROJECT_FILE_EXTENSIONS))
+        return [BatchItem(os.path.join(batch_input, file_name), os.path.splitext(file_name)[0])
+                for file_name in file_names]
+
+    if not os.path.isfile(batch_input):
+        raise EnvironmentError("Batch input must be a directory or a manifest file, but is %s" % batch_input)
+
+    items = []
+    with open(batch_input, "r") as manifest_file:
+        for line in manifest_file:
+            entry = line.strip()
+            if len(entry) == 0 or entry.startswith(MANIFEST_COMMENT_PREFIX):
+                continue
+            items.append(_item_from_manifest_entry(entry))
+    return items
+
+
+class _BatchWorker(threading.Thread):
+
+    def __init__(self, *args, **kwargs):
+        threading.Thread.__init__(self, *args, **kwargs)
+        self.daemon = True
+
+    def run(self):
+        run_converter = self._kwargs["run_converter"]
+        item_queue = self._kwargs["item_queue"]
+        output_dir = self._kwargs["output_dir"]
+        temp_rm = self._kwargs["temp_rm"]
+        while True:
+            try:
+                item = item_queue.get_nowait()
+            except Queue.Empty:
+                return
+
+            log.info("[BATCH] Converting %s", item.source)
+            start_time = time.time()
+            try:
+                # web-mode without output stream: suppresses the interactive progress bar
+                # which would garble the console output of parallel conversions
+                item.exit_code = run_converter(item.source, output_dir, temp_rm=temp_rm,
+                                               archive_name=item.archive_name,
+                                               web_mode=True, output_stream=None)
+            except Exception as e:
+                log.exception(e)
+                item.exit_code = helpers.ExitCode.FAILURE
+            item.duration = round(time.time() - start_time, 3)
+
+            if item.exit_code == helpers.ExitCode.SUCCESS:
+                from scratchtocatrobat.converter import converter
+                item.status = BatchStatus.SUCCESS
+                item.output_path = converter.ConvertedProject._converted_output_path(output_dir, item.archive_name)
+            else:
+                item.status = BatchStatus.FAILURE
+            log.info("[BATCH] Finished %s (%s, %.3fs)", item.source, item.status, item.duration)
+
+
+def write_summary(items, summary_path, num_workers, duration):
+    num_succeeded = len([item for item in items if item.status == BatchStatus.SUCCESS])
+    summary = {
+        "numProjects": len(items),
+        "numSucceeded": num_succeeded,
+        "numFailed": len(items) - num_succeeded,
+        "numWorkers": num_workers,
+        "durationSeconds": duration,
+        "projects": [item.as_dict() for item in items]
+    }
+    with open(summary_path, "w") as summary_file:
+        json.dump(summary, summary_file, sort_keys=True, indent=4, separators=(',', ': '))
+    return summary
+
+
+def run_batch(run_converter, batch_input, output_dir, num_workers=MAX_CONCURRENT_CONVERSIONS,
+              summary_path=None, temp_rm=True):
+    if not os.path.isdir(output_dir):
+        log.error("Output folder must be a directory, but is %s", output_dir)
+        return helpers.ExitCode.FAILURE
+    try:
+        items = collect_batch_items(batch_input)
+    except EnvironmentError as e:
+        log.error(e)
+        return helpers.ExitCode.FAILURE
+
+    summary_path = summary_path or os.path.join(output_dir, SUMMARY_FILE_NAME)
+    num_workers = max(1, min(num_workers, len(items)))
+    log.info("[BATCH] Converting %d projects using %d workers", len(items), num_workers)
+
+    item_queue = Queue.Queue()
+    for item in items:
+        item_queue.put(item)
+
+    start_time = time.time()
+    workers = [_BatchWorker(kwargs={
+        "run_converter": run_converter,
+        "item_queue": item_queue,
+        "output_dir": output_dir,
+        "temp_rm": temp_rm
+    }) for _ in range(num_workers)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    summary = write_summary(items, summary_path, num_workers, round(time.time() - start_time, 3))
+    log.info("[BATCH] %d of %d projects converted successfully, summary written to %s",
+             summary["numSucceeded"], summary["numProjects"], summary_path)
+    return helpers.ExitCode.SUCCESS if summary["numFailed"] == 0 else helpers.ExitCode.FAILURE
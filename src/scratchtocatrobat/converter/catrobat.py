@@ -20,7 +20,11 @@
 #  along with this program.  If not, see http://www.gnu.org/licenses/.
 import itertools
 import numbers
+import threading
 import java
+from java.io import BufferedWriter, OutputStreamWriter
+from java.util import HashMap, LinkedHashMap
+from com.thoughtworks.xstream.converters.collections import MapConverter
 
 from scratchtocatrobat.tools import common
 
@@ -28,6 +32,7 @@ import org.catrobat.catroid.common as catcommon
 import org.catrobat.catroid.content as catbase
 import org.catrobat.catroid.content.bricks as catbricks
 import org.catrobat.catroid.formulaeditor as catformula
+import org.catrobat.catroid.io as catio
 
 # FIXME: consider localization
 _BACKGROUND_SPRITE_NAME = "Hintergrund"
@@ -38,6 +43,51 @@ PACKAGED_PROGRAM_FILE_EXTENSION = catcommon.Constants.CATROBAT_EXTENSION
 PROGRAM_SOURCE_FILE_NAME = catcommon.Constants.CODE_XML_FILE_NAME
 
 _log = common.log
+_HASH_MAP_CLASS = HashMap().getClass()
+_xstream_serializer_lock = threading.Lock()
+_is_xstream_serializer_prepared = False
+
+
+class _SpriteOrderedMapConverter(MapConverter):
+    '''
+    The DataContainer stores the variables and lists of each sprite in HashMaps keyed by sprite
+    objects, i.e. ordered by identity hash code. This converter writes such maps ordered by sprite
+    name instead, so that the same program is always serialized to exactly the same XML.
+    '''
+
+    def canConvert(self, type_):
+        return type_ == _HASH_MAP_CLASS
+
+    def marshal(self, source, writer, context):
+        keys = list(source.keySet())
+        if len(keys) > 1 and all(isinstance(key, catbase.Sprite) for key in keys):
+            ordered_source = LinkedHashMap()
+            for key in sorted(keys, key=lambda sprite: sprite.getName()):
+                ordered_source.put(key, source.get(key))
+            source = ordered_source
+        MapConverter.marshal(self, source, writer, context)
+
+
+def xstream_serializer():
+    global _is_xstream_serializer_prepared
+    serializer = catio.XstreamSerializer.getInstance()
+    with _xstream_serializer_lock:
+        if not _is_xstream_serializer_prepared:
+            serializer.xstream.registerConverter(_SpriteOrderedMapConverter(serializer.xstream.getMapper()))
+            _is_xstream_serializer_prepared = True
+    return serializer
+
+
+def write_program_source_to(catrobat_program, output_stream):
+    '''
+    Serializes the program as UTF-8 encoded code.xml into the given Java output stream, piece by
+    piece. The XML never exists as a whole in memory. The stream is flushed, but not closed.
+    '''
+    serializer = xstream_serializer()
+    writer = BufferedWriter(OutputStreamWriter(output_stream, "UTF-8"))
+    writer.write(serializer.XML_HEADER)
+    serializer.xstream.toXML(catrobat_program, writer)
+    writer.flush()
 
 
 def simple_name_for(brick):
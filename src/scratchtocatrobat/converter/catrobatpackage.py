@@ -0,0 +1,277 @@
+#  ScratchToCatrobat: A tool for converting Scratch projects into Catrobat programs.
+#  Copyright (C) 2013-2017 The Catrobat Team
+#  (http://developer.catrobat.org/credits)
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Affero General Public License as
+#  published by the Free Software Foundation, either version 3 of the
+#  License, or (at your option) any later version.
+#
+#  An additional term exception under section 7 of the GNU Affero
+#  General Public License, version 3, is available at
+#  http://developer.catrobat.org/license_additional_term
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU Affero General Public License for more details.
+#
+#  You should have received a copy of the GNU Affero General Public License
+#  along with this program.  If not, see http://www.gnu.org/licenses/.
+
+"""
+  Writers for converted Catrobat programs.
+  The PackageWriter puts the program source and all media files straight into the .catrobat
+  archive while they are produced, the DirectoryWriter stores them as Catrobat directory
+  structure. Entries are named by their path inside the program, e.g. "Scene 1/images/a.png".
+  With more than one compression thread, the PackageWriter deflates the files concurrently
+  and still writes the entries in the order in which they were added.
+"""
+
+import os
+import Queue
+import shutil
+import sys
+import threading
+import time
+import zipfile
+import zlib
+
+from java.io import BufferedOutputStream, ByteArrayOutputStream, FileOutputStream
+from java.util.zip import CRC32, CheckedOutputStream, Deflater, DeflaterOutputStream
+
+from scratchtocatrobat.tools import common
+from scratchtocatrobat.tools import helpers
+from scratchtocatrobat.tools import stats
+
+from scratchtocatrobat.converter import catrobat
+
+STORE_COMPRESSED_MEDIA = str(helpers.catrobat_info("store_compressed_media")) in {"True", "1"}
+COMPRESSION_LEVEL = int(helpers.catrobat_info("compression_level"))
+MAX_CONCURRENT_THREADS = int(helpers.catrobat_info("max_concurrent_compression_threads"))
+# read but not yet written files per compression thread -> bounds the memory held by pending entries
+MAX_PENDING_ENTRIES_PER_THREAD = 2
+_DEFLATE_CHUNK_SIZE_IN_BYTES = 64 * 1024
+# earliest date a zip entry can have -> packages of the same program are byte-identical
+FIXED_ENTRY_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+# deflating these again hardly saves any bytes
+_COMPRESSED_MEDIA_FILE_EXTENSIONS = {".gif", ".jpeg", ".jpg", ".mp3", ".png"}
+
+
+def _zip_info_for(entry_name, compress_type, date_time=None):
+    if date_time is None:
+        date_time = time.localtime(time.time())[:6]
+    zip_info = zipfile.ZipInfo(entry_name, date_time)
+    zip_info.compress_type = compress_type
+    zip_info.external_attr = 0600 << 16
+    return zip_info
+
+
+def write_file_with_fixed_date_time(zip_file, file_path, entry_name):
+    # like ZipFile.write(), but modification time and permissions of the file are not stored
+    entry_name = os.path.normpath(entry_name).lstrip(os.sep)
+    with open(file_path, "rb") as fp:
+        zip_file.writestr(_zip_info_for(entry_name, zip_file.compression, FIXED_ENTRY_DATE_TIME), fp.read())
+
+
+def _deflated(data, compression_level):
+    compressor = zlib.compressobj(compression_level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    deflated_chunks = [compressor.compress(data[offset:offset + _DEFLATE_CHUNK_SIZE_IN_BYTES])
+                       for offset in xrange(0, len(data), _DEFLATE_CHUNK_SIZE_IN_BYTES)]
+    return "".join(deflated_chunks) + compressor.flush()
+
+
+class _PendingEntry(object):
+
+    def __init__(self, entry_name, data, compression_level):
+        self.entry_name = entry_name
+        self.data = data
+        self.compression_level = compression_level
+        self.deflated_data = None
+        self.crc = None
+        self.exc_info = None
+        self.done = threading.Event()
+
+    def deflate(self):
+        try:
+            self.deflated_data = _deflated(self.data, self.compression_level)
+            self.crc = zlib.crc32(self.data) & 0xffffffff
+        except:
+            self.exc_info = sys.exc_info()
+        finally:
+            self.done.set()
+
+
+class _DeflaterThread(threading.Thread):
+
+    def run(self):
+        entry_queue, conversion_stats = self._kwargs["entry_queue"], self._kwargs["conversion_stats"]
+        with stats.attached(conversion_stats):
+            while True:
+                pending_entry = entry_queue.get()
+                if pending_entry is None:
+                    return
+                pending_entry.deflate()
+
+
+class DirectoryWriter(object):
+
+    def __init__(self, program_dir):
+        self.program_dir = program_dir
+
+    def _path_of(self, entry_name):
+        file_path = os.path.join(self.program_dir, entry_name)
+        common.makedirs(os.path.dirname(file_path))
+        return file_path
+
+    def add_file(self, file_path, entry_name):
+        destination_path = self._path_of(entry_name)
+        shutil.copyfile(file_path, destination_path)
+        stats.increment("packagingBytesWritten", os.path.getsize(destination_path))
+
+    def add_empty_file(self, entry_name):
+        open(self._path_of(entry_name), 'a').close()
+
+    def add_program_source(self, catrobat_program, entry_name):
+        program_source_path = self._path_of(entry_name)
+        output_stream = BufferedOutputStream(FileOutputStream(program_source_path))
+        try:
+            catrobat.write_program_source_to(catrobat_program, output_stream)
+        finally:
+            output_stream.close()
+        stats.increment("programSourceBytes", os.path.getsize(program_source_path))
+        stats.increment("packagingBytesWritten", os.path.getsize(program_source_path))
+
+
+class PackageWriter(object):
+
+    def __init__(self, package_path, store_compressed_media=STORE_COMPRESSED_MEDIA,
+                 compression_level=COMPRESSION_LEVEL, max_concurrent_threads=MAX_CONCURRENT_THREADS):
+        self.package_path = package_path
+        self.store_compressed_media = store_compressed_media
+        self.compression_level = compression_level
+        self.max_concurrent_threads = max(1, max_concurrent_threads)
+        self._zip_file = zipfile.ZipFile(package_path, 'w', zipfile.ZIP_DEFLATED, allowZip64=True)
+        # deflated files are written in the order they were added, all other entries wait for them
+        self._pending_entries = []
+        self._entry_queue = Queue.Queue()
+        self._deflater_threads = []
+        # media files used under the same name by several objects are added more than once
+        self._added_entry_names = set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        is_complete = False
+        try:
+            self.close()
+            is_complete = exc_type is None
+        finally:
+            if not is_complete:
+                # no incomplete packages are left behind
+                os.remove(self.package_path)
+
+    def close(self):
+        if self._zip_file is None:
+            return
+        try:
+            self._write_pending_entries()
+        finally:
+            self._stop_deflater_threads()
+            self._zip_file.close()
+            self._zip_file = None
+        stats.increment("packagingBytesWritten", os.path.getsize(self.package_path))
+
+    def add_file(self, file_path, entry_name):
+        if entry_name in self._added_entry_names:
+            # same name -> same content (the program directory simply gets the file overwritten)
+            return
+        self._added_entry_names.add(entry_name)
+        is_compressed_media = os.path.splitext(entry_name)[1].lower() in _COMPRESSED_MEDIA_FILE_EXTENSIONS
+        if self.store_compressed_media and is_compressed_media:
+            self._write_pending_entries()
+            self._zip_file.write(file_path, entry_name, zipfile.ZIP_STORED)
+            return
+
+        # the file gets read right away, so callers may remove it as soon as it has been added
+        with open(file_path, "rb") as fp:
+            data = fp.read()
+        pending_entry = _PendingEntry(entry_name, data, self.compression_level)
+        if self.max_concurrent_threads == 1:
+            pending_entry.deflate()
+            self._write_pending_entry(pending_entry)
+            return
+
+        self._start_deflater_thread_if_needed()
+        self._pending_entries.append(pending_entry)
+        self._entry_queue.put(pending_entry)
+        while len(self._pending_entries) > self.max_concurrent_threads * MAX_PENDING_ENTRIES_PER_THREAD:
+            self._write_pending_entry(self._pending_entries.pop(0))
+
+    def add_empty_file(self, entry_name):
+        self._write_pending_entries()
+        self._zip_file.writestr(_zip_info_for(entry_name, zipfile.ZIP_STORED), "")
+
+    def add_program_source(self, catrobat_program, entry_name):
+        self._write_pending_entries()
+        # the XML is deflated while it is serialized -> only its compressed form is kept in memory
+        deflater = Deflater(self.compression_level, True)
+        deflated_stream = ByteArrayOutputStream()
+        checked_stream = CheckedOutputStream(DeflaterOutputStream(deflated_stream, deflater), CRC32())
+        try:
+            catrobat.write_program_source_to(catrobat_program, checked_stream)
+            checked_stream.close()
+            file_size = deflater.getBytesRead()
+        finally:
+            deflater.end()
+        stats.increment("programSourceBytes", file_size)
+        self._write_deflated_entry(entry_name, deflated_stream.toByteArray().tostring(),
+                                   checked_stream.getChecksum().getValue(), file_size)
+
+    def _start_deflater_thread_if_needed(self):
+        if len(self._deflater_threads) >= self.max_concurrent_threads:
+            return
+        deflater_thread = _DeflaterThread(kwargs={ "entry_queue": self._entry_queue,
+                                                   "conversion_stats": stats.current() })
+        deflater_thread.daemon = True
+        deflater_thread.start()
+        self._deflater_threads.append(deflater_thread)
+
+    def _stop_deflater_threads(self):
+        for _ in self._deflater_threads:
+            self._entry_queue.put(None)
+        for deflater_thread in self._deflater_threads:
+            deflater_thread.join()
+        self._deflater_threads = []
+
+    def _write_pending_entries(self):
+        while len(self._pending_entries) > 0:
+            self._write_pending_entry(self._pending_entries.pop(0))
+
+    def _write_pending_entry(self, pending_entry):
+        pending_entry.done.wait()
+        if pending_entry.exc_info is not None:
+            exc_type, exc_value, exc_traceback = pending_entry.exc_info
+            raise exc_type, exc_value, exc_traceback
+        self._write_deflated_entry(pending_entry.entry_name, pending_entry.deflated_data,
+                                   pending_entry.crc, len(pending_entry.data))
+
+    def _write_deflated_entry(self, entry_name, deflated_data, crc, file_size):
+        # NOTE: zipfile only writes entries it deflates itself, so the deflated data gets written
+        #       the same way ZipFile.writestr() does it.
+        zip_info = _zip_info_for(entry_name, zipfile.ZIP_DEFLATED)
+        zip_info.file_size = file_size
+        zip_info.compress_size = len(deflated_data)
+        zip_info.CRC = crc
+        zip_info.header_offset = self._zip_file.fp.tell()
+        self._zip_file._writecheck(zip_info)
+        self._zip_file._didModify = True
+        zip64 = zip_info.file_size > zipfile.ZIP64_LIMIT or zip_info.compress_size > zipfile.ZIP64_LIMIT
+        if zip64 and not self._zip_file._allowZip64:
+            raise zipfile.LargeZipFile("Filesize would require ZIP64 extensions")
+        self._zip_file.fp.write(zip_info.FileHeader(zip64))
+        self._zip_file.fp.write(deflated_data)
+        self._zip_file.fp.flush()
+        self._zip_file.filelist.append(zip_info)
+        self._zip_file.NameToInfo[zip_info.filename] = zip_info
@@ -20,33 +20,39 @@
 #  along with this program.  If not, see http://www.gnu.org/licenses/.
 from __future__ import unicode_literals
 
+import contextlib
 import itertools
 import numbers
 import os
-import shutil
+import sys
+import threading
 import types
 import zipfile
 import re
 from codecs import open
-from org.catrobat.catroid import ProjectManager
+from threading import Thread
 import org.catrobat.catroid.common as catcommon
 import org.catrobat.catroid.content as catbase
 from org.catrobat.catroid.ui.fragment import SpriteFactory
 import org.catrobat.catroid.content.bricks as catbricks
 import org.catrobat.catroid.formulaeditor as catformula
 import org.catrobat.catroid.formulaeditor.FormulaElement.ElementType as catElementType
-import org.catrobat.catroid.io as catio
 
 from scratchtocatrobat.tools import common
 from scratchtocatrobat.scratch import scratch
 from scratchtocatrobat.tools import logger
 from scratchtocatrobat.scratch.scratch import JsonKeys as scratchkeys
 from scratchtocatrobat.tools import helpers
+from scratchtocatrobat.tools import stats
 from scratchtocatrobat.tools.helpers import ProgressType
 
 from java.awt import Color
+from java.util import Collections
+from java.util.concurrent import CopyOnWriteArrayList
 
 import catrobat
+import catrobatpackage
+import formulaoptimizer
 import mediaconverter
 
 _DEFAULT_FORMULA_ELEMENT = catformula.FormulaElement(catElementType.NUMBER, str(00001), None)  # @UndefinedVariable (valueOf)
@@ -66,6 +72,11 @@ BACKGROUND_LOCALIZED_GERMAN_NAME = "Hintergrund"
 BACKGROUND_ORIGINAL_NAME = "Stage"
 
 MOUSE_SPRITE_NAME = "_mouse_"
+PARALLEL_SPRITE_CONVERSION = str(helpers.config.get("CONVERTER", "parallel_sprite_conversion")) in {"True", "1"}
+MAX_CONCURRENT_SPRITE_THREADS = int(helpers.config.get("CONVERTER", "max_concurrent_sprite_threads"))
+OPTIMIZE_FORMULAS = str(helpers.config.get("CONVERTER", "optimize_formulas")) in {"True", "1"}
+DIRECT_TO_ZIP_PACKAGING = str(helpers.catrobat_info("direct_to_zip_packaging")) in {"True", "1"}
+DETERMINISTIC_PACKAGING = str(helpers.catrobat_info("deterministic_packaging")) in {"True", "1"}
 MOUSE_SPRITE_FILENAME = "mouse_cursor_dummy.png"
 
 log = logger.log
@@ -540,12 +551,16 @@ def _create_variable_brick(value, user_variable, Class):
 def _variable_for(variable_name):
     return catformula.FormulaElement(catElementType.USER_VARIABLE, variable_name, None)  # @UndefinedVariable
 
+_shared_global_answer_variable_lock = threading.Lock()
+
 def _get_or_create_shared_global_answer_variable(project, data_container):
-    shared_global_answer_user_variable = data_container.findProjectVariable(_SHARED_GLOBAL_ANSWER_VARIABLE_NAME)
-    if shared_global_answer_user_variable is None:
-        assert(_is_generated(_SHARED_GLOBAL_ANSWER_VARIABLE_NAME))
-        catrobat.add_user_variable(project, _SHARED_GLOBAL_ANSWER_VARIABLE_NAME, None, None)
+    # sprites converted concurrently must not add the shared variable twice
+    with _shared_global_answer_variable_lock:
         shared_global_answer_user_variable = data_container.findProjectVariable(_SHARED_GLOBAL_ANSWER_VARIABLE_NAME)
+        if shared_global_answer_user_variable is None:
+            assert(_is_generated(_SHARED_GLOBAL_ANSWER_VARIABLE_NAME))
+            catrobat.add_user_variable(project, _SHARED_GLOBAL_ANSWER_VARIABLE_NAME, None, None)
+            shared_global_answer_user_variable = data_container.findProjectVariable(_SHARED_GLOBAL_ANSWER_VARIABLE_NAME)
 
     assert shared_global_answer_user_variable is not None \
     and shared_global_answer_user_variable.getName() == _SHARED_GLOBAL_ANSWER_VARIABLE_NAME, \
@@ -588,9 +603,36 @@ def _sound_length_variable_name_for(resource_name):
 def _is_generated(variable_name):
     return variable_name.startswith(_GENERATED_VARIABLE_PREFIX)
 
+@contextlib.contextmanager
+def _synchronized_data_of(catrobat_project):
+    # the DataContainer stores its sprite variables and lists in plain HashMaps (and the project
+    # variables in an ArrayList) -> replace them with thread-safe views while sprites are converted concurrently
+    data_container = catrobat_project.getDefaultScene().getDataContainer()
+    sprite_variables = data_container.spriteVariables
+    sprite_lists = data_container.spriteListOfLists
+    user_brick_variables = data_container.userBrickVariables
+    project_variables = catrobat_project.getProjectVariables()
+    data_container.spriteVariables = Collections.synchronizedMap(sprite_variables)
+    data_container.spriteListOfLists = Collections.synchronizedMap(sprite_lists)
+    data_container.userBrickVariables = Collections.synchronizedMap(user_brick_variables)
+    catrobat_project.projectVariables = CopyOnWriteArrayList(project_variables)
+    try:
+        yield
+    finally:
+        # the synchronized maps write through, only the project variables have to be copied back
+        concurrently_modified_project_variables = catrobat_project.projectVariables
+        data_container.spriteVariables = sprite_variables
+        data_container.spriteListOfLists = sprite_lists
+        data_container.userBrickVariables = user_brick_variables
+        catrobat_project.projectVariables = project_variables
+        project_variables.clear()
+        project_variables.addAll(concurrently_modified_project_variables)
+
 class Context(object):
     def __init__(self):
         self._sprite_contexts = []
+        self._reserved_sprites = {}
+        self._lock = threading.RLock()
         self.upcoming_sprites = {}
         self.visible_var_X = VISIBLE_VAR_X_INIT
         self.visible_var_Y = VISIBLE_VAR_Y_INIT
@@ -603,12 +645,40 @@ class Context(object):
     def sprite_contexts(self):
         return self._sprite_contexts
 
+    def reserve_sprites(self, sprite_names):
+        # sprites that are converted concurrently can not find each other in the scene,
+        # therefore their instances are created (or taken over from the upcoming sprites) in advance
+        with self._lock:
+            for sprite_name in sprite_names:
+                sprite = self.upcoming_sprites.get(sprite_name)
+                if sprite is None:
+                    sprite = SpriteFactory().newInstance(SpriteFactory.SPRITE_SINGLE, sprite_name)
+                self._reserved_sprites[sprite_name] = sprite
+
+    def release_reserved_sprites(self):
+        with self._lock:
+            self._reserved_sprites = {}
+
+    def known_sprite_for(self, sprite_name):
+        with self._lock:
+            if sprite_name in self._reserved_sprites:
+                return self._reserved_sprites[sprite_name]
+            return self.upcoming_sprites.get(sprite_name)
+
+    def upcoming_sprite_for(self, sprite_name):
+        with self._lock:
+            sprite = self.known_sprite_for(sprite_name)
+            if sprite is None:
+                sprite = SpriteFactory().newInstance(SpriteFactory.SPRITE_SINGLE, sprite_name)
+                self.upcoming_sprites[sprite_name] = sprite
+            return sprite
+
 class SpriteContext(object):
-    def __init__(self, name=None, user_script_declared_labels_map={}):
+    def __init__(self, name=None, user_script_declared_labels_map=None):
         self.name = name
         self.user_script_definition_brick_map = {}
         self.user_script_declared_map = set()
-        self.user_script_declared_labels_map = user_script_declared_labels_map
+        self.user_script_declared_labels_map = user_script_declared_labels_map if user_script_declared_labels_map is not None else {}
         self.user_script_params_map = {}
         self.context = None
 
@@ -616,8 +686,8 @@ class ScriptContext(object):
     def __init__(self, sprite_context=None):
         self.sprite_context = sprite_context if sprite_context is not None else SpriteContext()
 
-def converted(scratch_project, progress_bar=None, context=None):
-    return Converter.converted_project_for(scratch_project, progress_bar, context)
+def converted(scratch_project, progress_bar=None, context=None, parallel_sprite_conversion=None):
+    return Converter.converted_project_for(scratch_project, progress_bar, context, parallel_sprite_conversion)
 
 
 class Converter(object):
@@ -626,24 +696,25 @@ class Converter(object):
         self.scratch_project = scratch_project
 
     @classmethod
-    def converted_project_for(cls, scratch_project, progress_bar=None, context=None):
+    def converted_project_for(cls, scratch_project, progress_bar=None, context=None, parallel_sprite_conversion=None):
         converter = Converter(scratch_project)
-        catrobat_project = converter._converted_catrobat_program(progress_bar, context)
+        catrobat_project = converter._converted_catrobat_program(progress_bar, context, parallel_sprite_conversion)
         assert catrobat.is_background_sprite(catrobat_project.getDefaultScene().getSpriteList().get(0))
         return ConvertedProject(catrobat_project, scratch_project)
 
-    def _converted_catrobat_program(self, progress_bar=None, context=None):
+    def _converted_catrobat_program(self, progress_bar=None, context=None, parallel_sprite_conversion=None):
         scratch_project = self.scratch_project
         _catr_project = catbase.Project(None, scratch_project.name)
         _catr_scene = catbase.Scene( CATROBAT_DEFAULT_SCENE_NAME, _catr_project)
         _catr_project.sceneList.add(_catr_scene)
         _catr_scene = _catr_project.getDefaultScene()
-        ProjectManager.getInstance().setProject(_catr_project)
 
         self._scratch_object_converter = _ScratchObjectConverter(_catr_project, scratch_project,
                                                                  progress_bar, context)
         self._add_global_user_lists_to(_catr_scene)
-        self._add_converted_sprites_to(_catr_scene)
+        if parallel_sprite_conversion is None:
+            parallel_sprite_conversion = PARALLEL_SPRITE_CONVERSION
+        self._add_converted_sprites_to(_catr_scene, parallel_sprite_conversion and context is not None)
         self.scratch_project.listened_keys = self._add_key_sprites_to(_catr_scene, self.scratch_project.listened_keys)
         self.add_cursor_sprite_to(_catr_scene, context.upcoming_sprites)
         self._update_xml_header(_catr_project.getXmlHeader(), scratch_project.project_id,
@@ -661,9 +732,24 @@ class Converter(object):
             data_container = catrobat_scene.getDataContainer()
             data_container.addProjectUserList(global_user_list["listName"])
 
-    def _add_converted_sprites_to(self, catrobat_scene):
-        for scratch_object in self.scratch_project.objects:
-            catr_sprite = self._scratch_object_converter(scratch_object)
+    def _add_converted_sprites_to(self, catrobat_scene, parallel_sprite_conversion=False):
+        scratch_objects = self.scratch_project.objects
+        if parallel_sprite_conversion:
+            sprite_names = [scratch_object.name for scratch_object in scratch_objects[1:]]
+            if len(set(sprite_names)) != len(sprite_names) or MOUSE_SPRITE_NAME in sprite_names:
+                log.warning("Ambiguous sprite names. Converting sprites one after the other.")
+                parallel_sprite_conversion = False
+
+        if not parallel_sprite_conversion:
+            for scratch_object in scratch_objects:
+                catr_sprite = self._scratch_object_converter(scratch_object)
+                catrobat_scene.addSprite(catr_sprite)
+            return
+
+        # the stage is converted first, because the blocks of all other sprites may refer to the background
+        assert scratch_objects[0].is_stage()
+        catrobat_scene.addSprite(self._scratch_object_converter(scratch_objects[0]))
+        for catr_sprite in self._scratch_object_converter.catrobat_sprites_from(scratch_objects[1:]):
             catrobat_scene.addSprite(catr_sprite)
 
     def add_cursor_sprite_to(self, catrobat_scene, upcoming_sprites):
@@ -708,6 +794,7 @@ class Converter(object):
 
             position_script.brickList.addAll([forever_brick, set_x_brick, set_y_brick, wait_brick, forever_end])
             sprite.addScript(position_script)
+            stats.increment("helperUpdateLoops")
 
         move_script = catbase.BroadcastScript("_mouse_move_")
         move_goto = catbricks.GoToBrick()
@@ -995,20 +1082,58 @@ class Converter(object):
         xml_header.setDescription(description)
 
 class _ScratchObjectConverter(object):
-    _catrobat_project = None
-    _scratch_project = None
 
     def __init__(self, catrobat_project, scratch_project, progress_bar=None, context=None):
-        # TODO: refactor static
-        _ScratchObjectConverter._catrobat_project = catrobat_project
-        _ScratchObjectConverter._scratch_project = scratch_project
+        # NOTE: all conversion state is kept per instance (i.e. per conversion), so that
+        #       several projects can be converted concurrently within the same process
+        self._catrobat_project = catrobat_project
+        self._scratch_project = scratch_project
         self._progress_bar = progress_bar
         self._context = context
 
     def __call__(self, scratch_object):
         return self._catrobat_sprite_from(scratch_object)
 
+    def catrobat_sprites_from(self, scratch_objects, max_concurrent_threads=MAX_CONCURRENT_SPRITE_THREADS):
+        '''
+        Converts the given sprite objects concurrently. Only the conversion of looks, sounds,
+        variables and scripts runs in parallel. The remaining steps are done afterwards in the
+        order of the given objects, so that the result equals the one of a sequential conversion.
+        '''
+        assert self._context is not None
+        assert all(not scratch_object.is_stage() for scratch_object in scratch_objects)
+        converted_sprite_data, conversion_errors = [None] * len(scratch_objects), {}
+        self._context.reserve_sprites([scratch_object.name for scratch_object in scratch_objects])
+        try:
+            with _synchronized_data_of(self._catrobat_project):
+                for start_index in range(0, len(scratch_objects), max_concurrent_threads):
+                    threads = []
+                    for index in range(start_index, min(start_index + max_concurrent_threads, len(scratch_objects))):
+                        kwargs = {
+                            "object_converter": self,
+                            "scratch_object": scratch_objects[index],
+                            "index": index,
+                            "converted_sprite_data": converted_sprite_data,
+                            "conversion_errors": conversion_errors,
+                            "conversion_stats": stats.current()
+                        }
+                        threads.append(_SpriteConverterThread(kwargs=kwargs))
+                    for thread in threads: thread.start()
+                    for thread in threads: thread.join()
+        finally:
+            self._context.release_reserved_sprites()
+
+        if len(conversion_errors) > 0:
+            exc_type, exc_value, exc_traceback = conversion_errors[min(conversion_errors)]
+            raise exc_type, exc_value, exc_traceback
+
+        return [self._completed_catrobat_sprite_from(scratch_object, *sprite_data)
+                for scratch_object, sprite_data in zip(scratch_objects, converted_sprite_data)]
+
     def _catrobat_sprite_from(self, scratch_object):
+        return self._completed_catrobat_sprite_from(scratch_object, *self._converted_sprite_data_from(scratch_object))
+
+    def _converted_sprite_data_from(self, scratch_object):
         if not isinstance(scratch_object, scratch.Object):
             raise common.ScratchtobatError("Input must be of type={}, but is={}".format(scratch.Object, type(scratch_object)))
         sprite_name = scratch_object.name
@@ -1022,8 +1147,9 @@ class _ScratchObjectConverter(object):
 
         if self._context is not None:
             sprite_context.context = self._context
-            if sprite_name in self._context.upcoming_sprites:
-                sprite = self._context.upcoming_sprites[sprite_name]
+            known_sprite = self._context.known_sprite_for(sprite_name)
+            if known_sprite is not None:
+                sprite = known_sprite
 
         log.info('-'*80)
         log.info("Converting Sprite: '%s'", sprite_name)
@@ -1079,16 +1205,21 @@ class _ScratchObjectConverter(object):
             if self._progress_bar != None:
                 self._progress_bar.update(ProgressType.CONVERT_SCRIPT)
 
+        return sprite, sprite_context, costume_resolution
+
+    def _completed_catrobat_sprite_from(self, scratch_object, sprite, sprite_context, costume_resolution):
+        # NOTE: must be called in the order of the sprite objects, since the default behaviour
+        #       of each sprite depends on the one of its predecessors (e.g. visible variables)
         if self._context is not None:
             self._context.add_sprite_context(sprite_context)
 
         try:
-            self._add_default_behaviour_to(sprite, sprite_context, catrobat_scene,
+            self._add_default_behaviour_to(sprite, sprite_context, self._catrobat_project.getDefaultScene(),
                                            self._catrobat_project, scratch_object,
                                            self._scratch_project, costume_resolution)
         except Exception, e:
             log.error("exception: " + str(e))
-            log.error("Cannot add default behaviour to sprite object {}".format(sprite_name))
+            log.error("Cannot add default behaviour to sprite object {}".format(scratch_object.name))
 
         log.info('')
         return sprite
@@ -1248,8 +1379,7 @@ class _ScratchObjectConverter(object):
                 log.info("Too many visible variables")
             catrobat.add_to_start_script([show_variable_brick], sprite)
 
-    @classmethod
-    def _catrobat_script_from(cls, scratch_script, sprite, catrobat_project, context=None):
+    def _catrobat_script_from(self, scratch_script, sprite, catrobat_project, context=None):
         if not isinstance(scratch_script, scratch.Script):
             raise common.ScratchtobatError("Arg1 must be of type={}, but is={}".format(scratch.Script, type(scratch_script)))
         if sprite and not isinstance(sprite, catbase.Sprite):
@@ -1265,12 +1395,16 @@ class _ScratchObjectConverter(object):
             cat_instance.addBrick(_placeholder_for_unmapped_blocks_to("UNSUPPORTED SCRIPT", scratch_script.type))
 
         script_context = ScriptContext(context)
-        converted_bricks = cls._catrobat_bricks_from(scratch_script.script_element, sprite, script_context)
+        converted_bricks = self._catrobat_bricks_from(scratch_script.script_element, sprite, script_context)
 
         assert isinstance(converted_bricks, list) and len(converted_bricks) == 1
         [converted_bricks] = converted_bricks
 
         log.debug("   --> converted: <%s>", ", ".join(map(catrobat.simple_name_for, converted_bricks)))
+        if OPTIMIZE_FORMULAS:
+            for brick_or_script in [cat_instance] + converted_bricks:
+                if brick_or_script:
+                    formulaoptimizer.simplify_formulas_of(brick_or_script)
         ignored_blocks = 0
         for brick in converted_bricks:
             # Scratch behavior: blocks can be ignored e.g. if no arguments are set
@@ -1293,27 +1427,42 @@ class _ScratchObjectConverter(object):
             log.info("number of ignored Scratch blocks: %d", ignored_blocks)
         return cat_instance
 
-    @classmethod
-    def _catrobat_bricks_from(cls, scratch_blocks, catrobat_sprite, script_context=None):
+    def _catrobat_bricks_from(self, scratch_blocks, catrobat_sprite, script_context=None):
         if not isinstance(scratch_blocks, scratch.ScriptElement):
             scratch_blocks = scratch.ScriptElement.from_raw_block(scratch_blocks)
-        traverser = _BlocksConversionTraverser(catrobat_sprite, cls._catrobat_project, script_context)
+        traverser = _BlocksConversionTraverser(catrobat_sprite, self._catrobat_project, script_context)
         traverser.traverse(scratch_blocks)
         return traverser.converted_bricks
 
 
+class _SpriteConverterThread(Thread):
+
+    def run(self):
+        index = self._kwargs["index"]
+        try:
+            object_converter = self._kwargs["object_converter"]
+            with stats.attached(self._kwargs["conversion_stats"]):
+                sprite_data = object_converter._converted_sprite_data_from(self._kwargs["scratch_object"])
+            self._kwargs["converted_sprite_data"][index] = sprite_data
+        except:
+            self._kwargs["conversion_errors"][index] = sys.exc_info()
+
+
 class ConvertedProject(object):
 
     def __init__(self, catrobat_project, scratch_project):
         self.scratch_project = scratch_project
         self.catrobat_program = catrobat_project
         self.name = self.catrobat_program.getXmlHeader().getProgramName()
+        # the program got packaged without the automatic screenshot of the project (download failed or too slow)
+        self.is_automatic_screenshot_missing = False
 
     @staticmethod
     def _converted_output_path(output_dir, project_name):
         return os.path.join(output_dir, catrobat.encoded_project_name(project_name) + catrobat.PACKAGED_PROGRAM_FILE_EXTENSION)
 
-    def save_as_catrobat_package_to(self, output_dir, archive_name=None, progress_bar=None, context=None):
+    def save_as_catrobat_package_to(self, output_dir, archive_name=None, progress_bar=None, context=None,
+                                    direct_to_zip_packaging=None, deterministic_packaging=None):
 
         def iter_dir(path):
             for root, _, files in os.walk(path):
@@ -1321,20 +1470,38 @@ class ConvertedProject(object):
                     yield os.path.join(root, file_)
         log.info("convert Scratch project to '%s'", output_dir)
 
-        with common.TemporaryDirectory() as catrobat_program_dir:
-            self.save_as_catrobat_directory_structure_to(catrobat_program_dir, progress_bar, context)
-            common.makedirs(output_dir)
-            archive_name = self.name if archive_name is None else archive_name
-            catrobat_zip_file_path = self._converted_output_path(output_dir, archive_name)
+        common.makedirs(output_dir)
+        archive_name = self.name if archive_name is None else archive_name
+        catrobat_zip_file_path = self._converted_output_path(output_dir, archive_name)
+        if os.path.exists(catrobat_zip_file_path):
+            os.remove(catrobat_zip_file_path)
+        if direct_to_zip_packaging is None:
+            direct_to_zip_packaging = DIRECT_TO_ZIP_PACKAGING
+        if deterministic_packaging is None:
+            deterministic_packaging = DETERMINISTIC_PACKAGING
+        if deterministic_packaging and direct_to_zip_packaging:
+            # entries can only be sorted once all of them exist -> program directory is needed
+            log.info("  deterministic packaging: not writing directly into the package")
+            direct_to_zip_packaging = False
+        if direct_to_zip_packaging:
             log.info("  save packaged Scratch project to '%s'", catrobat_zip_file_path)
-            if os.path.exists(catrobat_zip_file_path):
-                os.remove(catrobat_zip_file_path)
-            with zipfile.ZipFile(catrobat_zip_file_path, 'w') as zip_fp:
-                for file_path in iter_dir(unicode(catrobat_program_dir)):
-                    assert isinstance(file_path, unicode)
-                    path_inside_zip = file_path.replace(catrobat_program_dir, u"")
-                    zip_fp.write(file_path, path_inside_zip)
-            assert os.path.exists(catrobat_zip_file_path), "Catrobat package not written: %s" % catrobat_zip_file_path
+            with catrobatpackage.PackageWriter(catrobat_zip_file_path) as package_writer:
+                self._write_program_with(package_writer, progress_bar, context)
+        else:
+            with common.TemporaryDirectory() as catrobat_program_dir:
+                self.save_as_catrobat_directory_structure_to(catrobat_program_dir, progress_bar, context)
+                log.info("  save packaged Scratch project to '%s'", catrobat_zip_file_path)
+                with stats.phase(stats.ZIP), zipfile.ZipFile(catrobat_zip_file_path, 'w') as zip_fp:
+                    # sorted, since the order of os.walk() depends on the file system
+                    for file_path in sorted(iter_dir(unicode(catrobat_program_dir))):
+                        assert isinstance(file_path, unicode)
+                        path_inside_zip = file_path.replace(catrobat_program_dir, u"")
+                        if deterministic_packaging:
+                            catrobatpackage.write_file_with_fixed_date_time(zip_fp, file_path, path_inside_zip)
+                        else:
+                            zip_fp.write(file_path, path_inside_zip)
+            stats.increment("packagingBytesWritten", os.path.getsize(catrobat_zip_file_path))
+        assert os.path.exists(catrobat_zip_file_path), "Catrobat package not written: %s" % catrobat_zip_file_path
         return catrobat_zip_file_path
 
     @staticmethod
@@ -1346,28 +1513,19 @@ class ConvertedProject(object):
         return os.path.join(temp_dir, CATROBAT_DEFAULT_SCENE_NAME, "sounds")
 
     def save_as_catrobat_directory_structure_to(self, temp_path, progress_bar=None, context=None):
-        def create_directory_structure():
-            sounds_path = self._sounds_dir_of_project(temp_path)
-            os.makedirs(sounds_path)
+        self._write_program_with(catrobatpackage.DirectoryWriter(temp_path), progress_bar, context)
 
-            images_path = self._images_dir_of_project(temp_path)
-            os.makedirs(images_path)
+    def _write_program_with(self, program_writer, progress_bar=None, context=None):
+        # all files are added to the program writer by their path inside the Catrobat program
+        images_dir = self._images_dir_of_project("")
+        sounds_dir = self._sounds_dir_of_project("")
 
-            for _ in (temp_path, sounds_path, images_path):
-                # TODO: into common module
-                open(os.path.join(_, catrobat.ANDROID_IGNORE_MEDIA_MARKER_FILE_NAME), 'a').close()
-            return sounds_path, images_path
-
-        def program_source_for(catrobat_program):
-            storage_handler = catio.XstreamSerializer.getInstance()
-            code_xml_content = storage_handler.XML_HEADER
-            code_xml_content += storage_handler.xstream.toXML(catrobat_program)
-            return code_xml_content
+        def add_media_ignore_markers():
+            for dir_ in ("", sounds_dir, images_dir):
+                program_writer.add_empty_file(os.path.join(dir_, catrobat.ANDROID_IGNORE_MEDIA_MARKER_FILE_NAME))
 
         def write_program_source(catrobat_program, context):
-            program_source = program_source_for(catrobat_program)
-            with open(os.path.join(temp_path, catrobat.PROGRAM_SOURCE_FILE_NAME), "wb") as fp:
-                fp.write(program_source.encode("utf8"))
+            program_writer.add_program_source(catrobat_program, catrobat.PROGRAM_SOURCE_FILE_NAME)
 
             # copying key images needed for keyPressed substitution
             for listened_key_tuple in self.scratch_project.listened_keys:
@@ -1376,35 +1534,47 @@ class ConvertedProject(object):
                 except:
                     continue
 
-                shutil.copyfile(key_image_path, os.path.join(images_path, _key_filename_for(listened_key_tuple[0])))
+                program_writer.add_file(key_image_path, os.path.join(images_dir, _key_filename_for(listened_key_tuple[0])))
             for sprite in catrobat_program.getDefaultScene().spriteList:
                 if sprite.name == MOUSE_SPRITE_NAME:
                     mouse_img_path = _mouse_image_path()
-                    shutil.copyfile(mouse_img_path, os.path.join(images_path, _generate_mouse_filename()))
+                    program_writer.add_file(mouse_img_path, os.path.join(images_dir, _generate_mouse_filename()))
                     break
 
-        def download_automatic_screenshot_if_available(output_dir, scratch_project):
-            if scratch_project.automatic_screenshot_image_url is None:
+        def add_automatic_screenshot_if_available(scratch_project):
+            # the download started as soon as the project metadata was known
+            automatic_screenshot_download = scratch_project.automatic_screenshot_download
+            if automatic_screenshot_download is None:
+                return
+            automatic_screenshot_content = automatic_screenshot_download.content()
+            if automatic_screenshot_content is None:
+                self.is_automatic_screenshot_missing = True
                 return
 
             _AUTOMATIC_SCREENSHOT_FILE_NAME = helpers.catrobat_info("automatic_screenshot_file_name")
-            download_file_path = os.path.join(output_dir, _AUTOMATIC_SCREENSHOT_FILE_NAME)
-            common.download_file(scratch_project.automatic_screenshot_image_url, download_file_path)
+            with common.TemporaryDirectory() as download_dir:
+                download_file_path = os.path.join(download_dir, _AUTOMATIC_SCREENSHOT_FILE_NAME)
+                with open(download_file_path, "wb") as fp:
+                    fp.write(automatic_screenshot_content)
+                program_writer.add_file(download_file_path, os.path.join(CATROBAT_DEFAULT_SCENE_NAME, _AUTOMATIC_SCREENSHOT_FILE_NAME))
 
         # TODO: rename/rearrange abstracting methods
         log.info("  Creating Catrobat project structure")
-        sounds_path, images_path = create_directory_structure()
+        add_media_ignore_markers()
 
         log.info("  Saving media files")
         media_converter = mediaconverter.MediaConverter(self.scratch_project, self.catrobat_program,
-                                                        images_path, sounds_path)
+                                                        images_dir, sounds_dir, program_writer)
 
-        media_converter.convert(progress_bar)
+        with stats.phase(stats.MEDIA):
+            media_converter.convert(progress_bar)
 
         log.info("  Saving project XML file")
-        write_program_source(self.catrobat_program, context)
-        log.info("  Downloading and adding automatic screenshot")
-        download_automatic_screenshot_if_available(os.path.join(temp_path, CATROBAT_DEFAULT_SCENE_NAME), self.scratch_project)
+        with stats.phase(stats.SERIALIZATION):
+            write_program_source(self.catrobat_program, context)
+        log.info("  Adding automatic screenshot")
+        with stats.phase(stats.DOWNLOAD):
+            add_automatic_screenshot_if_available(self.scratch_project)
         if progress_bar != None:
             progress_bar.update(ProgressType.SAVE_XML, progress_bar.saving_xml_progress_weight)
 
@@ -1435,6 +1605,8 @@ def _register_handler(dict_, *names):
 class _BlocksConversionTraverser(scratch.AbstractBlocksTraverser):
 
     _block_name_to_handler_map = {}
+    # shared by all traversers: (Catrobat class, argument types) -> number of successful instantiation try
+    _successful_instantiation_try_numbers = {}
 
     def __init__(self, catrobat_sprite, catrobat_project, script_context=None):
         assert catrobat_sprite is not None
@@ -1448,6 +1620,7 @@ class _BlocksConversionTraverser(scratch.AbstractBlocksTraverser):
         self.arguments = None
         self._stack = []
         self._child_stack = []
+        self._arguments_start_indices = []
 
     @property
     def stack(self):
@@ -1457,23 +1630,24 @@ class _BlocksConversionTraverser(scratch.AbstractBlocksTraverser):
     def converted_bricks(self):
         return self._stack
 
-    def traverse(self, script_element):
-        self._stack += [script_element.name]
-        super(_BlocksConversionTraverser, self).traverse(script_element)
+    def _enter(self, script_element):
+        # all values pushed until the script element gets visited are its arguments
+        self._arguments_start_indices += [len(self._stack)]
 
     def _pop_stack(self, start_index):
-        popped = list(self._stack[start_index:])
+        popped = self._stack[start_index:]
         del self._stack[start_index:]
         return popped
 
+    def _pop_arguments_of(self, script_element):
+        return self._pop_stack(self._arguments_start_indices.pop())
+
     def _visit(self, script_element):
         self.script_element = script_element
-        arguments_start_index = len(self._stack) - self._stack[::-1].index(script_element.name)
-        self.arguments = self._pop_stack(arguments_start_index)
+        self.arguments = self._pop_arguments_of(script_element)
 
         new_stack_values = self._converted_script_element()
 
-        del self._stack[-1]
         if not isinstance(new_stack_values, list):
             new_stack_values = [new_stack_values]
 
@@ -1532,34 +1706,45 @@ class _BlocksConversionTraverser(scratch.AbstractBlocksTraverser):
                                                 if isinstance(arg1, UnmappedBlock) else [arg1])]]
         return converted_element
 
+    def _instantiation_arguments_for(self, try_number, coerced_args):
+        # TODO: simplify
+        if try_number == 0:
+            return coerced_args
+        elif try_number == 1:
+            def handleBoolean(arg):
+                if isinstance(arg, bool):
+                    return int(arg)
+                else:
+                    return arg
+
+            return [catformula.FormulaElement(catElementType.NUMBER, str(handleBoolean(arg)), None) if isinstance(arg, numbers.Number) else arg for arg in coerced_args]  # @UndefinedVariable
+        elif try_number == 3 and len(self.arguments) == 2 and self.arguments[0] in { "brightness", "color", "ghost" }:
+            return [self.arguments[0]] + [catrobat.create_formula_with_value(arg) for arg in self.arguments[1:]]
+        elif try_number in {2, 3}:
+            args = [arg if arg != None else "" for arg in self.arguments]
+            return [catrobat.create_formula_with_value(arg) for arg in args]
+        else:
+            return self.arguments
+
     def _regular_block_conversion(self):
         CatrobatClass = self.CatrobatClass
         # TODO: replace with UnmappedBlock as a None object
         if CatrobatClass is not None:
             is_catrobat_enum = not hasattr(CatrobatClass, "__module__") and hasattr(CatrobatClass, "getClass")
             self.arguments = _with_unmapped_blocks_replaced_as_default_formula_value(self.arguments)
-            for try_number in range(6):
+            coerced_args = [(common.int_or_float(arg) or arg if isinstance(arg, (str, unicode)) else arg) for arg in self.arguments]
+
+            # whether a try succeeds only depends on the types of the arguments
+            # -> start with the try that succeeded for the same class and argument types before
+            cache_key = (CatrobatClass, tuple(type(arg) for arg in coerced_args))
+            cached_try_number = self._successful_instantiation_try_numbers.get(cache_key)
+            try_numbers = range(6)
+            if cached_try_number is not None:
+                try_numbers = [cached_try_number] + [try_number for try_number in try_numbers if try_number != cached_try_number]
+
+            for try_number in try_numbers:
+                converted_args = self._instantiation_arguments_for(try_number, coerced_args)
                 try:
-                    # TODO: simplify
-                    if try_number == 0:
-                        converted_args = [(common.int_or_float(arg) or arg if isinstance(arg, (str, unicode)) else arg) for arg in self.arguments]
-                    elif try_number == 1:
-                        def handleBoolean(arg):
-                            if isinstance(arg, bool):
-                                return int(arg)
-                            else:
-                                return arg
-
-                        converted_args = [catformula.FormulaElement(catElementType.NUMBER, str(handleBoolean(arg)), None) if isinstance(arg, numbers.Number) else arg for arg in converted_args]  # @UndefinedVariable
-                    elif try_number == 4:
-                        converted_args = self.arguments
-                    elif try_number == 2:
-                        args = [arg if arg != None else "" for arg in self.arguments]
-                        converted_args = [catrobat.create_formula_with_value(arg) for arg in args]
-                    elif try_number == 3:
-                        if len(self.arguments) == 2 and self.arguments[0] in { "brightness", "color", "ghost" }:
-                            converted_args = [self.arguments[0]] + [catrobat.create_formula_with_value(arg) for arg in self.arguments[1:]]
-
                     if not is_catrobat_enum:
                         converted_value = CatrobatClass(*converted_args)
                     else:
@@ -1576,6 +1761,8 @@ class _BlocksConversionTraverser(scratch.AbstractBlocksTraverser):
                 raise class_exception
                 log.exception(class_exception)
                 self.errors += [class_exception]
+            stats.increment("instantiationTryCacheHits" if try_number == cached_try_number else "instantiationTryCacheMisses")
+            self._successful_instantiation_try_numbers[cache_key] = try_number
             new_stack_values = converted_value
         else:
             log.debug("no Class for: %s, args: %s", self.block_name, map(catrobat.simple_name_for, self.arguments))
@@ -1596,6 +1783,13 @@ class _BlocksConversionTraverser(scratch.AbstractBlocksTraverser):
         self.CatrobatClass = preserved_catrobat_class
         return converted_element
 
+    def _sprite_with_name(self, sprite_name):
+        for sprite in self.scene.spriteList:
+            if sprite.getName() == sprite_name:
+                return sprite
+        # sprite not converted yet (or not existing at all) -> shared instance taken over later on
+        return self.script_context.sprite_context.context.upcoming_sprite_for(sprite_name)
+
     # formula element blocks (compute, operator, ...)
     @_register_handler(_block_name_to_handler_map, "()")
     def _convert_bracket_block(self):
@@ -2115,16 +2309,7 @@ class _BlocksConversionTraverser(scratch.AbstractBlocksTraverser):
             return self.CatrobatClass(self.sprite)
 
         if isinstance(base_sprite, basestring):
-            for sprite in self.scene.spriteList:
-                if sprite.getName() == base_sprite:
-                    return self.CatrobatClass(sprite)
-            if base_sprite in self.script_context.sprite_context.context.upcoming_sprites:
-                new_sprite = self.script_context.sprite_context.context.upcoming_sprites[base_sprite]
-            else:
-                new_sprite = SpriteFactory().newInstance(SpriteFactory.SPRITE_SINGLE, base_sprite)
-                self.script_context.sprite_context.context.upcoming_sprites[new_sprite.getName()] = new_sprite
-
-            create_clone_of_brick = self.CatrobatClass(new_sprite)
+            create_clone_of_brick = self.CatrobatClass(self._sprite_with_name(base_sprite))
             return create_clone_of_brick
 
     @_register_handler(_block_name_to_handler_map, "timeAndDate")
@@ -2286,15 +2471,7 @@ class _BlocksConversionTraverser(scratch.AbstractBlocksTraverser):
         if not isinstance(sprite_name, basestring):
             return catbricks.NoteBrick("Error: Not a valid parameter for PointToBrick")
 
-        for sprite in self.scene.spriteList:
-            if sprite.getName() == sprite_name:
-                return self.CatrobatClass(sprite)
-        if sprite_name in self.script_context.sprite_context.context.upcoming_sprites:
-            sprite = self.script_context.sprite_context.context.upcoming_sprites[sprite_name]
-        else:
-            sprite = SpriteFactory().newInstance(SpriteFactory.SPRITE_SINGLE, sprite_name)
-            self.script_context.sprite_context.context.upcoming_sprites[sprite_name] = sprite
-        return self.CatrobatClass(sprite)
+        return self.CatrobatClass(self._sprite_with_name(sprite_name))
 
     @_register_handler(_block_name_to_handler_map, "gotoSpriteOrMouse:")
     def _convert_go_to_sprite_or_mouse_block(self):
@@ -2303,18 +2480,7 @@ class _BlocksConversionTraverser(scratch.AbstractBlocksTraverser):
             go_to_brick = self.CatrobatClass()
             go_to_brick.spinnerSelection = catcommon.BrickValues.GO_TO_RANDOM_POSITION
         elif isinstance(base_sprite, basestring):
-            for sprite in self.scene.spriteList:
-                if sprite.getName() == base_sprite:
-                    go_to_brick = self.CatrobatClass(sprite)
-                    go_to_brick.spinnerSelection = catcommon.BrickValues.GO_TO_OTHER_SPRITE_POSITION
-                    return go_to_brick
-            if base_sprite in self.script_context.sprite_context.context.upcoming_sprites:
-                new_sprite = self.script_context.sprite_context.context.upcoming_sprites[base_sprite]
-            else:
-                new_sprite = SpriteFactory().newInstance(SpriteFactory.SPRITE_SINGLE, base_sprite)
-                self.script_context.sprite_context.context.upcoming_sprites[new_sprite.getName()] = new_sprite
-
-            go_to_brick = self.CatrobatClass(new_sprite)
+            go_to_brick = self.CatrobatClass(self._sprite_with_name(base_sprite))
             go_to_brick.spinnerSelection = catcommon.BrickValues.GO_TO_OTHER_SPRITE_POSITION
         else:
             return catbricks.NoteBrick("Error: Not a valid parameter for Goto Brick")
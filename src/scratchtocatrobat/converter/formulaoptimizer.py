@@ -0,0 +1,159 @@
+#  ScratchToCatrobat: A tool for converting Scratch projects into Catrobat programs.
+#  Copyright (C) 2013-2017 The Catrobat Team
+#  (http://developer.catrobat.org/credits)
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Affero General Public License as
+#  published by the Free Software Foundation, either version 3 of the
+#  License, or (at your option) any later version.
+#
+#  An additional term exception under section 7 of the GNU Affero
+#  General Public License, version 3, is available at
+#  http://developer.catrobat.org/license_additional_term
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU Affero General Public License for more details.
+#
+#  You should have received a copy of the GNU Affero General Public License
+#  along with this program.  If not, see http://www.gnu.org/licenses/.
+
+"""
+  Simplification of converted formulas.
+  Arithmetic on numeric constants and joins of constant strings are folded into a single
+  element, and brackets that neither group an operation nor change how a formula is
+  displayed are dropped. Catroid evaluates the simplified formulas exactly like the original
+  ones: only operations whose result is the same double (or string) on the device are folded.
+"""
+
+import math
+import re
+
+import org.catrobat.catroid.formulaeditor as catformula
+import org.catrobat.catroid.formulaeditor.FormulaElement.ElementType as catElementType
+
+from scratchtocatrobat.tools import stats
+
+_NUMBER_VALUE_REGEX = re.compile(r"^\d+(\.\d+)?([eE][-+]?\d+)?$")
+_PLAIN_DECIMAL_REGEX = re.compile(r"^\d+(\.\d+)?$")
+_MAX_EXACT_INTEGER = 2 ** 53
+
+_FOLDABLE_ARITHMETIC_OPERATIONS = {
+    str(catformula.Operators.PLUS): lambda left, right: left + right,
+    str(catformula.Operators.MINUS): lambda left, right: left - right,
+    str(catformula.Operators.MULT): lambda left, right: left * right,
+    str(catformula.Operators.DIVIDE): lambda left, right: left / right if right != 0 else None
+}
+_MINUS_OPERATOR = str(catformula.Operators.MINUS)
+_JOIN_FUNCTION = str(catformula.Functions.JOIN)
+
+
+def _number_value_of(formula_element):
+    while formula_element is not None and formula_element.getElementType() == catElementType.BRACKET:
+        formula_element = formula_element.rightChild
+    if formula_element is None:
+        return None
+
+    sign = 1.0
+    if formula_element.getElementType() == catElementType.OPERATOR and formula_element.getValue() == _MINUS_OPERATOR \
+    and formula_element.leftChild is None:
+        # Catroid represents negative numbers as unary minus operation
+        sign, formula_element = -1.0, formula_element.rightChild
+        if formula_element is None:
+            return None
+
+    if formula_element.getElementType() != catElementType.NUMBER \
+    or not _NUMBER_VALUE_REGEX.match(formula_element.getValue() or ""):
+        return None
+    return sign * float(formula_element.getValue())
+
+
+def _number_formula_element_for(value):
+    if value is None or math.isinf(value) or math.isnan(value) or (value == 0 and math.copysign(1.0, value) < 0):
+        return None
+    absolute_value = abs(value)
+    if absolute_value == int(absolute_value) and absolute_value < _MAX_EXACT_INTEGER:
+        value_string = "%d" % absolute_value
+    else:
+        value_string = repr(absolute_value)
+        if not _PLAIN_DECIMAL_REGEX.match(value_string):
+            return None
+
+    number_element = catformula.FormulaElement(catElementType.NUMBER, value_string, None)
+    if value >= 0:
+        return number_element
+    negated_number_element = catformula.FormulaElement(catElementType.OPERATOR, _MINUS_OPERATOR, None)
+    negated_number_element.setRightChild(number_element)
+    return negated_number_element
+
+
+def _simplified(formula_element, parent_element):
+    element_type, value = formula_element.getElementType(), formula_element.getValue()
+    left_child, right_child = formula_element.leftChild, formula_element.rightChild
+
+    if element_type == catElementType.BRACKET:
+        if right_child is None:
+            return formula_element
+        # brackets only group operations -> needless around everything else, on top level,
+        # within brackets and within the argument list of a function
+        if right_child.getElementType() != catElementType.OPERATOR or parent_element is None \
+        or parent_element.getElementType() in {catElementType.BRACKET, catElementType.FUNCTION}:
+            stats.increment("droppedFormulaBrackets")
+            return right_child
+        return formula_element
+
+    if element_type == catElementType.OPERATOR and value in _FOLDABLE_ARITHMETIC_OPERATIONS \
+    and left_child is not None and right_child is not None:
+        left_value, right_value = _number_value_of(left_child), _number_value_of(right_child)
+        if left_value is None or right_value is None:
+            return formula_element
+        folded_element = _number_formula_element_for(_FOLDABLE_ARITHMETIC_OPERATIONS[value](left_value, right_value))
+        if folded_element is None:
+            return formula_element
+        stats.increment("foldedFormulaOperations")
+        return folded_element
+
+    if element_type == catElementType.FUNCTION and value == _JOIN_FUNCTION \
+    and left_child is not None and left_child.getElementType() == catElementType.STRING \
+    and right_child is not None and right_child.getElementType() == catElementType.STRING:
+        stats.increment("foldedFormulaOperations")
+        return catformula.FormulaElement(catElementType.STRING, left_child.getValue() + right_child.getValue(), None)
+
+    return formula_element
+
+
+def simplified_formula_element(root_element):
+    # post-order traversal with an explicit stack: children are simplified before their parent
+    elements_to_visit = [(root_element, None, False, False)]
+    simplified_root_element = root_element
+    while elements_to_visit:
+        formula_element, parent_element, is_left_child, are_children_visited = elements_to_visit.pop()
+        if not are_children_visited:
+            elements_to_visit.append((formula_element, parent_element, is_left_child, True))
+            if formula_element.rightChild is not None:
+                elements_to_visit.append((formula_element.rightChild, formula_element, False, False))
+            if formula_element.leftChild is not None:
+                elements_to_visit.append((formula_element.leftChild, formula_element, True, False))
+            continue
+
+        simplified_element = _simplified(formula_element, parent_element)
+        if simplified_element is formula_element:
+            continue
+        if parent_element is None:
+            simplified_element.parent = None
+            simplified_root_element = simplified_element
+        elif is_left_child:
+            parent_element.setLeftChild(simplified_element)
+        else:
+            parent_element.setRightChild(simplified_element)
+    return simplified_root_element
+
+
+def simplify_formulas_of(brick_or_script):
+    formula_map = getattr(brick_or_script, "formulaMap", None)
+    if formula_map is None:
+        return
+    for formula in formula_map.values():
+        if formula is not None and formula.formulaTree is not None:
+            formula.formulaTree = simplified_formula_element(formula.formulaTree)
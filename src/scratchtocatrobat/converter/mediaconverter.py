@@ -20,7 +20,6 @@
 #  along with this program.  If not, see http://www.gnu.org/licenses/.
 
 import os
-import shutil
 from threading import Thread
 from java.awt import Color
 
@@ -90,11 +89,13 @@ class _MediaResourceConverterThread(Thread):
 
 class MediaConverter(object):
 
-    def __init__(self, scratch_project, catrobat_program, images_path, sounds_path):
+    def __init__(self, scratch_project, catrobat_program, images_dir, sounds_dir, program_writer):
+        # images_dir and sounds_dir are paths inside the Catrobat program the program_writer writes
         self.scratch_project = scratch_project
         self.catrobat_program = catrobat_program
-        self.images_path = images_path
-        self.sounds_path = sounds_path
+        self.images_dir = images_dir
+        self.sounds_dir = sounds_dir
+        self.program_writer = program_writer
         self.renamed_files_map = {}
 
 
@@ -133,7 +134,7 @@ class MediaConverter(object):
                 resource_info = {
                     "scratch_md5_name": costume_file_name,
                     "src_path": costume_src_path,
-                    "dest_path": self.images_path,
+                    "dest_dir": self.images_dir,
                     "media_type": MediaType.UNCONVERTED_SVG if is_unconverted else MediaType.IMAGE,
                     "info": costume_info
                 }
@@ -168,7 +169,7 @@ class MediaConverter(object):
                 resource_info = {
                     "scratch_md5_name": sound_file_name,
                     "src_path": sound_src_path,
-                    "dest_path": self.sounds_path,
+                    "dest_dir": self.sounds_dir,
                     "media_type": MediaType.UNCONVERTED_WAV if is_unconverted else MediaType.AUDIO,
                     "info": sound_info
                 }
@@ -256,7 +257,7 @@ class MediaConverter(object):
                     # TODO: move test_converter.py to converter-python-package...
                     image_processing.save_editable_image_as_png_to_disk(editable_image, image_file_path, overwrite=True)
 
-            self._copy_media_file(scratch_md5_name, src_path, resource_info["dest_path"],
+            self._copy_media_file(scratch_md5_name, src_path, resource_info["dest_dir"],
                                   resource_info["media_type"])
 
             if resource_info["media_type"] in { MediaType.UNCONVERTED_SVG, MediaType.UNCONVERTED_WAV }:
@@ -278,7 +279,7 @@ class MediaConverter(object):
                 info.fileName = new_file_name
 
 
-    def _copy_media_file(self, scratch_md5_name, src_path, dest_path, media_type):
+    def _copy_media_file(self, scratch_md5_name, src_path, dest_dir, media_type):
         # for Catrobat separate file is needed for resources which are used multiple times but with different names
         for scratch_resource_name in self.scratch_project.find_all_resource_names_for(scratch_md5_name):
             new_file_name = catrobat_resource_file_name_for(scratch_md5_name, scratch_resource_name)
@@ -288,7 +289,7 @@ class MediaConverter(object):
                 new_file_name = catrobat_resource_file_name_for(converted_scratch_md5_name,
                                                                 scratch_resource_name)
                 self.renamed_files_map[old_file_name] = new_file_name
-            shutil.copyfile(src_path, os.path.join(dest_path, new_file_name))
+            self.program_writer.add_file(src_path, os.path.join(dest_dir, new_file_name))
 
     def resize_png(self, path_in, path_out, bitmapResolution):
         import java.awt.image.BufferedImage
@@ -0,0 +1,219 @@
+#  ScratchToCatrobat: A tool for converting Scratch projects into Catrobat programs.
+#  Copyright (C) 2013-2017 The Catrobat Team
+#  (http://developer.catrobat.org/credits)
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Affero General Public License as
+#  published by the Free Software Foundation, either version 3 of the
+#  License, or (at your option) any later version.
+#
+#  An additional term exception under section 7 of the GNU Affero
+#  General Public License, version 3, is available at
+#  http://developer.catrobat.org/license_additional_term
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU Affero General Public License for more details.
+#
+#  You should have received a copy of the GNU Affero General Public License
+#  along with this program.  If not, see http://www.gnu.org/licenses/.
+import os
+import unittest
+import zipfile
+
+import org.catrobat.catroid.content as catbase
+from java.io import FileInputStream
+from java.util import Collections
+from java.util.zip import ZipEntry, ZipFile as JavaZipFile, ZipInputStream
+from org.python.core.util import FileUtil
+
+from scratchtocatrobat.converter import catrobat
+from scratchtocatrobat.converter import catrobatpackage
+from scratchtocatrobat.tools import common_testing
+
+_SOUND_CONTENT = "RIFF" + "".join(chr(index % 7) for index in range(5000))
+
+
+class PackageWriterTest(common_testing.BaseTestCase):
+
+    def setUp(self):
+        super(PackageWriterTest, self).setUp()
+        self.package_path = os.path.join(self.temp_dir, "program.catrobat")
+
+    def _file_with_content(self, file_name, content):
+        file_path = os.path.join(self.temp_dir, file_name)
+        with open(file_path, "wb") as fp:
+            fp.write(content)
+        return file_path
+
+    def _entries_read_by_java(self, package_path):
+        # second, independent reader (Catroid reads packages with java.util.zip): the central directory
+        # is read by ZipFile, the local entry headers by ZipInputStream -> both must match
+        java_zip_file = JavaZipFile(package_path)
+        try:
+            entries = [(entry.getName(), entry.getMethod(), FileUtil.readBytes(java_zip_file.getInputStream(entry)).tostring())
+                       for entry in Collections.list(java_zip_file.entries())]
+        finally:
+            java_zip_file.close()
+        zip_input_stream = ZipInputStream(FileInputStream(package_path))
+        try:
+            entry = zip_input_stream.getNextEntry()
+            streamed_entries = []
+            while entry is not None:
+                streamed_entries += [(entry.getName(), entry.getMethod(), FileUtil.readBytes(zip_input_stream).tostring())]
+                entry = zip_input_stream.getNextEntry()
+        finally:
+            zip_input_stream.close()
+        assert streamed_entries == entries
+        return entries
+
+    def _write_package_with_deflated_entries(self, catrobat_program, max_concurrent_threads=1):
+        wav_path = self._file_with_content("sound.wav", _SOUND_CONTENT)
+        png_path = self._file_with_content("look.png", "\x89PNG" + "x" * 1000)
+        with catrobatpackage.PackageWriter(self.package_path, store_compressed_media=True,
+                                           max_concurrent_threads=max_concurrent_threads) as package_writer:
+            package_writer.add_program_source(catrobat_program, catrobat.PROGRAM_SOURCE_FILE_NAME)
+            package_writer.add_file(wav_path, "Scene 1/sounds/sound.wav")
+            package_writer.add_file(png_path, "Scene 1/images/look.png")
+            package_writer.add_empty_file(".nomedia")
+
+    def _assert_package_with_deflated_entries_readable_by_java(self, catrobat_program):
+        serializer = catrobat.xstream_serializer()
+        expected_program_source = (serializer.XML_HEADER + serializer.xstream.toXML(catrobat_program)).encode("utf-8")
+        assert self._entries_read_by_java(self.package_path) == [
+            (catrobat.PROGRAM_SOURCE_FILE_NAME, ZipEntry.DEFLATED, expected_program_source),
+            ("Scene 1/sounds/sound.wav", ZipEntry.DEFLATED, _SOUND_CONTENT),
+            ("Scene 1/images/look.png", ZipEntry.STORED, "\x89PNG" + "x" * 1000),
+            (".nomedia", ZipEntry.STORED, "")]
+
+    def test_can_write_deflated_entries_readable_by_java(self):
+        catrobat_program = catbase.Project(None, "__test_project__")
+        for max_concurrent_threads in [1, 2]:
+            self._write_package_with_deflated_entries(catrobat_program, max_concurrent_threads)
+            self._assert_package_with_deflated_entries_readable_by_java(catrobat_program)
+
+    def test_can_write_deflated_entries_with_zip64_headers_readable_by_java(self):
+        # entries beyond this limit get zip64 extra fields, a zip64 end record follows the central directory
+        self.addCleanup(setattr, zipfile, "ZIP64_LIMIT", zipfile.ZIP64_LIMIT)
+        zipfile.ZIP64_LIMIT = 1000
+        catrobat_program = catbase.Project(None, "__test_project__")
+        self._write_package_with_deflated_entries(catrobat_program)
+
+        with zipfile.ZipFile(self.package_path) as zip_fp:
+            assert zip_fp.testzip() is None
+            assert zip_fp.getinfo("Scene 1/sounds/sound.wav").file_size > zipfile.ZIP64_LIMIT
+        self._assert_package_with_deflated_entries_readable_by_java(catrobat_program)
+
+    def test_can_store_compressed_media_and_deflate_other_files(self):
+        png_path = self._file_with_content("look.png", "\x89PNG" + "x" * 1000)
+        wav_path = self._file_with_content("sound.wav", "RIFF" + "y" * 1000)
+        with catrobatpackage.PackageWriter(self.package_path, store_compressed_media=True) as package_writer:
+            package_writer.add_empty_file(".nomedia")
+            package_writer.add_file(png_path, "Scene 1/images/look.png")
+            package_writer.add_file(wav_path, "Scene 1/sounds/sound.wav")
+
+        with zipfile.ZipFile(self.package_path) as zip_fp:
+            assert zip_fp.testzip() is None
+            assert zip_fp.namelist() == [".nomedia", "Scene 1/images/look.png", "Scene 1/sounds/sound.wav"]
+            assert zip_fp.getinfo("Scene 1/images/look.png").compress_type == zipfile.ZIP_STORED
+            assert zip_fp.getinfo("Scene 1/sounds/sound.wav").compress_type == zipfile.ZIP_DEFLATED
+            assert zip_fp.read("Scene 1/images/look.png") == "\x89PNG" + "x" * 1000
+            assert zip_fp.read("Scene 1/sounds/sound.wav") == "RIFF" + "y" * 1000
+            assert zip_fp.read(".nomedia") == ""
+
+    def test_adds_file_only_once_if_added_several_times_under_same_name(self):
+        wav_path = self._file_with_content("sound.wav", "RIFF" + "y" * 1000)
+        with catrobatpackage.PackageWriter(self.package_path) as package_writer:
+            for _ in range(3):
+                package_writer.add_file(wav_path, "Scene 1/sounds/sound.wav")
+
+        with zipfile.ZipFile(self.package_path) as zip_fp:
+            assert zip_fp.namelist() == ["Scene 1/sounds/sound.wav"]
+
+    def test_can_deflate_all_media_files(self):
+        png_path = self._file_with_content("look.png", "\x89PNG" + "x" * 1000)
+        with catrobatpackage.PackageWriter(self.package_path, store_compressed_media=False) as package_writer:
+            package_writer.add_file(png_path, "Scene 1/images/look.png")
+
+        with zipfile.ZipFile(self.package_path) as zip_fp:
+            assert zip_fp.getinfo("Scene 1/images/look.png").compress_type == zipfile.ZIP_DEFLATED
+            assert zip_fp.read("Scene 1/images/look.png") == "\x89PNG" + "x" * 1000
+
+    def test_can_deflate_files_concurrently_in_order_of_adding(self):
+        file_paths = [self._file_with_content("sound{}.wav".format(index), "RIFF" + str(index) * 5000 * index)
+                      for index in range(1, 10)]
+        png_path = self._file_with_content("look.png", "\x89PNG" + "x" * 1000)
+
+        def package_contents(package_path, max_concurrent_threads):
+            with catrobatpackage.PackageWriter(package_path, max_concurrent_threads=max_concurrent_threads) as package_writer:
+                package_writer.add_empty_file(".nomedia")
+                for index, file_path in enumerate(file_paths):
+                    package_writer.add_file(file_path, "Scene 1/sounds/" + os.path.basename(file_path))
+                    if index == 4:
+                        package_writer.add_file(png_path, "Scene 1/images/look.png")
+            with zipfile.ZipFile(package_path) as zip_fp:
+                assert zip_fp.testzip() is None
+                return [(zip_info.filename, zip_info.compress_type, zip_fp.read(zip_info))
+                        for zip_info in zip_fp.infolist()]
+
+        sequentially_packaged = package_contents(self.package_path, max_concurrent_threads=1)
+        concurrently_packaged = package_contents(os.path.join(self.temp_dir, "concurrent.catrobat"), max_concurrent_threads=4)
+        assert [entry[0] for entry in concurrently_packaged][:7] == [".nomedia", "Scene 1/sounds/sound1.wav",
+            "Scene 1/sounds/sound2.wav", "Scene 1/sounds/sound3.wav", "Scene 1/sounds/sound4.wav",
+            "Scene 1/sounds/sound5.wav", "Scene 1/images/look.png"]
+        assert concurrently_packaged == sequentially_packaged
+
+    def test_can_deflate_files_with_given_compression_level(self):
+        wav_path = self._file_with_content("sound.wav", "RIFF" + "".join(chr(index % 7) for index in range(50000)))
+
+        def compressed_size_with(compression_level):
+            package_path = os.path.join(self.temp_dir, "level{}.catrobat".format(compression_level))
+            with catrobatpackage.PackageWriter(package_path, compression_level=compression_level) as package_writer:
+                package_writer.add_file(wav_path, "Scene 1/sounds/sound.wav")
+            with zipfile.ZipFile(package_path) as zip_fp:
+                assert zip_fp.testzip() is None
+                return zip_fp.getinfo("Scene 1/sounds/sound.wav").compress_size
+
+        assert compressed_size_with(0) > 50000
+        assert compressed_size_with(9) < compressed_size_with(0)
+
+    def test_removes_incomplete_package_if_file_cannot_be_read(self):
+        with self.assertRaises(IOError):
+            with catrobatpackage.PackageWriter(self.package_path, max_concurrent_threads=2) as package_writer:
+                package_writer.add_file(os.path.join(self.temp_dir, "missing.wav"), "Scene 1/sounds/missing.wav")
+        assert not os.path.exists(self.package_path)
+
+    def test_can_stream_program_source_into_package(self):
+        catrobat_program = catbase.Project(None, "__test_project__")
+        with catrobatpackage.PackageWriter(self.package_path) as package_writer:
+            package_writer.add_program_source(catrobat_program, catrobat.PROGRAM_SOURCE_FILE_NAME)
+            package_writer.add_empty_file(".nomedia")
+
+        serializer = catrobat.xstream_serializer()
+        expected_program_source = serializer.XML_HEADER + serializer.xstream.toXML(catrobat_program)
+        with zipfile.ZipFile(self.package_path) as zip_fp:
+            assert zip_fp.testzip() is None
+            assert zip_fp.namelist() == [catrobat.PROGRAM_SOURCE_FILE_NAME, ".nomedia"]
+            zip_info = zip_fp.getinfo(catrobat.PROGRAM_SOURCE_FILE_NAME)
+            assert zip_info.compress_type == zipfile.ZIP_DEFLATED
+            assert zip_fp.read(catrobat.PROGRAM_SOURCE_FILE_NAME).decode("utf-8") == expected_program_source
+
+
+class DirectoryWriterTest(common_testing.BaseTestCase):
+
+    def test_can_write_files_into_program_directory(self):
+        program_dir = os.path.join(self.temp_dir, "program")
+        source_path = os.path.join(self.temp_dir, "look.png")
+        with open(source_path, "wb") as fp:
+            fp.write("\x89PNG")
+        directory_writer = catrobatpackage.DirectoryWriter(program_dir)
+        directory_writer.add_empty_file(os.path.join("Scene 1", "images", ".nomedia"))
+        directory_writer.add_file(source_path, os.path.join("Scene 1", "images", "look.png"))
+        assert os.path.getsize(os.path.join(program_dir, "Scene 1", "images", ".nomedia")) == 0
+        with open(os.path.join(program_dir, "Scene 1", "images", "look.png"), "rb") as fp:
+            assert fp.read() == "\x89PNG"
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -18,9 +18,13 @@
 #
 #  You should have received a copy of the GNU Affero General Public License
 #  along with this program.  If not, see http://www.gnu.org/licenses/.
+import hashlib
 import os
 import unittest
 import re
+import threading
+import time
+import zipfile
 
 import org.catrobat.catroid.common as catcommon
 import org.catrobat.catroid.content as catbase
@@ -30,10 +34,13 @@ import org.catrobat.catroid.content.bricks.Brick as catbasebrick
 import org.catrobat.catroid.formulaeditor as catformula
 import org.catrobat.catroid.formulaeditor.FormulaElement.ElementType as catElementType
 import xml.etree.cElementTree as ET
+from java.io import ByteArrayOutputStream
 
 from scratchtocatrobat.converter import catrobat
+from scratchtocatrobat.converter import catrobatpackage
 from scratchtocatrobat.tools import common
 from scratchtocatrobat.tools import common_testing
+from scratchtocatrobat.tools import stats
 from scratchtocatrobat.tools import svgtopng
 from scratchtocatrobat.scratch import scratch
 from scratchtocatrobat.converter import converter
@@ -1685,6 +1692,40 @@ class TestConvertBlocks(common_testing.BaseTestCase):
         assert formula_tree_message.leftChild is None
         assert formula_tree_message.rightChild is None
 
+    # moveNStepsBrick
+    def test_can_convert_repeated_blocks_with_cached_instantiation_try(self):
+        instantiation_try_numbers = converter._BlocksConversionTraverser._successful_instantiation_try_numbers
+        scratch_blocks = [["forward:", 10], ["forward:", 20], ["forward:", "steps"], ["forward:", "more steps"]]
+
+        def converted_steps_formula_tree(scratch_block):
+            [catr_brick] = self.block_converter._catrobat_bricks_from(scratch_block, DUMMY_CATR_SPRITE)
+            assert isinstance(catr_brick, catbricks.MoveNStepsBrick)
+            formula_tree = catr_brick.getFormulaWithBrickField(catbasebrick.BrickField.STEPS).formulaTree # @UndefinedVariable
+            return formula_tree.type, formula_tree.value
+
+        expected_formula_trees = []
+        for scratch_block in scratch_blocks:
+            instantiation_try_numbers.clear()
+            expected_formula_trees += [converted_steps_formula_tree(scratch_block)]
+
+        instantiation_try_numbers.clear()
+        conversion_stats = stats.ConversionStats()
+        with stats.recording(conversion_stats):
+            formula_trees = [converted_steps_formula_tree(scratch_block) for scratch_block in scratch_blocks]
+        assert formula_trees == expected_formula_trees
+        counters = conversion_stats.as_dict()["counters"]
+        assert counters["instantiationTryCacheMisses"] == 2
+        assert counters["instantiationTryCacheHits"] == 2
+
+    # sayBubbleBrick
+    def test_can_convert_say_bubble_brick_with_block_name_as_message(self):
+        scratch_block = _, expected_message = ["say:", "say:"]
+        [catr_brick] = self.block_converter._catrobat_bricks_from(scratch_block, DUMMY_CATR_SPRITE)
+        assert isinstance(catr_brick, catbricks.SayBubbleBrick)
+        formula_tree_message = catr_brick.getFormulaWithBrickField(catbasebrick.BrickField.STRING).formulaTree # @UndefinedVariable
+        assert catformula.FormulaElement.ElementType.STRING == formula_tree_message.type
+        assert expected_message == formula_tree_message.value
+
     # sayForBubbleBrick
     def test_can_convert_say_for_bubble_brick(self):
         scratch_block = _, expected_message, expected_duration = ["say:duration:elapsed:from:", "Hello!", 2]
@@ -1729,6 +1770,25 @@ class TestConvertBlocks(common_testing.BaseTestCase):
         assert formula_right_child.leftChild is None
         assert formula_right_child.rightChild is None
 
+    # sayBubbleBrick
+    def test_can_convert_say_bubble_brick_with_deeply_nested_formula(self):
+        nesting_depth = 1000
+        formula = 1
+        for _ in range(nesting_depth):
+            formula = ["+", formula, 2]
+        scratch_block = ["say:", formula]
+        [catr_brick] = self.block_converter._catrobat_bricks_from(scratch_block, DUMMY_CATR_SPRITE)
+        assert isinstance(catr_brick, catbricks.SayBubbleBrick)
+
+        formula_tree = catr_brick.getFormulaWithBrickField(catbasebrick.BrickField.STRING).formulaTree # @UndefinedVariable
+        for _ in range(nesting_depth):
+            assert catformula.FormulaElement.ElementType.OPERATOR == formula_tree.type
+            assert formula_tree.value == catformula.Operators.PLUS.toString() # @UndefinedVariable
+            assert formula_tree.rightChild.value == "2"
+            formula_tree = formula_tree.leftChild
+        assert catformula.FormulaElement.ElementType.NUMBER == formula_tree.type
+        assert formula_tree.value == "1"
+
     # sayForBubbleBrick
     def test_can_convert_say_for_bubble_brick_with_formulas(self):
         expected_left_operand = 1
@@ -2462,6 +2522,76 @@ class TestConvertBlocks(common_testing.BaseTestCase):
         assert key_pressed_condition_formula_tree.type == catElementType.USER_VARIABLE
         #If the addition of keys works, the addition of keys also works for this workaround. (Is tested separately.
 
+class _NameMarkerSearchingTraverser(converter._BlocksConversionTraverser):
+    # reference for the benchmark: locates the arguments by searching the name of the visited
+    # element, which is pushed to the stack when the element is entered
+    def _enter(self, script_element):
+        self._stack += [script_element.name]
+
+    def _pop_arguments_of(self, script_element):
+        arguments = self._pop_stack(len(self._stack) - self._stack[::-1].index(script_element.name))
+        del self._stack[-1]
+        return arguments
+
+
+class TestBlocksConversionTraverserPerformance(common_testing.BaseTestCase):
+
+    def setUp(self):
+        super(TestBlocksConversionTraverserPerformance, self).setUp()
+        self.test_project = catbase.Project(None, "__test_project__")
+        self.test_project.sceneList.add(catbase.Scene("Scene 1", self.test_project))
+
+    def _converted_bricks_and_duration_of(self, TraverserClass, script_element):
+        traverser = TraverserClass(DUMMY_CATR_SPRITE, self.test_project)
+        start_time = time.time()
+        traverser.traverse(script_element)
+        return traverser.converted_bricks, time.time() - start_time
+
+    def test_conversion_time_of_long_script(self):
+        number_of_blocks = 10000
+        raw_blocks = [["forward:", ["+", index, 1]] if index % 2 == 0 else ["turnRight:", 15]
+                      for index in range(number_of_blocks)]
+        script_element = scratch.ScriptElement.from_raw_block(raw_blocks)
+
+        [bricks], duration = self._converted_bricks_and_duration_of(converter._BlocksConversionTraverser, script_element)
+        [reference_bricks], reference_duration = self._converted_bricks_and_duration_of(_NameMarkerSearchingTraverser, script_element)
+        common.log.info("Conversion of %d blocks: %.3fs with index stack, %.3fs with name marker search",
+                        number_of_blocks, duration, reference_duration)
+
+        assert len(bricks) == len(reference_bricks) == number_of_blocks
+        assert [catrobat.simple_name_for(brick) for brick in bricks] == \
+               [catrobat.simple_name_for(brick) for brick in reference_bricks]
+
+
+class TestUserListInitialization(common_testing.BaseTestCase):
+
+    def test_fills_user_list_completely_before_scripts_of_object_start(self):
+        catrobat_project = catbase.Project(None, "__test_project__")
+        catrobat_scene = catbase.Scene("Scene 1", catrobat_project)
+        catrobat_project.sceneList.add(catrobat_scene)
+        sprite = create_catrobat_sprite_stub("Sprite1")
+        catrobat_scene.spriteList.add(sprite)
+        catrobat_scene.getDataContainer().addSpriteUserListToSprite(sprite, "level_data")
+        # converted "when green flag clicked" script of the object
+        green_flag_script = catbase.StartScript()
+        green_flag_script.addBrick(catbricks.ShowBrick())
+        sprite.addScript(green_flag_script)
+        values = ["a"] + [0] * 20 + ["b", 1.5]
+        scratch_object = scratch.Object({ "objName": "Sprite1", "lists": [{ "listName": "level_data", "contents": values }] })
+
+        converter._ScratchObjectConverter._add_default_behaviour_to(sprite, None, catrobat_scene, catrobat_project,
+                                                                    scratch_object, None, None)
+
+        # Catroid runs one iteration of a loop per frame -> the values must be added one by one without
+        # any loop, otherwise this and all other scripts started by the green flag see a partially filled list
+        start_script_bricks = sprite.getScriptList()[0].getBrickList()
+        assert [catrobat.simple_name_for(brick) for brick in start_script_bricks] == \
+               ["AddItemToUserListBrick"] * len(values) + ["ShowBrick"]
+        for brick, value in zip(start_script_bricks, values):
+            formula_tree_value = brick.getFormulaWithBrickField(catbasebrick.BrickField.LIST_ADD_ITEM).formulaTree # @UndefinedVariable
+            assert formula_tree_value.value == str(value)
+
+
 class TestConvertedProjectAppendedKeySpriteScripts(common_testing.ProjectTestCase):
     def _load_test_scratch_project(self, project_name):
         if os.path.splitext(project_name)[1]:
@@ -2599,6 +2729,100 @@ class TestConvertProjects(common_testing.ProjectTestCase):
                                                           unused_scratch_resources=scratch_project.unused_resource_names)
         return converted_project.catrobat_program
 
+    def _converted_program_xml(self, project_name, parallel_sprite_conversion=False):
+        scratch_project = self._load_test_scratch_project(project_name)
+        converted_project = converter.converted(scratch_project, None, converter.Context(), parallel_sprite_conversion)
+        return catrobat.xstream_serializer().xstream.toXML(converted_project.catrobat_program)
+
+    def test_can_convert_sprites_in_parallel_with_same_result_as_serial_conversion(self):
+        for project_name in ["dancing_castle", "keys_pressed", "visible_variables", "full_test", "simple"]:
+            serial_xml = self._converted_program_xml(project_name, parallel_sprite_conversion=False)
+            parallel_xml = self._converted_program_xml(project_name, parallel_sprite_conversion=True)
+            assert parallel_xml == serial_xml, \
+                   "Parallel conversion of '%s' differs from serial conversion" % project_name
+
+    def test_can_stream_program_source_with_same_result_as_in_memory_serialization(self):
+        scratch_project = self._load_test_scratch_project("full_test")
+        catrobat_program = converter.converted(scratch_project, None, converter.Context()).catrobat_program
+        output_stream = ByteArrayOutputStream()
+        catrobat.write_program_source_to(catrobat_program, output_stream)
+        serializer = catrobat.xstream_serializer()
+        assert output_stream.toString("UTF-8") == serializer.XML_HEADER + serializer.xstream.toXML(catrobat_program)
+
+    def test_can_package_program_directly_with_same_entries_as_via_program_directory(self):
+        packaged_file_names_of_mode = {}
+        packaged_files_of_mode = {}
+        for direct_to_zip_packaging in (False, True):
+            scratch_project = self._load_test_scratch_project("dancing_castle.zip")
+            converted_project = converter.converted(scratch_project, None, converter.Context())
+            output_dir = os.path.join(self._testresult_folder_path, "direct" if direct_to_zip_packaging else "via_directory")
+            conversion_stats = stats.ConversionStats()
+            start_time = time.time()
+            with stats.recording(conversion_stats):
+                package_path = converted_project.save_as_catrobat_package_to(output_dir, direct_to_zip_packaging=direct_to_zip_packaging)
+            duration = time.time() - start_time
+            common.log.info("Packaging %s: %d bytes written, %d bytes package in %.3fs",
+                            "direct-to-zip" if direct_to_zip_packaging else "via program directory",
+                            conversion_stats.as_dict()["counters"]["packagingBytesWritten"],
+                            os.path.getsize(package_path), duration)
+
+            with zipfile.ZipFile(package_path) as zip_fp:
+                assert zip_fp.testzip() is None
+                packaged_file_names_of_mode[direct_to_zip_packaging] = zip_fp.namelist()
+                packaged_files_of_mode[direct_to_zip_packaging] = dict((file_name, zip_fp.read(file_name))
+                                                                       for file_name in zip_fp.namelist())
+
+        # the program directory holds each file once -> no duplicate entries in direct-to-zip packages
+        packaged_file_names, directly_packaged_file_names = packaged_file_names_of_mode[False], packaged_file_names_of_mode[True]
+        assert len(directly_packaged_file_names) == len(set(directly_packaged_file_names))
+        assert len(directly_packaged_file_names) == len(packaged_file_names)
+        assert sorted(directly_packaged_file_names) == sorted(packaged_file_names)
+        packaged_files, directly_packaged_files = packaged_files_of_mode[False], packaged_files_of_mode[True]
+        for file_name, content in packaged_files.iteritems():
+            if file_name != catrobat.PROGRAM_SOURCE_FILE_NAME:
+                assert directly_packaged_files[file_name] == content, file_name
+
+    def test_can_package_same_project_to_byte_identical_packages(self):
+        package_hashes = []
+        for index in range(2):
+            scratch_project = self._load_test_scratch_project("dancing_castle.zip")
+            converted_project = converter.converted(scratch_project, None, converter.Context())
+            output_dir = os.path.join(self._testresult_folder_path, "deterministic{}".format(index))
+            package_path = converted_project.save_as_catrobat_package_to(output_dir, deterministic_packaging=True)
+            with zipfile.ZipFile(package_path) as zip_fp:
+                assert zip_fp.testzip() is None
+                assert zip_fp.namelist() == sorted(zip_fp.namelist())
+                assert all(zip_info.date_time == catrobatpackage.FIXED_ENTRY_DATE_TIME for zip_info in zip_fp.infolist())
+            with open(package_path, "rb") as fp:
+                package_hashes += [hashlib.sha256(fp.read()).hexdigest()]
+        assert package_hashes[0] == package_hashes[1]
+
+    def test_can_convert_projects_concurrently_without_interference(self):
+        project_names = ["dancing_castle", "keys_pressed", "visible_variables", "full_test", "simple"]
+        num_runs_per_project = 3
+        expected_xml_of_project = dict((name, self._converted_program_xml(name)) for name in project_names)
+
+        results = []
+        errors = []
+        def convert(project_name):
+            try:
+                results.append((project_name, self._converted_program_xml(project_name)))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=convert, args=(project_name,))
+                   for _ in range(num_runs_per_project) for project_name in project_names]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(errors) == 0, errors
+        assert len(results) == len(project_names) * num_runs_per_project
+        for project_name, program_xml in results:
+            assert program_xml == expected_xml_of_project[project_name], \
+                   "Concurrent conversion of '%s' differs from serial conversion" % project_name
+
     # Checks if the visible global or local variables in the scratch program are converted into show test bricks in the converted project
     def test_can_convert_visible_variables(self):
         scratch_project = self._load_test_scratch_project("visible_variables")
@@ -0,0 +1,118 @@
+#  ScratchToCatrobat: A tool for converting Scratch projects into Catrobat programs.
+#  Copyright (C) 2013-2017 The Catrobat Team
+#  (http://developer.catrobat.org/credits)
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Affero General Public License as
+#  published by the Free Software Foundation, either version 3 of the
+#  License, or (at your option) any later version.
+#
+#  An additional term exception under section 7 of the GNU Affero
+#  General Public License, version 3, is available at
+#  http://developer.catrobat.org/license_additional_term
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU Affero General Public License for more details.
+#
+#  You should have received a copy of the GNU Affero General Public License
+#  along with this program.  If not, see http://www.gnu.org/licenses/.
+import unittest
+
+import org.catrobat.catroid.content.bricks as catbricks
+import org.catrobat.catroid.content.bricks.Brick as catbasebrick
+import org.catrobat.catroid.formulaeditor as catformula
+import org.catrobat.catroid.formulaeditor.FormulaElement.ElementType as catElementType
+
+from scratchtocatrobat.converter import formulaoptimizer
+
+
+def _element(element_type, value=None, left_child=None, right_child=None):
+    formula_element = catformula.FormulaElement(element_type, value, None)
+    if left_child is not None:
+        formula_element.setLeftChild(left_child)
+    if right_child is not None:
+        formula_element.setRightChild(right_child)
+    return formula_element
+
+def _number(value):
+    return _element(catElementType.NUMBER, value)
+
+def _operator(operator, left_child, right_child):
+    return _element(catElementType.OPERATOR, str(operator), left_child, right_child)
+
+def _bracket(child):
+    return _element(catElementType.BRACKET, None, None, child)
+
+def _variable(name):
+    return _element(catElementType.USER_VARIABLE, name)
+
+
+class FormulaOptimizerTest(unittest.TestCase):
+
+    def test_can_fold_constant_arithmetic(self):
+        # (2 + 3) * 4.5
+        formula_element = _operator(catformula.Operators.MULT, _bracket(_operator(catformula.Operators.PLUS, _number("2"), _number("3"))), _number("4.5"))
+        simplified_element = formulaoptimizer.simplified_formula_element(formula_element)
+        assert simplified_element.getElementType() == catElementType.NUMBER
+        assert simplified_element.getValue() == "22.5"
+
+    def test_can_fold_to_negative_number(self):
+        simplified_element = formulaoptimizer.simplified_formula_element(_operator(catformula.Operators.MINUS, _number("1.0"), _number("3")))
+        assert simplified_element.getElementType() == catElementType.OPERATOR
+        assert simplified_element.getValue() == str(catformula.Operators.MINUS)
+        assert simplified_element.leftChild is None
+        assert simplified_element.rightChild.getValue() == "2"
+
+    def test_can_keep_operations_with_variables(self):
+        # x + (2 * 3)
+        formula_element = _operator(catformula.Operators.PLUS, _variable("x"), _bracket(_operator(catformula.Operators.MULT, _number("2"), _number("3"))))
+        simplified_element = formulaoptimizer.simplified_formula_element(formula_element)
+        assert simplified_element.getValue() == str(catformula.Operators.PLUS)
+        assert simplified_element.leftChild.getValue() == "x"
+        assert simplified_element.rightChild.getElementType() == catElementType.NUMBER
+        assert simplified_element.rightChild.getValue() == "6"
+
+    def test_can_keep_brackets_grouping_operations(self):
+        # (x - 1) * (x - 1)
+        formula_element = _operator(catformula.Operators.MULT,
+                                    _bracket(_operator(catformula.Operators.MINUS, _variable("x"), _number("1"))),
+                                    _bracket(_operator(catformula.Operators.MINUS, _variable("x"), _number("1"))))
+        simplified_element = formulaoptimizer.simplified_formula_element(formula_element)
+        assert simplified_element.leftChild.getElementType() == catElementType.BRACKET
+        assert simplified_element.rightChild.getElementType() == catElementType.BRACKET
+
+    def test_can_drop_needless_brackets(self):
+        # sqrt(((x - 1))) -> sqrt(x - 1)
+        function_element = _element(catElementType.FUNCTION, str(catformula.Functions.SQRT), _bracket(_bracket(
+                                    _operator(catformula.Operators.MINUS, _variable("x"), _number("1")))))
+        simplified_element = formulaoptimizer.simplified_formula_element(_bracket(function_element))
+        assert simplified_element.getElementType() == catElementType.FUNCTION
+        assert simplified_element.parent is None
+        assert simplified_element.leftChild.getValue() == str(catformula.Operators.MINUS)
+        assert simplified_element.leftChild.parent == simplified_element
+
+    def test_can_not_fold_division_by_zero(self):
+        formula_element = _operator(catformula.Operators.DIVIDE, _number("1"), _number("0"))
+        simplified_element = formulaoptimizer.simplified_formula_element(formula_element)
+        assert simplified_element.getValue() == str(catformula.Operators.DIVIDE)
+
+    def test_can_fold_join_of_strings(self):
+        formula_element = _element(catElementType.FUNCTION, str(catformula.Functions.JOIN),
+                                   _element(catElementType.STRING, "Hello "), _element(catElementType.STRING, "World"))
+        simplified_element = formulaoptimizer.simplified_formula_element(formula_element)
+        assert simplified_element.getElementType() == catElementType.STRING
+        assert simplified_element.getValue() == "Hello World"
+
+    def test_can_simplify_formulas_of_brick(self):
+        formula = catformula.Formula(_operator(catformula.Operators.PLUS, _number("1"), _number("2")))
+        brick = catbricks.WaitBrick(formula)
+        formulaoptimizer.simplify_formulas_of(brick)
+        formula_tree = brick.getFormulaWithBrickField(catbasebrick.BrickField.TIME_TO_WAIT_IN_SECONDS).formulaTree # @UndefinedVariable
+        assert formula_tree.getElementType() == catElementType.NUMBER
+        assert formula_tree.getValue() == "3"
+
+
+if __name__ == "__main__":
+    unittest.main()
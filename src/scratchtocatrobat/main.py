@@ -40,7 +40,10 @@ def run_converter(scratch_project_file_or_url, output_dir,
                   extract_resulting_catrobat=False, temp_rm=True,
                   show_version_only=False, show_info_only=False,
                   archive_name=None,
-                  web_mode=False):
+                  web_mode=False,
+                  output_stream=sys.stdout,
+                  stats_file=None,
+                  use_cache=None):
     def check_base_environment():
         if "java" not in sys.platform:
             raise EnvironmentError("Must be called with Jython interpreter.")
@@ -52,6 +55,13 @@ def run_converter(scratch_project_file_or_url, output_dir,
         tools.svgtopng._checked_batik_jar_path()
         tools.wavconverter._checked_sox_path()
 
+    def report_stats(conversion_stats):
+        if stats_file is not None:
+            conversion_stats.write_to(stats_file)
+            log.info("Conversion statistics written to: %s", stats_file)
+        if web_mode and output_stream is not None:
+            output_stream.write(helpers.ConversionStatsProtocol.stats_line(conversion_stats.as_dict()))
+
     try:
         from java.io import IOError
         from java.lang import System
@@ -60,11 +70,12 @@ def run_converter(scratch_project_file_or_url, output_dir,
         return helpers.ExitCode.FAILURE
 
     # nested import to be able to check for Jython interpreter first
-    from scratchtocatrobat import tools
-    from scratchtocatrobat.tools import common
+    from scratchtocatrobat import tools, resultcache
+    from scratchtocatrobat.tools import common, stats
     from scratchtocatrobat.converter import converter, catrobat
-    from scratchtocatrobat.scratch import scratchwebapi, scratch
+    from scratchtocatrobat.scratch import scratchwebapi, scratch, projectarchive
 
+    conversion_stats = None
     try:
         check_base_environment()
         check_converter_environment()
@@ -96,17 +107,20 @@ def run_converter(scratch_project_file_or_url, output_dir,
         if not os.path.isdir(output_dir):
             raise EnvironmentError("Output folder must be a directory, but is %s" % output_dir)
         scratch3ProjectName = "Untitled"
-        progress_bar = helpers.ProgressBar(None, web_mode, sys.stdout)
-        with common.TemporaryDirectory(remove_on_exit=temp_rm) as scratch_project_dir:
+        progress_bar = helpers.ProgressBar(None, web_mode, output_stream)
+        conversion_stats = stats.ConversionStats(scratch_project_file_or_url)
+        with stats.recording(conversion_stats), \
+             common.TemporaryDirectory(remove_on_exit=temp_rm) as scratch_project_dir:
             is_local_project = True
             if scratch_project_file_or_url.startswith("https://"):
                 is_local_project = False
                 validate_scratch_url(scratch_project_file_or_url)
 
                 project_ID = scratchwebapi.extract_project_id_from_url(scratch_project_file_or_url)
-                if not scratchwebapi.request_is_project_available(project_ID):
-                    raise common.ScratchtobatError("Project with ID %s not available" % project_ID)
-                visibility = scratchwebapi.getMetaDataEntry(project_ID, "visibility")
+                with stats.phase(stats.METADATA):
+                    if not scratchwebapi.request_is_project_available(project_ID):
+                        raise common.ScratchtobatError("Project with ID %s not available" % project_ID)
+                    visibility = scratchwebapi.getMetaDataEntry(project_ID, "visibility")
                 if visibility != scratchwebapi.ScratchProjectVisibiltyState.PUBLIC:
                     log.warn('-'*80)
                     log.warn("CAVE: Project with ID %s is NOT a public project!! Trying to " \
@@ -115,12 +129,15 @@ def run_converter(scratch_project_file_or_url, output_dir,
                     log.warn('-'*80)
                 log.info("Downloading project from URL: '{}' to temp dir {} ...".format(
                                                 scratch_project_file_or_url, scratch_project_dir))
-                scratchwebapi.download_project(scratch_project_file_or_url, scratch_project_dir, progress_bar)
-                scratch3ProjectName = scratchwebapi.getMetaDataEntry(project_ID, "title")
+                with stats.phase(stats.DOWNLOAD):
+                    scratchwebapi.download_project(scratch_project_file_or_url, scratch_project_dir, progress_bar)
+                with stats.phase(stats.METADATA):
+                    scratch3ProjectName = scratchwebapi.getMetaDataEntry(project_ID, "title")
 
             elif os.path.isfile(scratch_project_file_or_url):
                 log.info("Extracting project from path: '{}' ...".format(scratch_project_file_or_url))
-                common.extract(scratch_project_file_or_url, scratch_project_dir)
+                with stats.phase(stats.EXTRACT):
+                    projectarchive.extract(scratch_project_file_or_url, scratch_project_dir)
 
             else:
                 if not os.path.isdir(scratch_project_file_or_url):
@@ -131,38 +148,61 @@ def run_converter(scratch_project_file_or_url, output_dir,
 
 
             isScratch3Project = False # TODO: change, currently we can't have Scratch3FromDownload
-            if os.path.isfile(scratch_project_dir + '/' +helpers.config.get("SCRATCH","code_file_name")):
-                with open(os.path.join(scratch_project_dir, helpers.config.get("SCRATCH","code_file_name")),'r') as file:
-                    import json
-                    project_dict = json.load(file)
-                    if "targets" in project_dict.keys():
-                        isScratch3Project = True
-
-
-
-
-                    # isScratch3Project = scratch_project_file_or_url.endswith(".sb3")
-                # if not isScratch3Project:
-                #     project = scratch.RawProject.from_project_folder_path(scratch_project_dir)
-                #     progress_bar.expected_progress = project.expected_progress_of_local_project(progress_bar)
-
+            project_dict = None
+            with stats.phase(stats.JSON_LOAD):
+                if os.path.isfile(scratch_project_dir + '/' +helpers.config.get("SCRATCH","code_file_name")):
+                    with open(os.path.join(scratch_project_dir, helpers.config.get("SCRATCH","code_file_name")),'r') as file:
+                        import json
+                        project_dict = json.load(file)
+                        if "targets" in project_dict.keys():
+                            isScratch3Project = True
+
+
+
+
+                        # isScratch3Project = scratch_project_file_or_url.endswith(".sb3")
+                    # if not isScratch3Project:
+                    #     project = scratch.RawProject.from_project_folder_path(scratch_project_dir)
+                    #     progress_bar.expected_progress = project.expected_progress_of_local_project(progress_bar)
+
+            result_cache, cache_key = None, None
+            if use_cache is None:
+                use_cache = resultcache.CACHE_ENABLED and not extract_resulting_catrobat
+            if use_cache and project_dict is not None:
+                result_cache = resultcache.ConversionResultCache()
+                cache_key = resultcache.cache_key_for(scratch_project_dir, project_dict,
+                              project_ID if not is_local_project else project_dict.get("info", {}).get("projectID"))
+                common.makedirs(output_dir)
+                catrobat_program_path = result_cache.copy_to(cache_key, lambda project_name:
+                                          converter.ConvertedProject._converted_output_path(
+                                            output_dir, archive_name if archive_name is not None else project_name))
+                if catrobat_program_path is not None:
+                    log.info("Conversion result taken from cache: %s", catrobat_program_path)
+                    progress_bar.finish()
+                    return helpers.ExitCode.SUCCESS
+
+            scratch2Data = None
             if isScratch3Project:
-                from scratch.scratch3 import Scratch3Parser
-                parser = Scratch3Parser(os.path.join(scratch_project_dir, helpers.config.get("SCRATCH","code_file_name")), scratch_project_dir)
-                scratch2Data = parser.parse_sprites()
-                with open(os.path.join(scratch_project_dir, helpers.config.get("SCRATCH","code_file_name")),'w') as file:
-                    file.flush()
-                    import json
-                    #json.dump(json.JSONEncoder.encode(scratch3data),file)
-                    json.dump(scratch2Data, file, sort_keys=True, indent=4, separators=(',', ': '))
-
-            project = scratch.Project(scratch_project_dir, progress_bar=progress_bar, is_local_project = is_local_project)
+                with stats.phase(stats.JSON_LOAD):
+                    from scratch.scratch3 import Scratch3Parser
+                    parser = Scratch3Parser(os.path.join(scratch_project_dir, helpers.config.get("SCRATCH","code_file_name")), scratch_project_dir)
+                    scratch2Data = parser.parse_sprites()
+
+            # the Scratch 2 data of a Scratch 3 project is passed on directly (no need to write it to disk and read it again)
+            project = scratch.Project(scratch_project_dir, progress_bar=progress_bar, is_local_project = is_local_project,
+                                      project_code=scratch2Data)
             if isScratch3Project:
                 project.name = scratch3ProjectName
             log.info("Converting scratch project '%s' into output folder: %s", project.name, output_dir)
             context = converter.Context()
-            converted_project = converter.converted(project, progress_bar, context)
+            with stats.phase(stats.SCRIPTS):
+                converted_project = converter.converted(project, progress_bar, context)
             catrobat_program_path = converted_project.save_as_catrobat_package_to(output_dir, archive_name, progress_bar, context)
+            if result_cache is not None and converted_project.is_automatic_screenshot_missing:
+                # a later conversion may get the screenshot -> do not keep serving the incomplete result
+                log.info("Automatic screenshot missing, conversion result is not cached")
+            elif result_cache is not None:
+                result_cache.store(cache_key, catrobat_program_path, converted_project.name)
             if extract_resulting_catrobat:
                 extraction_path = os.path.join(output_dir, os.path.splitext(os.path.basename(catrobat_program_path))[0])
                 common.rm_dir(extraction_path)
@@ -178,6 +218,9 @@ def run_converter(scratch_project_file_or_url, output_dir,
     except Exception as e:
         log.exception(e)
         return helpers.ExitCode.FAILURE
+    finally:
+        if conversion_stats is not None:
+            report_stats(conversion_stats)
     return helpers.ExitCode.SUCCESS
 
 
@@ -188,9 +231,11 @@ def main():
     usage = '''Scratch to Catrobat converter
 
     Usage:
-      'main.py' <project-url-or-package-path> <output-dir> <archive-name> [--extracted] [--no-temp-rm] [--web-mode]
-      'main.py' <project-url-or-package-path> <output-dir> [--extracted] [--no-temp-rm]
-      'main.py' <project-url-or-package-path> [--extracted] [--no-temp-rm]
+      'main.py' <project-url-or-package-path> <output-dir> <archive-name> [--extracted] [--no-temp-rm] [--web-mode] [--stats=<stats-file>] [--no-cache]
+      'main.py' <project-url-or-package-path> <output-dir> [--extracted] [--no-temp-rm] [--stats=<stats-file>] [--no-cache]
+      'main.py' <project-url-or-package-path> [--extracted] [--no-temp-rm] [--stats=<stats-file>] [--no-cache]
+      'main.py' --batch <batch-input> <output-dir> [--workers=<num>] [--summary=<summary-file>] [--no-temp-rm]
+      'main.py' --service
       'main.py' --version
       'main.py' --info
 
@@ -198,13 +243,31 @@ def main():
       -h --help         Shows this screen.
       --version         Shows version of this application.
       --info            Shows information and configuration details about this application.
+      --batch           Converts all .sb2/.sb3 files of the directory <batch-input> or all
+                        project URLs/IDs listed in the manifest file <batch-input>.
+      --workers=<num>   Number of concurrent conversions in batch mode.
+      --summary=<summary-file>  Path of the batch summary JSON file (defaults to <output-dir>/batch_summary.json).
+      --service         Runs as resident conversion service (see [CONVERTER_SERVICE] in config).
       -e --extracted    Extract resulting Catrobat program in output-dir.
+      --stats=<stats-file>  Writes timing and memory statistics of each conversion phase as JSON file.
+      --no-cache        Always converts the project, even if a cached result exists (see [CONVERSION_CACHE] in config).
     '''
     arguments = docopt(usage)
 
     # TODO: setup signal handler!
 
     try:
+        if arguments["--service"]:
+            from scratchtocatrobat import service
+            sys.exit(service.serve_forever(run_converter))
+
+        if arguments["--batch"]:
+            from scratchtocatrobat import batch
+            batch_kwargs = { 'summary_path': arguments["--summary"], 'temp_rm': not arguments["--no-temp-rm"] }
+            if arguments["--workers"]:
+                batch_kwargs['num_workers'] = int(arguments["--workers"])
+            sys.exit(batch.run_batch(run_converter, arguments["<batch-input>"], arguments["<output-dir>"], **batch_kwargs))
+
         kwargs = {}
         kwargs['extract_resulting_catrobat'] = arguments["--extracted"]
         kwargs['temp_rm'] = not arguments["--no-temp-rm"]
@@ -212,6 +275,9 @@ def main():
         kwargs['show_version_only'] = arguments["--version"]
         kwargs['show_info_only'] = arguments["--info"]
         kwargs['archive_name'] = arguments["<archive-name>"]
+        kwargs['stats_file'] = arguments["--stats"]
+        if arguments["--no-cache"]:
+            kwargs['use_cache'] = False
         output_dir = helpers.config.get("PATHS", "output")
         output_dir = arguments["<output-dir>"] if arguments["<output-dir>"] != None else output_dir
         project_url_or_package_path = ""
@@ -0,0 +1,173 @@
+#  ScratchToCatrobat: A tool for converting Scratch projects into Catrobat programs.
+#  Copyright (C) 2013-2017 The Catrobat Team
+#  (http://developer.catrobat.org/credits)
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Affero General Public License as
+#  published by the Free Software Foundation, either version 3 of the
+#  License, or (at your option) any later version.
+#
+#  An additional term exception under section 7 of the GNU Affero
+#  General Public License, version 3, is available at
+#  http://developer.catrobat.org/license_additional_term
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU Affero General Public License for more details.
+#
+#  You should have received a copy of the GNU Affero General Public License
+#  along with this program.  If not, see http://www.gnu.org/licenses/.
+
+"""
+  Content-addressed cache of conversion results.
+  Converted .catrobat files are stored on disk under a key derived from the normalized
+  project.json, the asset files of the project, its web metadata and the versions of
+  converter and Catrobat language. The cache is bounded in size and evicts the least
+  recently used entries first.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+from scratchtocatrobat.tools import common
+from scratchtocatrobat.tools import helpers
+from scratchtocatrobat.tools import logger
+from scratchtocatrobat.tools import stats
+
+log = logger.log
+
+CACHE_ENABLED = str(helpers.config.get("CONVERSION_CACHE", "enabled")) in {"True", "1"}
+CACHE_DIR = helpers.config.get("PATHS", "conversion_cache")
+MAX_CACHE_SIZE_IN_BYTES = int(helpers.config.get("CONVERSION_CACHE", "max_size_mb")) * 1024 * 1024
+PROGRAM_FILE_EXTENSION = helpers.catrobat_info("file_extension")
+ENTRY_INFO_FILE_EXTENSION = ".json"
+# all settings of these sections (may) change the converted program
+_CONFIG_SECTIONS_OF_KEY = ("CONVERTER", "CATROBAT")
+
+# serializes all accesses of the cache directory done by this process (other processes are
+# handled by atomic renames and by treating entries that vanish meanwhile as misses)
+_cache_lock = threading.RLock()
+
+
+def cache_key_for(project_dir, project_code, project_id=None):
+    from scratchtocatrobat.scratch import scratchwebapi
+    code_file_name = helpers.scratch_info("code_file_name")
+    key_hash = hashlib.sha256()
+    key_hash.update(json.dumps({
+        "converterVersion": helpers.application_info("version"),
+        "converterBuildNumber": helpers.application_info("build_number"),
+        "catrobatLanguageVersion": helpers.catrobat_info("catrobat_language_version"),
+        "settings": dict((section, dict(helpers.config.items(section))) for section in _CONFIG_SECTIONS_OF_KEY)
+    }, sort_keys=True))
+    key_hash.update(json.dumps(project_code, sort_keys=True, separators=(',', ':')))
+
+    # Scratch 3 projects (and local Scratch 2 projects) ship their assets next to the project.json
+    for file_name in sorted(os.listdir(project_dir)):
+        file_path = os.path.join(project_dir, file_name)
+        if file_name != code_file_name and os.path.isfile(file_path):
+            key_hash.update("{}:{}".format(file_name.encode("utf-8") if isinstance(file_name, unicode) else file_name,
+                                           common.md5_hash(file_path)))
+
+    # title and description of shared projects are not part of the project.json
+    if project_id:
+        metadata = scratchwebapi.getMetaDataEntry(project_id, "title", "instructions", "description", "image")
+        key_hash.update(json.dumps({ "projectID": project_id, "metadata": metadata }, sort_keys=True))
+    return key_hash.hexdigest()
+
+
+class ConversionResultCache(object):
+
+    def __init__(self, cache_dir=CACHE_DIR, max_size_in_bytes=MAX_CACHE_SIZE_IN_BYTES):
+        self.cache_dir = cache_dir
+        self.max_size_in_bytes = max_size_in_bytes
+
+    def _program_path_of(self, key):
+        return os.path.join(self.cache_dir, key + PROGRAM_FILE_EXTENSION)
+
+    def _entry_info_path_of(self, key):
+        return os.path.join(self.cache_dir, key + ENTRY_INFO_FILE_EXTENSION)
+
+    def _update_counter(self, counter_name):
+        stats.increment("resultCache" + counter_name[0].upper() + counter_name[1:])
+
+    def _write_atomically(self, file_path, write_to_temp_file):
+        # other processes may share the cache directory -> they must never see a partially written file
+        fd, temp_file_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            os.close(fd)
+            write_to_temp_file(temp_file_path)
+            os.rename(temp_file_path, file_path)
+        except:
+            if os.path.exists(temp_file_path):
+                os.remove(temp_file_path)
+            raise
+
+    def copy_to(self, key, output_path_of_project_name):
+        """
+        Copies the cached conversion result of the given key to output_path_of_project_name(project_name).
+        Returns the path of the copy or None if the key is not (or no longer) cached.
+        """
+        with _cache_lock:
+            program_path = self._program_path_of(key)
+            try:
+                with open(self._entry_info_path_of(key)) as fp:
+                    project_name = json.load(fp)["projectName"]
+                output_path = output_path_of_project_name(project_name)
+                try:
+                    shutil.copyfile(program_path, output_path)
+                    # the modification time of an entry keeps track of its last usage (-> LRU eviction)
+                    os.utime(program_path, None)
+                except (IOError, OSError):
+                    # evicted meanwhile (e.g. by another process) -> do not leave an incomplete copy behind
+                    if os.path.exists(output_path):
+                        os.remove(output_path)
+                    raise
+            except (IOError, OSError, ValueError, KeyError):
+                self._update_counter("misses")
+                return None
+            self._update_counter("hits")
+            return output_path
+
+    def store(self, key, catrobat_program_path, project_name):
+        with _cache_lock:
+            common.makedirs(self.cache_dir)
+            self._write_atomically(self._program_path_of(key),
+                                   lambda temp_file_path: shutil.copyfile(catrobat_program_path, temp_file_path))
+
+            def write_entry_info(temp_file_path):
+                with open(temp_file_path, "w") as fp:
+                    json.dump({ "projectName": project_name }, fp)
+            self._write_atomically(self._entry_info_path_of(key), write_entry_info)
+            self._evict_least_recently_used_entries(keep_key=key)
+
+    def _evict_least_recently_used_entries(self, keep_key):
+        entries = []
+        for file_name in os.listdir(self.cache_dir):
+            key, extension = os.path.splitext(file_name)
+            if extension != PROGRAM_FILE_EXTENSION:
+                continue
+            program_path = self._program_path_of(key)
+            try:
+                entries += [(os.path.getmtime(program_path), os.path.getsize(program_path), key)]
+            except OSError:
+                pass # evicted by another process meanwhile
+
+        cache_size = sum(size for _, size, _ in entries)
+        for _, size, key in sorted(entries):
+            if cache_size <= self.max_size_in_bytes:
+                break
+            if key == keep_key:
+                continue
+            log.debug("Evicting cached conversion result %s", key)
+            for file_path in [self._program_path_of(key), self._entry_info_path_of(key)]:
+                try:
+                    os.remove(file_path)
+                except OSError:
+                    pass # evicted by another process meanwhile
+            cache_size -= size
+            self._update_counter("evictions")
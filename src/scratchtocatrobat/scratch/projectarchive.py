@@ -0,0 +1,90 @@
+#  ScratchToCatrobat: A tool for converting Scratch projects into Catrobat programs.
+#  Copyright (C) 2013-2017 The Catrobat Team
+#  (http://developer.catrobat.org/credits)
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Affero General Public License as
+#  published by the Free Software Foundation, either version 3 of the
+#  License, or (at your option) any later version.
+#
+#  An additional term exception under section 7 of the GNU Affero
+#  General Public License, version 3, is available at
+#  http://developer.catrobat.org/license_additional_term
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU Affero General Public License for more details.
+#
+#  You should have received a copy of the GNU Affero General Public License
+#  along with this program.  If not, see http://www.gnu.org/licenses/.
+
+"""
+  Reads local .sb2/.sb3 archives in place.
+  The project code and the digests of all assets are read straight from the archive.
+  Only the project code and the assets it refers to get written to the project
+  directory, since the media converter (Batik, SoX, ...) needs them as files.
+"""
+
+import hashlib
+import os
+import zipfile
+
+from scratchtocatrobat.tools import common
+from scratchtocatrobat.tools import filedigest
+from scratchtocatrobat.tools import helpers
+from scratchtocatrobat.tools import logger
+from scratchtocatrobat.tools import stats
+
+log = logger.log
+
+_PROJECT_FILE_NAME = helpers.scratch_info("code_file_name")
+EXTRACT_USED_ASSETS_ONLY = str(helpers.config.get("CONVERTER", "extract_used_assets_only")) in {"True", "1"}
+
+
+def _md5_of_entry(zip_file, entry):
+    entry_hash = hashlib.md5()
+    entry_file = zip_file.open(entry)
+    try:
+        for chunk in iter(lambda: entry_file.read(filedigest.CHUNK_SIZE_IN_BYTES), b""):
+            entry_hash.update(chunk)
+    finally:
+        entry_file.close()
+    return entry_hash.hexdigest()
+
+
+def _is_asset_entry(entry):
+    return "/" not in entry.filename and entry.filename != _PROJECT_FILE_NAME
+
+
+def extract_used_files(archive_path, extraction_path):
+    with zipfile.ZipFile(archive_path, 'r') as zip_file:
+        if _PROJECT_FILE_NAME not in zip_file.namelist():
+            # no project code to tell used from unused assets
+            zip_file.extractall(extraction_path)
+            return
+
+        project_code_content = zip_file.read(_PROJECT_FILE_NAME)
+        for entry in zip_file.infolist():
+            if not _is_asset_entry(entry):
+                zip_file.extract(entry, extraction_path)
+                continue
+
+            md5_hash = _md5_of_entry(zip_file, entry)
+            # Scratch 2 refers to assets by their hash, Scratch 3 by their asset ID (= name of the
+            # entry, which may differ from the hash). Superfluous matches only cost an extraction.
+            entry_name = entry.filename.encode("utf-8") if isinstance(entry.filename, unicode) else entry.filename
+            quoted_asset_id = '"{}"'.format(os.path.splitext(entry_name)[0])
+            if md5_hash not in project_code_content and quoted_asset_id not in project_code_content:
+                log.info("Ignoring unused resource file: %s", entry.filename)
+                stats.increment("unusedAssetsSkipped")
+                continue
+            file_path = zip_file.extract(entry, extraction_path)
+            filedigest.remember_md5_of(file_path, md5_hash)
+
+
+def extract(archive_path, extraction_path):
+    if EXTRACT_USED_ASSETS_ONLY:
+        extract_used_files(archive_path, extraction_path)
+    else:
+        common.extract(archive_path, extraction_path)
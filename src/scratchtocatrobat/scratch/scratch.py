@@ -27,14 +27,18 @@ import os
 import sys
 
 from scratchtocatrobat.tools import common
+from scratchtocatrobat.tools import filedigest
 from scratchtocatrobat.scratch import scratchwebapi
 from scratchtocatrobat.tools import helpers
+from scratchtocatrobat.tools import stats
 from scratchtocatrobat.tools.helpers import ProgressType
 from scratchtocatrobat.scratch import scriptcodemodifier
 
 _log = common.log
 
 _PROJECT_FILE_NAME = helpers.scratch_info("code_file_name")
+COPY_ON_WRITE_PROJECT_DATA = str(helpers.config.get("CONVERTER", "copy_on_write_project_data")) in {"True", "1"}
+MERGE_HELPER_UPDATE_LOOPS = str(helpers.config.get("CONVERTER", "merge_helper_update_loops")) in {"True", "1"}
 
 class JsonKeys(object):
     BASELAYER_ID = "baseLayerID"
@@ -96,8 +100,8 @@ def verify_resources_of_scratch_object(scratch_object, md5_to_resource_path_map,
 # TODO: rename
 class Object(common.DictAccessWrapper):
 
-    def __init__(self, object_data):
-        super(Object, self).__init__(object_data)
+    def __init__(self, object_data, copy_on_write=False):
+        super(Object, self).__init__(object_data, copy_on_write)
         if not self.is_scratch2_project(object_data):
             if not self.is_scratch3_project(object_data):
                 raise ObjectError("Input is no valid Scratch object.")
@@ -106,7 +110,7 @@ class Object(common.DictAccessWrapper):
                 return
         for key in (JsonKeys.SOUNDS, JsonKeys.COSTUMES, JsonKeys.SCRIPTS, JsonKeys.LISTS, JsonKeys.VARIABLES):
             if key not in object_data:
-                self._dict_object[key] = []
+                self._set_value(key, [])
         self.name = self.get_objName()
         self.scripts = [Script(script) for script in self.get_scripts() if Script.is_valid_script_input(script)]
         number_of_ignored_scripts = len(self.get_scripts()) - len(self.scripts)
@@ -123,185 +127,136 @@ class Object(common.DictAccessWrapper):
             ADD_MOUSE_SPRITE: False,
         }
 
-        ############################################################################################
-        # timer and timerReset workaround
-        ############################################################################################
-        def has_timer_block(block_list):
-            for block in block_list:
-                if isinstance(block, list) and (block[0] == 'timer' or has_timer_block(block)):
-                    return True
-            return False
-
-        def has_timer_reset_block(block_list):
-            for block in block_list:
-                if isinstance(block, list) and (block[0] == 'timerReset' or has_timer_reset_block(block)):
-                    return True
-            return False
-
-        def replace_timer_blocks(block_list):
-            new_block_list = []
-            for block in block_list:
-                if isinstance(block, list):
-                    if block[0] == 'timer':
-                        new_block_list += [["readVariable", S2CC_TIMER_VARIABLE_NAME]]
-                    elif block[0] == 'timerReset':
-                        new_block_list += [["doBroadcastAndWait", S2CC_TIMER_RESET_BROADCAST_MESSAGE]]
-                    else:
-                        new_block_list += [replace_timer_blocks(block)]
-                else:
-                    new_block_list += [block]
-            return new_block_list
-
-        for script in self.scripts:
-            if has_timer_reset_block(script.blocks): workaround_info[ADD_TIMER_RESET_SCRIPT_KEY] = True
-            if has_timer_block(script.blocks) or 'timer' in script.arguments: workaround_info[ADD_TIMER_SCRIPT_KEY] = True
-
-            script.blocks = replace_timer_blocks(script.blocks)
-
-            # rebuild ScriptElement tree
-            script.script_element = ScriptElement.from_raw_block(script.blocks)
-
-        ############################################################################################
-        # key pressed workaround
-        ############################################################################################
-
+        # All workarounds are applied within one single traversal of each script. The result equals
+        # the one of applying them one after the other (in the order listed below), i.e. a block
+        # replaced by a workaround is not visited by any of the subsequent workarounds.
         key_pressed_keys = set()
+        positions_needed_for_sprite_names = set()
+        sensor_data_needed_for_sprite_names = {}
+        distance_to_sprite_names = all_sprite_names + ['_mouse_']
+        attribute_name_to_sensor_name_map = {
+            "x position": "xpos",
+            "y position": "ypos",
+            "direction": "heading",
+            "costume #": "costumeIndex",
+            "backdrop #": "backgroundIndex",
+            "backdrop name": "sceneName",
+            "size": "scale",
+            "costume name": "costumeName",
+            # not supported at the moment -> automatically replaced with NoteBrick by converter
+            "volume": "volume"
+        }
 
-        def has_key_pressed_block(block_list):
-            for block in block_list:
-                if isinstance(block, list) and (block[0] == 'keyPressed:' or has_key_pressed_block(block)):
-                    return True
-            return False
-
-        def replace_key_pressed_blocks(block_list):
-            new_block_list = []
-            for block in block_list:
-                if isinstance(block, list):
-                    if block[0] == 'keyPressed:':
-                        new_block_list += [["readVariable", S2CC_KEY_VARIABLE_NAME+block[1]]]
-                        key_pressed_keys.add((block[1],"keyPressedBrick"))
-                    else:
-                        new_block_list += [replace_key_pressed_blocks(block)]
-                else:
-                    new_block_list += [block]
-            return new_block_list
-
-        for script in self.scripts:
-            if has_key_pressed_block(script.blocks): 
-                script.blocks = replace_key_pressed_blocks(script.blocks)
-                workaround_info[ADD_KEY_PRESSED_SCRIPT_KEY] = key_pressed_keys
-                # rebuild ScriptElement tree
-                script.script_element = ScriptElement.from_raw_block(script.blocks)
+        class ScriptRewriteState(object):
+            def __init__(self):
+                self.has_timer_block = False
+                self.has_timer_reset_block = False
+                self.has_distance_to_object_block = False
+                # distanceTo-blocks only get replaced if the script contains at least one
+                # distanceTo-block referring to an existing sprite -> decided after the traversal
+                self.distance_to_object_blocks = []
 
         ############################################################################################
         # distance to object workaround
         ############################################################################################
-        def has_distance_to_object_block(block_list, all_sprite_names):
-            for block in block_list:
-                if isinstance(block, list) \
-                and ((block[0] == 'distanceTo:' and block[1] in (all_sprite_names) + ['_mouse_']) \
-                     or has_distance_to_object_block(block, all_sprite_names)):
-                    return True
-            return False
-
-        def replace_distance_to_object_blocks(block_list, positions_needed_for_sprite_names):
-            new_block_list = []
-            for block in block_list:
-                if isinstance(block, list):
-                    if block[0] == 'distanceTo:':
-                        # euclidean distance (Pythagorean theorem) to compute distance
-                        # between both sprite objects
-                        new_block_list += [
-                            ["computeFunction:of:", "sqrt", ["+",
-                              ["*",
-                                ["()", ["-", ["xpos"], ["readVariable", S2CC_POSITION_X_VARIABLE_NAME_PREFIX + block[1]]]],
-                                ["()", ["-", ["xpos"], ["readVariable", S2CC_POSITION_X_VARIABLE_NAME_PREFIX + block[1]]]]
-                              ], ["*",
-                                ["()", ["-", ["ypos"], ["readVariable", S2CC_POSITION_Y_VARIABLE_NAME_PREFIX + block[1]]]],
-                                ["()", ["-", ["ypos"], ["readVariable", S2CC_POSITION_Y_VARIABLE_NAME_PREFIX + block[1]]]]
-                              ]
-                            ]]
-                        ]
-                        positions_needed_for_sprite_names.add(block[1])
-                        if block[1] == "_mouse_":
-                            workaround_info[ADD_MOUSE_SPRITE] = True
-
-                    else:
-                        new_block_list += [replace_distance_to_object_blocks(block, positions_needed_for_sprite_names)]
-                else:
-                    new_block_list += [block]
-            return new_block_list
-
-        positions_needed_for_sprite_names = set()
-        for script in self.scripts:
-            if has_distance_to_object_block(script.blocks, all_sprite_names):
-                script.blocks = replace_distance_to_object_blocks(script.blocks, positions_needed_for_sprite_names)
-            # parse again ScriptElement tree
-            script.script_element = ScriptElement.from_raw_block(script.blocks)
-        workaround_info[ADD_POSITION_SCRIPT_TO_OBJECTS_KEY] = positions_needed_for_sprite_names
+        def distance_to_object_replacement_block(block):
+            # euclidean distance (Pythagorean theorem) to compute distance
+            # between both sprite objects
+            return ["computeFunction:of:", "sqrt", ["+",
+                      ["*",
+                        ["()", ["-", ["xpos"], ["readVariable", S2CC_POSITION_X_VARIABLE_NAME_PREFIX + block[1]]]],
+                        ["()", ["-", ["xpos"], ["readVariable", S2CC_POSITION_X_VARIABLE_NAME_PREFIX + block[1]]]]
+                      ], ["*",
+                        ["()", ["-", ["ypos"], ["readVariable", S2CC_POSITION_Y_VARIABLE_NAME_PREFIX + block[1]]]],
+                        ["()", ["-", ["ypos"], ["readVariable", S2CC_POSITION_Y_VARIABLE_NAME_PREFIX + block[1]]]]
+                      ]
+                    ]]
 
         ############################################################################################
         # of-block (getAttribute) workaround
         ############################################################################################
-        def replace_getattribute_blocks(block_list, sensor_data_needed_for_sprite_names):
-            attribute_name_to_sensor_name_map = {
-                "x position": "xpos",
-                "y position": "ypos",
-                "direction": "heading",
-                "costume #": "costumeIndex",
-                "backdrop #": "backgroundIndex",
-                "backdrop name": "sceneName",
-                "size": "scale",
-                "costume name": "costumeName",
-                # not supported at the moment -> automatically replaced with NoteBrick by converter
-                "volume": "volume"
-            }
+        def getattribute_replacement_block(block):
+            attribute_name, sprite_name = block[1:3]
+            if not isinstance(sprite_name, basestring):
+                return 0
+
+            sprite_name = sprite_name.replace("_stage_", "Stage")
+            sensor_name = attribute_name_to_sensor_name_map.get(attribute_name)
+
+            # case read variable:
+            if sensor_name is None:
+                variable_name = attribute_name
+                # global variable or local variable of current sprite object
+                if sprite_name in {"Stage", self.name}:
+                    return ["readVariable", variable_name]
+                # local variable of other sprite
+                else:
+                    sensor_name = "readVariable:{}".format(variable_name)
+
+            # case read sensor of current sprite:
+            if self.name == sprite_name:
+                return [sensor_name]
+            # case read sensor of other sprite:
+            if sprite_name not in sensor_data_needed_for_sprite_names:
+                sensor_data_needed_for_sprite_names[sprite_name] = set()
+            sensor_data_needed_for_sprite_names[sprite_name].add(sensor_name)
+            variable_name = S2CC_GETATTRIBUTE_PREFIX + "{}_{}".format(sprite_name, sensor_name)
+            return ["readVariable", variable_name]
+
+        def rewrite_blocks(block_list, state, replace_distance_to=True, replace_getattribute=True):
             new_block_list = []
             for block in block_list:
                 if not isinstance(block, list):
                     new_block_list += [block]
                     continue
 
-                if block[0] == 'getAttribute:of:':
-                    attribute_name, sprite_name = block[1:3]
-                    if not isinstance(sprite_name, basestring):
-                        new_block_list += [0]
-                        continue
-
-                    sprite_name = sprite_name.replace("_stage_", "Stage")
-                    sensor_name = attribute_name_to_sensor_name_map.get(attribute_name)
-
-                    # case read variable:
-                    if sensor_name is None:
-                        variable_name = attribute_name
-                        # global variable or local variable of current sprite object
-                        if sprite_name in {"Stage", self.name}:
-                            new_block_list += [["readVariable", variable_name]]
-                            continue
-                        # local variable of other sprite
-                        else:
-                            sensor_name = "readVariable:{}".format(variable_name)
-
-                    # case read sensor of current sprite:
-                    if self.name == sprite_name:
-                        new_block_list += [[sensor_name]]
-                    # case read sensor of other sprite:
-                    else:
-                        if sprite_name not in sensor_data_needed_for_sprite_names:
-                            sensor_data_needed_for_sprite_names[sprite_name] = set()
-                        sensor_data_needed_for_sprite_names[sprite_name].add(sensor_name)
-                        variable_name = S2CC_GETATTRIBUTE_PREFIX + "{}_{}".format(sprite_name, sensor_name)
-                        new_block_list += [["readVariable", variable_name]]
-                else:
-                    new_block_list += [replace_getattribute_blocks(block, sensor_data_needed_for_sprite_names)]
+                # timer and timerReset workaround
+                if block[0] == 'timer':
+                    state.has_timer_block = True
+                    new_block_list += [["readVariable", S2CC_TIMER_VARIABLE_NAME]]
+                elif block[0] == 'timerReset':
+                    state.has_timer_reset_block = True
+                    new_block_list += [["doBroadcastAndWait", S2CC_TIMER_RESET_BROADCAST_MESSAGE]]
+
+                # key pressed workaround
+                elif block[0] == 'keyPressed:':
+                    new_block_list += [["readVariable", S2CC_KEY_VARIABLE_NAME+block[1]]]
+                    key_pressed_keys.add((block[1],"keyPressedBrick"))
+
+                elif block[0] == 'distanceTo:':
+                    if block[1] in distance_to_sprite_names:
+                        state.has_distance_to_object_block = True
+                    rewritten_block = rewrite_blocks(block, state, False, replace_getattribute)
+                    if replace_distance_to:
+                        state.distance_to_object_blocks += [(new_block_list, len(new_block_list), rewritten_block)]
+                    new_block_list += [rewritten_block]
+
+                elif block[0] == 'getAttribute:of:' and replace_getattribute:
+                    rewritten_block = rewrite_blocks(block, state, replace_distance_to, False)
+                    new_block_list += [getattribute_replacement_block(rewritten_block)]
 
+                else:
+                    new_block_list += [rewrite_blocks(block, state, replace_distance_to, replace_getattribute)]
             return new_block_list
 
-        sensor_data_needed_for_sprite_names = {}
         for script in self.scripts:
-            script.blocks = replace_getattribute_blocks(script.blocks, sensor_data_needed_for_sprite_names)
-            # parse again ScriptElement tree
+            state = ScriptRewriteState()
+            script.blocks = rewrite_blocks(script.blocks, state)
+            if state.has_distance_to_object_block:
+                for parent_block_list, index, block in state.distance_to_object_blocks:
+                    parent_block_list[index] = distance_to_object_replacement_block(block)
+                    positions_needed_for_sprite_names.add(block[1])
+                    if block[1] == "_mouse_":
+                        workaround_info[ADD_MOUSE_SPRITE] = True
+
+            if state.has_timer_reset_block: workaround_info[ADD_TIMER_RESET_SCRIPT_KEY] = True
+            if state.has_timer_block or 'timer' in script.arguments: workaround_info[ADD_TIMER_SCRIPT_KEY] = True
+
+            # build ScriptElement tree
             script.script_element = ScriptElement.from_raw_block(script.blocks)
+
+        workaround_info[ADD_KEY_PRESSED_SCRIPT_KEY] = key_pressed_keys
+        workaround_info[ADD_POSITION_SCRIPT_TO_OBJECTS_KEY] = positions_needed_for_sprite_names
         workaround_info[ADD_UPDATE_ATTRIBUTE_SCRIPT_TO_OBJECTS_KEY] = sensor_data_needed_for_sprite_names
         return workaround_info
 
@@ -325,8 +280,9 @@ class RawProject(Object):
     Represents the raw Scratch project structure.
     """
 
-    def __init__(self, dict_, data_origin="<undefined>"):
-        super(RawProject, self).__init__(dict_)
+    def __init__(self, dict_, data_origin="<undefined>", copy_on_write=False,
+                 merge_update_loops=MERGE_HELPER_UPDATE_LOOPS):
+        super(RawProject, self).__init__(dict_, copy_on_write)
         assert self.is_stage()
         self._verify_scratch_dictionary(dict_, data_origin)
         self.dict_ = dict_
@@ -352,7 +308,7 @@ class RawProject(Object):
 
         self.raw_objects = sorted(filter(lambda obj_data: "objName" in obj_data, self.get_children()),
                                   key=lambda obj_data: obj_data.get("indexInLibrary", 0))
-        self.objects = [Object(raw_object) for raw_object in [dict_] + self.raw_objects]
+        self.objects = [Object(raw_object, copy_on_write) for raw_object in [dict_] + self.raw_objects]
         self.resource_names = [self._resource_name_from(raw_resource) for raw_resource in self._raw_resources()]
         self.unique_resource_names = list(set(self.resource_names))
         is_add_timer_script = False
@@ -363,43 +319,72 @@ class RawProject(Object):
         update_attribute_script_to_be_added = {}
         self.listened_keys = set()
         self._has_mouse_position_script = False
+        # merge mode: the bodies of all update loops of an object get collected (by object name)
+        # and are added as one single loop per object after preprocessing
+        self._merge_update_loops = merge_update_loops
+        self._update_loop_body_blocks_of_objects = {}
+        with stats.phase(stats.PREPROCESS):
+            for scratch_object in self.objects:
+                workaround_info = scratch_object.preprocess_object(all_sprite_names)
+                if workaround_info[ADD_TIMER_SCRIPT_KEY]: is_add_timer_script = True
+                if workaround_info[ADD_TIMER_RESET_SCRIPT_KEY]: is_add_timer_reset_script = True
+                if len(workaround_info[ADD_KEY_PRESSED_SCRIPT_KEY]) > 0:
+                    self.listened_keys.update(workaround_info[ADD_KEY_PRESSED_SCRIPT_KEY])
+                position_script_to_be_added |= workaround_info[ADD_POSITION_SCRIPT_TO_OBJECTS_KEY]
+                self._has_mouse_position_script |= workaround_info[ADD_MOUSE_SPRITE]
+
+                for sprite_name, sensor_names_set in workaround_info[ADD_UPDATE_ATTRIBUTE_SCRIPT_TO_OBJECTS_KEY].iteritems():
+                    if sprite_name not in update_attribute_script_to_be_added: update_attribute_script_to_be_added[sprite_name] = set()
+                    update_attribute_script_to_be_added[sprite_name] |= sensor_names_set
+            if is_add_timer_script or is_add_timer_reset_script: self._add_timer_script_to_stage_object()
+            if is_add_timer_reset_script: self._add_timer_reset_script_to_stage_object()
+
+            for destination_sprite_name in position_script_to_be_added:
+                if destination_sprite_name == "_mouse_": continue
+
+                sprite_object = sprite_name_sprite_mapping[destination_sprite_name]
+                assert sprite_object is not None
+                self._add_update_position_script_to_object(sprite_object)
+
+            for sprite_name, sensors_info in sprite_sensors_map.iteritems():
+                sprite_object = sprite_name_sprite_mapping[sprite_name]
+                assert sprite_object is not None
+                self._add_sensor_variables_and_update_script_to_object(sprite_object, sensors_info, is_add_timer_script)
+
+            for sprite_name, sensor_names in update_attribute_script_to_be_added.iteritems():
+                sprite_object = sprite_name_sprite_mapping[sprite_name]
+                assert sprite_object is not None
+                self._add_update_attribute_script_to_object(sprite_object, sensor_names)
+
+            if self._merge_update_loops:
+                self._add_merged_update_loop_scripts()
+
+    def _add_update_loop_script_to_object(self, scratch_object, forever_loop_body_blocks):
+        if self._merge_update_loops:
+            # reporters like xpos refer to the object running the script -> one loop per object at most
+            object_name = scratch_object.get_objName()
+            self._update_loop_body_blocks_of_objects.setdefault(object_name, []).extend(forever_loop_body_blocks)
+            return
+        self._append_update_loop_script(scratch_object, forever_loop_body_blocks)
+
+    def _append_update_loop_script(self, scratch_object, forever_loop_body_blocks):
+        forever_loop_body_blocks = forever_loop_body_blocks + [["wait:elapsed:from:", UPDATE_HELPER_VARIABLE_TIMEOUT]]
+        script_blocks = [["doForever", forever_loop_body_blocks]]
+        scratch_object.scripts += [Script([0, 0, [[SCRIPT_GREEN_FLAG]] + script_blocks])]
+        stats.increment("helperUpdateLoops")
+
+    def _add_merged_update_loop_scripts(self):
         for scratch_object in self.objects:
-            workaround_info = scratch_object.preprocess_object(all_sprite_names)
-            if workaround_info[ADD_TIMER_SCRIPT_KEY]: is_add_timer_script = True
-            if workaround_info[ADD_TIMER_RESET_SCRIPT_KEY]: is_add_timer_reset_script = True
-            if len(workaround_info[ADD_KEY_PRESSED_SCRIPT_KEY]) > 0:
-                self.listened_keys.update(workaround_info[ADD_KEY_PRESSED_SCRIPT_KEY])
-            position_script_to_be_added |= workaround_info[ADD_POSITION_SCRIPT_TO_OBJECTS_KEY]
-            self._has_mouse_position_script |= workaround_info[ADD_MOUSE_SPRITE]
-
-            for sprite_name, sensor_names_set in workaround_info[ADD_UPDATE_ATTRIBUTE_SCRIPT_TO_OBJECTS_KEY].iteritems():
-                if sprite_name not in update_attribute_script_to_be_added: update_attribute_script_to_be_added[sprite_name] = set()
-                update_attribute_script_to_be_added[sprite_name] |= sensor_names_set
-        if is_add_timer_script or is_add_timer_reset_script: self._add_timer_script_to_stage_object()
-        if is_add_timer_reset_script: self._add_timer_reset_script_to_stage_object()
-
-        for destination_sprite_name in position_script_to_be_added:
-            if destination_sprite_name == "_mouse_": continue
-
-            sprite_object = sprite_name_sprite_mapping[destination_sprite_name]
-            assert sprite_object is not None
-            self._add_update_position_script_to_object(sprite_object)
-
-        for sprite_name, sensors_info in sprite_sensors_map.iteritems():
-            sprite_object = sprite_name_sprite_mapping[sprite_name]
-            assert sprite_object is not None
-            self._add_sensor_variables_and_update_script_to_object(sprite_object, sensors_info, is_add_timer_script)
-
-        for sprite_name, sensor_names in update_attribute_script_to_be_added.iteritems():
-            sprite_object = sprite_name_sprite_mapping[sprite_name]
-            assert sprite_object is not None
-            self._add_update_attribute_script_to_object(sprite_object, sensor_names)
+            forever_loop_body_blocks = self._update_loop_body_blocks_of_objects.pop(scratch_object.get_objName(), [])
+            if len(forever_loop_body_blocks) > 0:
+                self._append_update_loop_script(scratch_object, forever_loop_body_blocks)
+        assert len(self._update_loop_body_blocks_of_objects) == 0
 
     def _add_update_position_script_to_object(self, sprite_object):
         # add global variables for positions!
         position_x_var_name = S2CC_POSITION_X_VARIABLE_NAME_PREFIX + sprite_object.get_objName()
         position_y_var_name = S2CC_POSITION_Y_VARIABLE_NAME_PREFIX + sprite_object.get_objName()
-        global_variables = self.objects[0]._dict_object["variables"]
+        global_variables = self.objects[0]._modifiable_value_of("variables")
         global_variables.append({
             "name": position_x_var_name,
             "value": 0,
@@ -411,21 +396,17 @@ class RawProject(Object):
             "isPersistent": False
         })
         # update position script
-        script_blocks = [
-            ["doForever", [
-              ["setVar:to:", position_x_var_name, ["xpos"]],
-              ["setVar:to:", position_y_var_name, ["ypos"]],
-              ["wait:elapsed:from:", UPDATE_HELPER_VARIABLE_TIMEOUT]
-            ]]
-        ]
-        sprite_object.scripts += [Script([0, 0, [[SCRIPT_GREEN_FLAG]] + script_blocks])]
+        self._add_update_loop_script_to_object(sprite_object, [
+            ["setVar:to:", position_x_var_name, ["xpos"]],
+            ["setVar:to:", position_y_var_name, ["ypos"]]
+        ])
 
     def _add_update_attribute_script_to_object(self, sprite_object, sensor_names):
         forever_loop_body_blocks = []
         for sensor_name in sensor_names:
             # add variable
             variable_name = S2CC_GETATTRIBUTE_PREFIX + "{}_{}".format(sprite_object.get_objName(), sensor_name)
-            global_variables = self.objects[0]._dict_object["variables"]
+            global_variables = self.objects[0]._modifiable_value_of("variables")
             global_variables.append({
                 "name": variable_name,
                 "value": 0,
@@ -435,25 +416,20 @@ class RawProject(Object):
             value = [sensor_name] if not sensor_name.startswith("readVariable:") else ["readVariable", sensor_name.split("readVariable:")[1]]
             forever_loop_body_blocks += [["setVar:to:", variable_name, value]]
 
-        forever_loop_body_blocks += [["wait:elapsed:from:", UPDATE_HELPER_VARIABLE_TIMEOUT]]
-        sprite_object.scripts += [Script([0, 0, [[SCRIPT_GREEN_FLAG], ["doForever", forever_loop_body_blocks]]])]
+        self._add_update_loop_script_to_object(sprite_object, forever_loop_body_blocks)
 
     def _add_timer_script_to_stage_object(self):
         assert len(self.objects) > 0
         # add timer variable to stage object (in Scratch this acts as a global variable)
-        self.objects[0]._dict_object["variables"].append({
+        self.objects[0]._modifiable_value_of("variables").append({
             "name": S2CC_TIMER_VARIABLE_NAME,
             "value": 0,
             "isPersistent": False
         })
         # timer counter script
-        script_blocks = [
-            ["doForever", [
-              ["changeVar:by:", S2CC_TIMER_VARIABLE_NAME, UPDATE_HELPER_VARIABLE_TIMEOUT],
-              ["wait:elapsed:from:", UPDATE_HELPER_VARIABLE_TIMEOUT]
-            ]]
-        ]
-        self.objects[0].scripts += [Script([0, 0, [[SCRIPT_GREEN_FLAG]] + script_blocks])]
+        self._add_update_loop_script_to_object(self.objects[0], [
+            ["changeVar:by:", S2CC_TIMER_VARIABLE_NAME, UPDATE_HELPER_VARIABLE_TIMEOUT]
+        ])
 
     def _add_timer_reset_script_to_stage_object(self):
         assert len(self.objects) > 0
@@ -482,19 +458,17 @@ class RawProject(Object):
             elif command == "answer":
                 variable_name = converter._SHARED_GLOBAL_ANSWER_VARIABLE_NAME
                 self.sprite_variables_map[sprite_name] += [variable_name]
-                stage_object._dict_object["variables"].append({ "name": variable_name, "value": "", "isPersistent": False })
+                stage_object._modifiable_value_of("variables").append({ "name": variable_name, "value": "", "isPersistent": False })
                 continue
 
             variable_name = S2CC_SENSOR_PREFIX + "{}_{}{}".format(sprite_name, command, "_" + param if param else "")
             self.sprite_variables_map[sprite_name] += [variable_name]
-            sprite_object._dict_object["variables"].append({ "name": variable_name, "value": 0, "isPersistent": False })
+            sprite_object._modifiable_value_of("variables").append({ "name": variable_name, "value": 0, "isPersistent": False })
             reporter_block = [command] if param is None else [command, param]
             forever_loop_body_blocks += [["setVar:to:", variable_name, reporter_block]]
 
         if len(forever_loop_body_blocks) == 0: return
-        forever_loop_body_blocks += [["wait:elapsed:from:", UPDATE_HELPER_VARIABLE_TIMEOUT]]
-        script_blocks = [["doForever", forever_loop_body_blocks]]
-        sprite_object.scripts += [Script([0, 0, [[SCRIPT_GREEN_FLAG]] + script_blocks])]
+        self._add_update_loop_script_to_object(sprite_object, forever_loop_body_blocks)
 
     def __iter__(self):
         return iter(self.objects)
@@ -589,12 +563,15 @@ class Project(RawProject):
     Represents a complete Scratch project including all resource files.
     """
 
-    def __init__(self, project_base_path, name=None, project_id=None, progress_bar=None, is_local_project=False):
+    def __init__(self, project_base_path, name=None, project_id=None, progress_bar=None, is_local_project=False,
+                 project_code=None):
         def read_md5_to_resource_path_mapping():
             md5_to_resource_path_map = {}
             # TODO: clarify that only files with extension are covered
-            for res_file_path in glob.glob(os.path.join(project_base_path, "*.*")):
-                resource_name = common.md5_hash(res_file_path) + os.path.splitext(res_file_path)[1]
+            res_file_paths = glob.glob(os.path.join(project_base_path, "*.*"))
+            md5_hashes = filedigest.md5_of_all(res_file_paths)
+            for res_file_path in res_file_paths:
+                resource_name = md5_hashes[res_file_path] + os.path.splitext(res_file_path)[1]
                 md5_to_resource_path_map[resource_name] = res_file_path
             try:
                 # penLayer is no regular resource file
@@ -605,12 +582,21 @@ class Project(RawProject):
             assert self['penLayerMD5'] not in md5_to_resource_path_map
             return md5_to_resource_path_map
 
-        super(Project, self).__init__(self.raw_project_code_from_project_folder_path(project_base_path))
+        if project_code is not None:
+            raw_project_code = project_code
+        else:
+            with stats.phase(stats.JSON_LOAD):
+                raw_project_code = self.raw_project_code_from_project_folder_path(project_base_path)
+        # the freshly loaded project code is owned by this project -> no need to copy it
+        super(Project, self).__init__(raw_project_code, copy_on_write=COPY_ON_WRITE_PROJECT_DATA,
+                                      merge_update_loops=MERGE_HELPER_UPDATE_LOOPS)
         self.project_base_path = project_base_path
         self.project_id = self.get_info().get("projectID") if project_id is None else project_id
+        self.automatic_screenshot_download = None
 
         if not is_local_project:
-            self.downloadScratch2ProjectResources(project_base_path, progress_bar)
+            with stats.phase(stats.DOWNLOAD):
+                self.downloadScratch2ProjectResources(project_base_path, progress_bar)
 
         if not self.project_id:
             self.project_id = "0"
@@ -619,15 +605,20 @@ class Project(RawProject):
             self.automatic_screenshot_image_url = None
         else:
 
-            if name is not None:
-                self.name = name
-            else:
-                self.name = scratchwebapi.getMetaDataEntry(self.project_id, "title")
+            with stats.phase(stats.METADATA):
+                if name is not None:
+                    self.name = name
+                else:
+                    self.name = scratchwebapi.getMetaDataEntry(self.project_id, "title")
 
-            # self.name = name if name is not None else scratchwebapi.getMetaDataEntry(self.project_id, "title")
+                # self.name = name if name is not None else scratchwebapi.getMetaDataEntry(self.project_id, "title")
 
-            self.instructions, self.notes_and_credits, self.automatic_screenshot_image_url =\
-                scratchwebapi.getMetaDataEntry(self.project_id, "instructions", "description", "image")
+                self.instructions, self.notes_and_credits, self.automatic_screenshot_image_url =\
+                    scratchwebapi.getMetaDataEntry(self.project_id, "instructions", "description", "image")
+            if self.automatic_screenshot_image_url is not None:
+                # downloaded while the project is converted, the converter joins it when packaging
+                self.automatic_screenshot_download = scratchwebapi.AutomaticScreenshotDownload(
+                                                       self.automatic_screenshot_image_url)
             # self.instructions = scratchwebapi.getMetaDataEntry(self.project_id, "instructions")
             # self.notes_and_credits = scratchwebapi.getMetaDataEntry(self.project_id, "description")
             # self.automatic_screenshot_image_url = "{}{}.png".format(scratchwebapi.SCRATCH_PROJECT_IMAGE_BASE_URL, self.project_id)
@@ -639,6 +630,7 @@ class Project(RawProject):
 
         self.name = self.name.strip() if self.name != None else "Unknown Project"
         self.md5_to_resource_path_map = read_md5_to_resource_path_mapping()
+        self._resource_names_by_md5 = self._resource_names_by_md5_index()
         self.global_user_lists = self.objects[0].get_lists()
 
         for scratch_object in self.objects:
@@ -670,19 +662,26 @@ class Project(RawProject):
 
     def find_unused_resources_name_and_filepath(self):
         result = []
-        for file_path in glob.glob(os.path.join(self.project_base_path, "*.*")):
-            md5_resource_filename = common.md5_hash(file_path) + os.path.splitext(file_path)[1]
+        file_paths = glob.glob(os.path.join(self.project_base_path, "*.*"))
+        md5_hashes = filedigest.md5_of_all(file_paths)
+        for file_path in file_paths:
+            md5_resource_filename = md5_hashes[file_path] + os.path.splitext(file_path)[1]
             if md5_resource_filename not in self.unique_resource_names:
                 if os.path.basename(file_path) != _PROJECT_FILE_NAME:
                     result += [(md5_resource_filename, file_path)]
         return map(list, zip(*result))
 
-    def find_all_resource_names_for(self, resource_unique_id):
-        resource_names = set()
+    def _resource_names_by_md5_index(self):
+        resource_names_by_md5 = {}
         for raw_resource in self._raw_resources():
-            if resource_unique_id in set([raw_resource.get(JsonKeys.SOUND_MD5), raw_resource.get(JsonKeys.COSTUME_MD5)]):
-                resource_names.update([raw_resource[JsonKeys.COSTUME_NAME if JsonKeys.COSTUME_NAME in raw_resource else JsonKeys.SOUND_NAME]])
-        return list(resource_names)
+            resource_name = raw_resource[JsonKeys.COSTUME_NAME if JsonKeys.COSTUME_NAME in raw_resource else JsonKeys.SOUND_NAME]
+            for md5_key in (JsonKeys.SOUND_MD5, JsonKeys.COSTUME_MD5):
+                if md5_key in raw_resource:
+                    resource_names_by_md5.setdefault(raw_resource[md5_key], set()).add(resource_name)
+        return resource_names_by_md5
+
+    def find_all_resource_names_for(self, resource_unique_id):
+        return list(self._resource_names_by_md5.get(resource_unique_id, []))
 
     def downloadScratch2ProjectResources(self, target_dir, progress_bar):
         from threading import Thread
@@ -705,7 +704,7 @@ class Project(RawProject):
                     common.download_file(resource_url, resource_file_path)
                 except (SocketTimeoutException, SocketException, UnknownHostException, IOException) as e:
                     raise ScratchWebApiError("Error with {}: '{}'".format(resource_url, e))
-                verify_hash = helpers.md5_of_file(resource_file_path)
+                verify_hash = filedigest.md5_of(resource_file_path)
                 assert verify_hash == os.path.splitext(md5_file_name)[0], "MD5 hash of response data not matching"
                 if progress_bar != None:
                     progress_bar.update(ProgressType.DOWNLOAD_MEDIA_FILE)
@@ -840,16 +839,18 @@ class Script(object):
         return True
 
 class ScriptElement(object):
+    # large projects consist of hundreds of thousands of script elements -> no per-instance dict
+    __slots__ = ("name", "children")
+
     def __init__(self, name=None, arguments=None):
-        if arguments is None:
-            arguments = []
         self.name = name
         self.children = []
-        for argument in arguments:
-            self.add(self.from_raw_block(argument))
+        if arguments:
+            self._add_children_from_raw_blocks(arguments)
 
     def add(self, first, *arguments):
-        self.children.extend(itertools.chain((first,), arguments))
+        self.children.append(first)
+        self.children.extend(arguments)
 
     def __iter__(self):
         return iter(self.children)
@@ -862,41 +863,52 @@ class ScriptElement(object):
             child.prettyprint(verbose, (indent + "    "), file_=file_)
 
     def __repr__(self):
-        return "%s(%r)" % (self.__class__, self.__dict__)
+        return "%s(%r)" % (self.__class__, { "name": self.name, "children": self.children })
 
     @classmethod
     def from_raw_script(cls, raw_script):
         script = Script(raw_script)
         return cls.from_raw_block(script.blocks)
 
-    @classmethod
-    def from_raw_block(cls, raw_block):
-        # recursively create ScriptElement tree
-        block_name = None
-        block_arguments = []
+    @staticmethod
+    def _class_name_and_arguments_of(raw_block):
         if isinstance(raw_block, list):
             is_block_list = len(raw_block) == 0 or isinstance(raw_block[0], list)
             if not is_block_list:
                 block_name, block_arguments = raw_block[0], raw_block[1:]
                 assert isinstance(block_name, (str, unicode)), "Raw block: %s" % raw_block
-                clazz = Block
-            else:
-                block_arguments = raw_block
-                clazz = BlockList
-        else:
-            block_name = raw_block
-            clazz = BlockValue
+                return Block, block_name, block_arguments
+            return BlockList, None, raw_block
+        return BlockValue, raw_block, []
+
+    def _add_children_from_raw_blocks(self, raw_blocks):
+        # creates the ScriptElement tree below this element, using an explicit stack instead of
+        # recursion (deeply nested scripts must not exhaust the call stack)
+        elements_to_complete = [(self, raw_blocks)]
+        while elements_to_complete:
+            script_element, raw_arguments = elements_to_complete.pop()
+            for raw_argument in raw_arguments:
+                clazz, child_name, child_raw_arguments = self._class_name_and_arguments_of(raw_argument)
+                child = clazz(child_name)
+                script_element.children.append(child)
+                if child_raw_arguments:
+                    elements_to_complete.append((child, child_raw_arguments))
 
+    @classmethod
+    def from_raw_block(cls, raw_block):
+        clazz, block_name, block_arguments = cls._class_name_and_arguments_of(raw_block)
         return clazz(block_name, arguments=block_arguments)
 
 
 class Block(ScriptElement):
+    __slots__ = ()
 
     def __init__(self, *args, **kwargs):
         super(Block, self).__init__(*args, **kwargs)
 
 
 class BlockList(ScriptElement):
+    __slots__ = ()
 
     def __init__(self, *args, **kwargs):
         super(BlockList, self).__init__(*args, **kwargs)
@@ -904,17 +916,30 @@ class BlockList(ScriptElement):
 
 
 class BlockValue(ScriptElement):
-    pass
+    __slots__ = ()
 
 
 class AbstractBlocksTraverser(object):
 
     def traverse(self, script_element):
         assert isinstance(script_element, ScriptElement)
-        # depth first traversing
-        for child in script_element:
-            self.traverse(child)
-        self._visit(script_element)
+        # depth first traversing (explicit stack instead of recursion -> no limit for nesting depth)
+        self._enter(script_element)
+        elements_to_visit = [(script_element, iter(script_element))]
+        while elements_to_visit:
+            current_element, remaining_children = elements_to_visit[-1]
+            child = next(remaining_children, None)
+            if child is None:
+                elements_to_visit.pop()
+                self._visit(current_element)
+                continue
+            assert isinstance(child, ScriptElement)
+            self._enter(child)
+            elements_to_visit.append((child, iter(child)))
+
+    def _enter(self, script_element):
+        # called before the children of the script element are traversed
+        pass
 
     def _visit(self, script_element):
         raise NotImplementedError
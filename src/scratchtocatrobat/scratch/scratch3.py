@@ -33,17 +33,33 @@ class Scratch3Parser(object):
     def fixBadScratch3Hashes(self, projectFile, scratch_project_dir):
         import glob
         import os
-        from scratchtocatrobat.tools import common
+        import re
+        from scratchtocatrobat.tools import filedigest
         file_content = projectFile.read()
-        for file in glob.glob(scratch_project_dir + "/*.*"):
-            if not file.endswith(".json"):
-                file_hash = common.md5_hash(file)
-                newname = scratch_project_dir+"/"+ file_hash +"." +file.split(".")[-1]
-                os.rename(file, newname)
-                oldfile = "".join(file.split('/')[-1].split('.')[0:-1])
-                file_content = file_content.replace(oldfile ,file_hash)
-        projectFile.flush()
+        files = [file for file in glob.glob(scratch_project_dir + "/*.*") if not file.endswith(".json")]
+        file_hashes = filedigest.md5_of_all(files)
+        new_names = {}
+        for file in files:
+            file_hash = file_hashes[file]
+            oldfile = "".join(file.split('/')[-1].split('.')[0:-1])
+            # asset already named by its hash -> nothing to fix
+            if oldfile == file_hash:
+                continue
+            newname = scratch_project_dir+"/"+ file_hash +"." +file.split(".")[-1]
+            os.rename(file, newname)
+            filedigest.file_renamed(file, newname)
+            if len(oldfile) > 0:
+                new_names[oldfile] = file_hash
+
+        if len(new_names) == 0:
+            return file_content
+
+        # replace all old names within one pass (longer names first, in case one name contains another)
+        old_names_pattern = re.compile("|".join(re.escape(oldfile) for oldfile in sorted(new_names, key=len, reverse=True)))
+        file_content = old_names_pattern.sub(lambda match: new_names[match.group(0)], file_content)
+        projectFile.seek(0)
         projectFile.write(file_content)
+        projectFile.truncate()
         return file_content
 
     def __init__(self, file_path, scratch_project_dir):
@@ -1,4 +1,7 @@
+import hashlib
+import os
 import unittest
+from scratchtocatrobat.tools import common
 from  scratchtocatrobat.scratch.scratch3visitor.looks import *
 from scratchtocatrobat.scratch.scratch3 import Scratch3Block
 from scratchtocatrobat.scratch.scratch3visitor.visitorUtil import BlockContext, visitBlock
@@ -1165,5 +1168,94 @@ class TestScratch3Blocks(unittest.TestCase):
         assert converted_block[1] == "teststring"
 
 
+class TestScratch3DeeplyNestedBlocks(unittest.TestCase):
+
+    def test_visitDeeplyNestedFormula(self):
+        context = create_block_context("looks_say")
+        testblock = context.block
+        nesting_depth = 3000
+        formula = create_dummy_formula_block(context)
+        for _ in range(nesting_depth - 1):
+            operator = createScratch3Block(context, "operator_add")
+            operator.inputs["NUM1"] = formula
+            addInputOfType(operator, "NUM2", TYPE_INT)
+            formula = [INPUTTYPE_BLOCK_NO_SHADOW, operator.name]
+        testblock.inputs["MESSAGE"] = formula
+
+        converted_block = visitBlock(context)
+        assert converted_block[0] == "say:"
+        formula_part = converted_block[1]
+        for _ in range(nesting_depth - 1):
+            assert formula_part[0] == "+"
+            assert formula_part[2] == 1234.0
+            formula_part = formula_part[1]
+        assert formula_part == ["+", 1234.0, 1234.0]
+
+    def test_visitDeeplyNestedIfBlocks(self):
+        context = create_block_context("control_if")
+        nesting_depth = 1000
+        sayblock = createScratch3Block(context, "looks_say")
+        addInputOfType(sayblock, "MESSAGE", TYPE_STRING)
+        substackblock = sayblock
+        for depth in range(nesting_depth):
+            ifblock = context.block if depth == nesting_depth - 1 else createScratch3Block(context, "control_if")
+            conditionblock = createScratch3Block(context, "operator_gt")
+            addInputOfType(conditionblock, "OPERAND1", TYPE_INT)
+            addInputOfType(conditionblock, "OPERAND2", TYPE_INT)
+            ifblock.inputs["CONDITION"] = [INPUTTYPE_BLOCK_NO_SHADOW, conditionblock.name]
+            ifblock.inputs["SUBSTACK"] = [INPUTTYPE_BLOCK_NO_SHADOW, substackblock.name]
+            substackblock = ifblock
+
+        converted_block = visitBlock(context)
+        for _ in range(nesting_depth):
+            assert converted_block[0] == "doIf"
+            assert converted_block[1] == [">", 1234.0, 1234.0]
+            assert len(converted_block[2]) == 1
+            converted_block = converted_block[2][0]
+        assert converted_block == ["say:", "teststring"]
+
+
+class TestScratch3ParserAssetNames(unittest.TestCase):
+
+    def _create_asset(self, directory, file_name, content):
+        with open(os.path.join(directory, file_name), "wb") as fp:
+            fp.write(content)
+        return hashlib.md5(content).hexdigest()
+
+    def test_can_rename_assets_not_named_by_their_hash(self):
+        from scratchtocatrobat.scratch.scratch3 import Scratch3Parser
+        with common.TemporaryDirectory() as project_dir:
+            cat_hash = self._create_asset(project_dir, "cat.svg", "<svg>cat</svg>")
+            meow_hash = self._create_asset(project_dir, "cat2.wav", "meow")
+            dog_hash = hashlib.md5("<svg>dog</svg>").hexdigest()
+            self._create_asset(project_dir, dog_hash + ".svg", "<svg>dog</svg>")
+            project_json = '{"assets": ["cat", "cat2", "%s"]}' % dog_hash
+            project_file_path = os.path.join(project_dir, "project.json")
+            with open(project_file_path, "w") as fp:
+                fp.write(project_json)
+
+            parser = Scratch3Parser(project_file_path, project_dir)
+
+            assert parser.raw_dict == { "assets": [cat_hash, meow_hash, dog_hash] }
+            assert common.content_of(project_file_path) == '{"assets": ["%s", "%s", "%s"]}' % (cat_hash, meow_hash, dog_hash)
+            assert sorted(os.listdir(project_dir)) == sorted([cat_hash + ".svg", meow_hash + ".wav",
+                                                              dog_hash + ".svg", "project.json"])
+
+    def test_can_keep_project_file_if_all_assets_are_named_by_their_hash(self):
+        from scratchtocatrobat.scratch.scratch3 import Scratch3Parser
+        with common.TemporaryDirectory() as project_dir:
+            cat_hash = self._create_asset(project_dir, hashlib.md5("cat").hexdigest() + ".png", "cat")
+            project_file_path = os.path.join(project_dir, "project.json")
+            with open(project_file_path, "w") as fp:
+                fp.write('{"assets": ["%s"]}' % cat_hash)
+            modification_time = int(os.path.getmtime(project_file_path)) - 100
+            os.utime(project_file_path, (modification_time, modification_time))
+
+            parser = Scratch3Parser(project_file_path, project_dir)
+
+            assert parser.raw_dict == { "assets": [cat_hash] }
+            assert os.path.getmtime(project_file_path) == modification_time
+
+
 if __name__ == "__main__":
     unittest.main()
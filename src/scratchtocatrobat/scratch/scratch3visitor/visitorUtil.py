@@ -8,15 +8,50 @@ def unpack_block_list(blocklist):
         blocklist = blocklist[0]
     return blocklist
 
-def visitBlock(blockcontext):
-    if not isinstance(blockcontext, BlockContext):
-        return blockcontext
+def _input_block_chains_of(blockcontext):
+    # first blocks of all block chains referred to by the inputs of the given block chain
+    block = blockcontext.block
+    while block != None:
+        for input_value in (block.inputs or {}).values():
+            if isinstance(input_value, list) and len(input_value) > 1:
+                input_block = blockcontext.get_block(input_value[1])
+                if isinstance(input_block, Scratch3Block):
+                    yield input_block
+        block = block.nextBlock
+
+def _visit_block_chain(blockcontext):
     blocklist = []
     while blockcontext.block != None:
         blockhandler = blockcontext.getBlockHandler()
         converted_block = blockhandler(blockcontext)
         blocklist.append(converted_block)
         blockcontext.nextBlock()
+    return blocklist
+
+def _visit_nested_block_chains_first(blockcontext):
+    # Converts the block chains nested within the inputs before the chain itself (depth first,
+    # using an explicit stack instead of recursion). The block handlers then find the converted
+    # inputs in the context, so that deeply nested blocks can not exhaust the call stack.
+    converted_block_chains = blockcontext.converted_block_chains
+    pending_block_chains = set()
+    block_chains_to_visit = [(blockcontext.block, False)]
+    while block_chains_to_visit:
+        first_block, are_inputs_visited = block_chains_to_visit.pop()
+        chain_context = BlockContext(first_block, blockcontext.spriteblocks, converted_block_chains)
+        if not are_inputs_visited:
+            pending_block_chains.add(first_block)
+            block_chains_to_visit.append((first_block, True))
+            input_block_chains = [input_block for input_block in _input_block_chains_of(chain_context)
+                                  if input_block not in converted_block_chains and input_block not in pending_block_chains]
+            block_chains_to_visit += [(input_block, False) for input_block in reversed(input_block_chains)]
+        elif first_block is not blockcontext.block:
+            converted_block_chains[first_block] = _visit_block_chain(chain_context)
+    return _visit_block_chain(blockcontext)
+
+def visitBlock(blockcontext):
+    if not isinstance(blockcontext, BlockContext):
+        return blockcontext
+    blocklist = visitBlockList(blockcontext)
     blocklist = unpack_block_list(blocklist)
     return blocklist
 
@@ -25,18 +60,7 @@ def visitScriptBlock(blockcontext):
         return blockcontext
 
     log.info("[Scratch3]  Converting Script: {}".format(blockcontext.block.opcode))
-    scriptblock_handler = blockcontext.getBlockHandler()
-    scriptblock = scriptblock_handler(blockcontext)
-    blockcontext.nextBlock()
-
-    blocklist = []
-    blocklist.append(scriptblock)
-    while blockcontext.block != None:
-        block_handler = blockcontext.getBlockHandler()
-        converted_block = block_handler(blockcontext)
-        blocklist.append(converted_block)
-        blockcontext.nextBlock()
-    return blocklist
+    return visitBlockList(blockcontext)
 
 def visitLiteral(literal):
     if literal is None:
@@ -76,7 +100,7 @@ def visitGeneric(blockcontext, attributename):
     if not isinstance(subblock, Scratch3Block):
         return visitLiteral(block_id)
 
-    subblockcontext = BlockContext(subblock, blockcontext.spriteblocks)
+    subblockcontext = BlockContext(subblock, blockcontext.spriteblocks, blockcontext.converted_block_chains)
     blocklist = visitBlock(subblockcontext)
     if isShadowBlock(block, attributename):
         return blocklist[0]
@@ -105,14 +129,11 @@ def visitCondition(blockcontext):
 def visitBlockList(blockcontext):
     if not isinstance(blockcontext, BlockContext):
         return blockcontext
-    blocklist = []
-
-    while blockcontext.block != None:
-        block_handler = blockcontext.getBlockHandler()
-        converted_block = block_handler(blockcontext)
-        blocklist.append(converted_block)
-        blockcontext.nextBlock()
-    return blocklist
+    blocklist = blockcontext.converted_block_chains.pop(blockcontext.block, None)
+    if blocklist is not None:
+        blockcontext.block = None
+        return blocklist
+    return _visit_nested_block_chains_first(blockcontext)
 
 def visitSubstack(blockcontext, substackkey):
     if not substackkey in blockcontext.block.inputs:
@@ -122,7 +143,7 @@ def visitSubstack(blockcontext, substackkey):
     substackstartblock = blockcontext.get_block(block_id)
     if not isinstance(substackstartblock, Scratch3Block):
         return None
-    substack_context = BlockContext(substackstartblock, blockcontext.spriteblocks)
+    substack_context = BlockContext(substackstartblock, blockcontext.spriteblocks, blockcontext.converted_block_chains)
     substack = visitBlockList(substack_context)
     return substack
 
@@ -169,9 +190,11 @@ def sanitizeListDefault(listString):
 
 
 class BlockContext(object):
-    def __init__(self, block, spriteblocks):
+    def __init__(self, block, spriteblocks, converted_block_chains=None):
         self.block = block
         self.spriteblocks = spriteblocks
+        # block chains already converted in advance, by their first block
+        self.converted_block_chains = converted_block_chains if converted_block_chains is not None else {}
 
     def nextBlock(self):
         self.block = self.block.nextBlock
@@ -37,6 +37,9 @@ SCRATCH_PROJECT_BASE_URL = helpers.config.get("SCRATCH_API", "project_base_url")
 SCRATCH_PROJECT_REMIX_TREE_URL_TEMPLATE = helpers.config.get("SCRATCH_API", "project_remix_tree_url_template")
 SCRATCH_PROJECT_IMAGE_BASE_URL = helpers.config.get("SCRATCH_API", "project_image_base_url")
 SCRATCH_PROJECT_META_DATA_BASE_URL = helpers.config.get("SCRATCH_API", "project_meta_data_base_url")
+SCREENSHOT_HTTP_RETRIES = int(helpers.config.get("SCRATCH_API", "screenshot_http_retries"))
+SCREENSHOT_HTTP_TIMEOUT = int(helpers.config.get("SCRATCH_API", "screenshot_http_timeout"))
+SCREENSHOT_WAIT_TIMEOUT = float(helpers.config.get("SCRATCH_API", "screenshot_wait_timeout"))
 
 _log = logger.log
 _cached_jsoup_documents = {}
@@ -131,6 +134,46 @@ def download_project(project_url, target_dir, progress_bar=None):
     download_project_code(project_id, target_dir)
     return
 
+class AutomaticScreenshotDownload(object):
+    '''
+    Downloads the automatic screenshot of a project in the background while the project gets
+    converted. Its retries and timeouts are much shorter than the ones of all other requests,
+    since a missing screenshot does not make the converted program any worse.
+    '''
+
+    def __init__(self, image_url):
+        from threading import Thread
+        from scratchtocatrobat.tools import stats
+        self.image_url = image_url
+        self._content = None
+        self._thread = Thread(target=self._download, args=(stats.current(),))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _download(self, conversion_stats):
+        from scratchtocatrobat.tools import common
+        from scratchtocatrobat.tools import stats
+        try:
+            with stats.attached(conversion_stats), common.TemporaryDirectory() as download_dir:
+                download_file_path = os.path.join(download_dir, "automatic_screenshot")
+                common.download_file(self.image_url, download_file_path, retries=SCREENSHOT_HTTP_RETRIES,
+                                     backoff=1, delay=1, timeout=SCREENSHOT_HTTP_TIMEOUT)
+                with open(download_file_path, "rb") as fp:
+                    self._content = fp.read()
+        except:
+            _log.warning("Cannot download automatic screenshot %s: %s", self.image_url, sys.exc_info()[1])
+
+    def content(self, timeout=SCREENSHOT_WAIT_TIMEOUT):
+        # None if the download failed or did not finish in time
+        from scratchtocatrobat.tools import stats
+        self._thread.join(timeout)
+        if self._thread.isAlive():
+            _log.warning("Automatic screenshot not downloaded within %s secs: %s", timeout, self.image_url)
+            stats.increment("automaticScreenshotTimeouts")
+            return None
+        return self._content
+
+
 class _ResponseJsoupDocumentWrapper(ResponseDocumentWrapper):
     def select_first_as_text(self, query):
         result = self.wrapped_document.select(query).first()
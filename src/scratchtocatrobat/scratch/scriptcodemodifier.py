@@ -20,6 +20,10 @@
 #  along with this program.  If not, see http://www.gnu.org/licenses/.
 
 
+# marks the end of the arguments of a block
+_NO_MORE_ARGUMENTS = object()
+
+
 class ScriptCodeModifier(object):
     def modify(self, script_code):
         return script_code
@@ -32,20 +36,35 @@ class ZeroifyEmptyValuesModifier(ScriptCodeModifier):
 
     def _zeroify_empty_values(self, raw_block):
         from scratchtocatrobat.converter import converter
+        # NOTE: the raw block itself is left untouched, since it may be shared with the raw project data.
+        #       Nested blocks are handled with an explicit stack (no recursion -> no limit for nesting depth).
         if not isinstance(raw_block, list) or len(raw_block) == 0:
             return raw_block
 
-        if isinstance(raw_block[0], list):
-            return [self._zeroify_empty_values(sub_block) for sub_block in raw_block]
-
-        # replace empty arguments/operands of math functions and math operators
-        # (i.e. "" and " ") with 0. This is actually default behavior in Scratch.
-        if converter.is_math_function_or_operator(raw_block[0]):
-            assert len(raw_block) > 1
-            raw_block[1:] = map(lambda arg: arg if not isinstance(arg, (str, unicode)) \
-                                                or arg.strip() != '' else 0, raw_block[1:])
-
-        return [raw_block[0]] + [self._zeroify_empty_values(arg) for arg in raw_block[1:]]
+        modified_block = []
+        blocks_to_modify = [(raw_block, modified_block)]
+        while blocks_to_modify:
+            block, modified = blocks_to_modify.pop()
+            if isinstance(block[0], list):
+                arguments = block
+            else:
+                modified.append(block[0])
+                arguments = block[1:]
+                # replace empty arguments/operands of math functions and math operators
+                # (i.e. "" and " ") with 0. This is actually default behavior in Scratch.
+                if converter.is_math_function_or_operator(block[0]):
+                    assert len(block) > 1
+                    arguments = map(lambda arg: arg if not isinstance(arg, (str, unicode)) \
+                                                   or arg.strip() != '' else 0, arguments)
+
+            for argument in arguments:
+                if isinstance(argument, list) and len(argument) > 0:
+                    modified_argument = []
+                    blocks_to_modify.append((argument, modified_argument))
+                    modified.append(modified_argument)
+                else:
+                    modified.append(argument)
+        return modified_block
 
 
 class InjectMissingBracketsModifier(ScriptCodeModifier):
@@ -55,28 +74,48 @@ class InjectMissingBracketsModifier(ScriptCodeModifier):
 
     def _inject_missing_brackets_to_formula_blocks(self, raw_block, math_stack=[]):
         from scratchtocatrobat.converter import converter
-        if not isinstance(raw_block, list) or len(raw_block) == 0:
-            return raw_block
-
-        if isinstance(raw_block[0], list):
-            return [self._inject_missing_brackets_to_formula_blocks(sub_block, []) for sub_block in raw_block]
-
-        should_add_brackets = False
-        if converter.is_math_operator(raw_block[0]):
-            assert len(raw_block) > 1
-            current_operator = raw_block[0]
-            if current_operator != "()":
-                if len(math_stack) > 0:
-                    previous_operator = math_stack[len(math_stack) - 1]
-                    should_add_brackets = self._has_previous_operator_higher_priority(previous_operator, current_operator)
-                    assert(not isinstance(current_operator, list))
-
-                math_stack += [current_operator]
+        # Explicit stack of the blocks whose arguments are being processed (no recursion -> no limit
+        # for nesting depth). The arguments of a block are processed one after the other, since all
+        # of them share (and extend) the math stack of the block.
+        open_blocks = []
+
+        def open_block(block, block_math_stack, parent_result):
+            if not isinstance(block, list) or len(block) == 0:
+                parent_result.append(block)
+                return
+
+            if isinstance(block[0], list):
+                # each block of a block list starts with an empty math stack
+                open_blocks.append((iter(block), None, [], False, parent_result))
+                return
+
+            should_add_brackets = False
+            if converter.is_math_operator(block[0]):
+                assert len(block) > 1
+                current_operator = block[0]
+                if current_operator != "()":
+                    if len(block_math_stack) > 0:
+                        previous_operator = block_math_stack[len(block_math_stack) - 1]
+                        should_add_brackets = self._has_previous_operator_higher_priority(previous_operator, current_operator)
+                        assert(not isinstance(current_operator, list))
+
+                    block_math_stack += [current_operator]
+                else:
+                    block_math_stack = []
+
+            open_blocks.append((iter(block[1:]), block_math_stack, [block[0]], should_add_brackets, parent_result))
+
+        result = []
+        open_block(raw_block, math_stack, result)
+        while open_blocks:
+            arguments, block_math_stack, block_result, should_add_brackets, parent_result = open_blocks[-1]
+            argument = next(arguments, _NO_MORE_ARGUMENTS)
+            if argument is _NO_MORE_ARGUMENTS:
+                open_blocks.pop()
+                parent_result.append(["()", block_result] if should_add_brackets else block_result)
             else:
-                math_stack = []
-
-        result = [raw_block[0]] + [self._inject_missing_brackets_to_formula_blocks(arg, math_stack) for arg in raw_block[1:]]
-        return ["()", result] if should_add_brackets else result
+                open_block(argument, block_math_stack if block_math_stack is not None else [], block_result)
+        return result[0]
 
 
     def _has_previous_operator_higher_priority(self, previous_operator, curr_operator):
@@ -0,0 +1,64 @@
+#  ScratchToCatrobat: A tool for converting Scratch projects into Catrobat programs.
+#  Copyright (C) 2013-2017 The Catrobat Team
+#  (http://developer.catrobat.org/credits)
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Affero General Public License as
+#  published by the Free Software Foundation, either version 3 of the
+#  License, or (at your option) any later version.
+#
+#  An additional term exception under section 7 of the GNU Affero
+#  General Public License, version 3, is available at
+#  http://developer.catrobat.org/license_additional_term
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU Affero General Public License for more details.
+#
+#  You should have received a copy of the GNU Affero General Public License
+#  along with this program.  If not, see http://www.gnu.org/licenses/.
+
+import os
+import unittest
+import zipfile
+
+from scratchtocatrobat.scratch import projectarchive
+from scratchtocatrobat.scratch import scratch
+from scratchtocatrobat.tools import common
+from scratchtocatrobat.tools import common_testing
+
+
+class ProjectArchiveTest(common_testing.BaseTestCase):
+
+    def _packed_test_project(self, project_name, archive_path):
+        project_path = common_testing.get_test_project_path(project_name)
+        with zipfile.ZipFile(archive_path, "w") as zip_file:
+            for file_name in os.listdir(project_path):
+                zip_file.write(os.path.join(project_path, file_name), file_name)
+        return project_path
+
+    def test_can_extract_used_files_only(self):
+        with common.TemporaryDirectory() as temp_dir:
+            archive_path = os.path.join(temp_dir, "simple.sb2")
+            project_path = self._packed_test_project("simple", archive_path)
+            extraction_path = os.path.join(temp_dir, "extracted")
+            projectarchive.extract_used_files(archive_path, extraction_path)
+
+            unused_files = {'2.wav', '3.png', '4.png', '5.png', '6.png', '8.png'}
+            assert set(os.listdir(extraction_path)) == set(os.listdir(project_path)) - unused_files
+            # the pen layer is referenced by the project code, but no regular resource
+            project = scratch.Project(extraction_path, name="simple", project_id=common_testing.PROJECT_DUMMY_ID)
+            assert map(os.path.basename, project.unused_resource_paths) == ['0.png']
+
+    def test_can_extract_packed_test_projects_completely(self):
+        for archive_name in os.listdir(common_testing.get_test_resources_path("scratch_packed")):
+            with common.TemporaryDirectory() as extraction_path:
+                archive_path = common_testing.get_test_project_packed_file(archive_name)
+                projectarchive.extract_used_files(archive_path, extraction_path)
+                with zipfile.ZipFile(archive_path) as zip_file:
+                    assert len(os.listdir(extraction_path)) == len(zip_file.namelist())
+
+
+if __name__ == "__main__":
+    unittest.main()
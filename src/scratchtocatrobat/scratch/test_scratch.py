@@ -19,6 +19,7 @@
 #  You should have received a copy of the GNU Affero General Public License
 #  along with this program.  If not, see http://www.gnu.org/licenses/.
 
+import copy
 import json
 import os
 import string
@@ -27,6 +28,7 @@ import unittest
 from scratchtocatrobat.tools import common
 from scratchtocatrobat.scratch import scratch
 from scratchtocatrobat.tools import common_testing
+from scratchtocatrobat.tools import stats
 
 EASY_SCRIPTS = [
     [23, 125,
@@ -111,6 +113,15 @@ class TestProjectInit(unittest.TestCase):
     def test_can_construct_on_correct_input(self):
         assert scratch.Project(common_testing.get_test_project_path("simple"), name="dummy", project_id=common_testing.PROJECT_DUMMY_ID)
 
+    def test_can_construct_from_given_project_code(self):
+        project_path = common_testing.get_test_project_path("simple")
+        project_code = scratch.RawProject.raw_project_code_from_project_folder_path(project_path)
+        project = scratch.Project(project_path, name="dummy", project_id=common_testing.PROJECT_DUMMY_ID,
+                                  project_code=project_code)
+        expected_project = scratch.Project(project_path, name="dummy", project_id=common_testing.PROJECT_DUMMY_ID)
+        assert [obj.name for obj in project.objects] == [obj.name for obj in expected_project.objects]
+        assert project.md5_to_resource_path_map == expected_project.md5_to_resource_path_map
+
     def test_fail_on_non_existing_input_path(self):
         with self.assertRaises(EnvironmentError):
             # TODO: check error message
@@ -158,6 +169,13 @@ class TestProjectFunc(unittest.TestCase):
         expected_resources = ['0.png', '2.wav', '3.png', '4.png', '5.png', '6.png', '8.png']
         assert set(map(os.path.basename, project.unused_resource_paths)) == set(expected_resources)
 
+    def test_can_find_all_resource_names_of_resource(self):
+        for raw_resource in self.project._raw_resources():
+            resource_md5 = raw_resource.get(scratch.JsonKeys.COSTUME_MD5, raw_resource.get(scratch.JsonKeys.SOUND_MD5))
+            resource_name = raw_resource.get(scratch.JsonKeys.COSTUME_NAME, raw_resource.get(scratch.JsonKeys.SOUND_NAME))
+            assert resource_name in self.project.find_all_resource_names_for(resource_md5)
+        assert self.project.find_all_resource_names_for("non_existing_resource.png") == []
+
 
 class TestRawProjectInit(unittest.TestCase):
     TEST_PROJECTS = ["dancing_castle", 'simple']
@@ -282,6 +300,42 @@ class TestObjectFunc(unittest.TestCase):
             assert "name" in variable
             assert "value" in variable
 
+    def test_can_apply_all_workarounds_within_same_script(self):
+        raw_object = { "objName": "Sprite1", "scripts": [[0, 0, [
+            ["whenGreenFlag"],
+            ["say:", ["+", ["timer"], ["distanceTo:", "Sprite2"]]],
+            ["doIf", ["keyPressed:", "space"], [["timerReset"], ["say:", ["getAttribute:of:", "x position", "Sprite2"]]]],
+            ["say:", ["distanceTo:", "Unknown"]]
+        ]]]}
+        scratch_object = scratch.Object(raw_object)
+        workaround_info = scratch_object.preprocess_object(["Sprite1", "Sprite2"])
+
+        assert workaround_info[scratch.ADD_TIMER_SCRIPT_KEY]
+        assert workaround_info[scratch.ADD_TIMER_RESET_SCRIPT_KEY]
+        assert workaround_info[scratch.ADD_KEY_PRESSED_SCRIPT_KEY] == {("space", "keyPressedBrick")}
+        # all distanceTo-blocks are replaced as soon as one refers to an existing sprite
+        assert workaround_info[scratch.ADD_POSITION_SCRIPT_TO_OBJECTS_KEY] == {"Sprite2", "Unknown"}
+        assert workaround_info[scratch.ADD_UPDATE_ATTRIBUTE_SCRIPT_TO_OBJECTS_KEY] == {"Sprite2": {"xpos"}}
+        assert not workaround_info[scratch.ADD_MOUSE_SPRITE]
+
+        [script] = scratch_object.scripts
+        assert script.blocks[0] == ["say:", ["+", ["readVariable", scratch.S2CC_TIMER_VARIABLE_NAME],
+                                             script.blocks[0][1][2]]]
+        assert script.blocks[0][1][2][0] == "computeFunction:of:"
+        assert script.blocks[1] == ["doIf", ["readVariable", scratch.S2CC_KEY_VARIABLE_NAME + "space"], [
+            ["doBroadcastAndWait", scratch.S2CC_TIMER_RESET_BROADCAST_MESSAGE],
+            ["say:", ["readVariable", scratch.S2CC_GETATTRIBUTE_PREFIX + "Sprite2_xpos"]]]]
+        assert script.blocks[2][1][0] == "computeFunction:of:"
+
+    def test_can_keep_distance_to_blocks_of_unknown_sprites(self):
+        raw_object = { "objName": "Sprite1", "scripts": [[0, 0, [
+            ["whenGreenFlag"], ["say:", ["distanceTo:", "Unknown"]]
+        ]]]}
+        scratch_object = scratch.Object(raw_object)
+        workaround_info = scratch_object.preprocess_object(["Sprite1", "Sprite2"])
+        assert workaround_info[scratch.ADD_POSITION_SCRIPT_TO_OBJECTS_KEY] == set()
+        assert scratch_object.scripts[0].blocks[0] == ["say:", ["distanceTo:", "Unknown"]]
+
 
 class TestScriptInit(unittest.TestCase):
 
@@ -334,6 +388,56 @@ class TestBlockInit(unittest.TestCase):
             assert [len(block.children) for block in nested_blocks] == list(expected_block_children_number)
 
 
+class _DictBasedScriptElement(object):
+    # reference for the memory benchmark: script element without __slots__
+    def __init__(self, script_element):
+        self.name = script_element.name
+        self.children = [_DictBasedScriptElement(child) for child in script_element.children]
+
+
+class TestScriptElementMemory(common_testing.BaseTestCase):
+
+    @staticmethod
+    def _used_heap_in_bytes():
+        from java.lang import Runtime, System
+        for _ in range(3):
+            System.gc()
+        runtime = Runtime.getRuntime()
+        return runtime.totalMemory() - runtime.freeMemory()
+
+    @staticmethod
+    def _raw_scripts_of_test_projects():
+        raw_scripts = []
+        test_projects_path = common_testing.get_test_project_path()
+        for project_name in sorted(os.listdir(test_projects_path)):
+            project_file_path = os.path.join(test_projects_path, project_name, scratch._PROJECT_FILE_NAME)
+            try:
+                with open(project_file_path) as fp:
+                    project_code = json.load(fp)
+            except (IOError, ValueError):
+                continue
+            for object_data in [project_code] + project_code.get("children", []):
+                raw_scripts += [raw_script for raw_script in object_data.get("scripts", [])
+                                if scratch.Script.is_valid_script_input(raw_script)]
+        return raw_scripts
+
+    def test_memory_of_script_element_trees_of_test_projects(self):
+        number_of_copies = 20
+        script_blocks = [scratch.Script(raw_script).blocks for raw_script in self._raw_scripts_of_test_projects()]
+        assert len(script_blocks) > 0
+
+        heap_before = self._used_heap_in_bytes()
+        script_element_trees = [scratch.ScriptElement.from_raw_block(blocks)
+                                for _ in range(number_of_copies) for blocks in script_blocks]
+        slotted_heap = self._used_heap_in_bytes() - heap_before
+        dict_based_trees = [_DictBasedScriptElement(tree) for tree in script_element_trees]
+        del script_element_trees
+        dict_based_heap = self._used_heap_in_bytes() - heap_before
+        common.log.info("Heap used by script element trees of %d scripts: %d bytes with __slots__, " \
+                        "%d bytes without", len(script_blocks) * number_of_copies, slotted_heap, dict_based_heap)
+        assert len(dict_based_trees) == len(script_blocks) * number_of_copies
+        assert not hasattr(scratch.ScriptElement.from_raw_block(script_blocks[0]), "__dict__")
+
 class TestScriptElementTree(common_testing.BaseTestCase):
 
     def test_verify_simple_formula_in_script_element_tree(self):
@@ -449,6 +553,63 @@ class TestScriptElementTree(common_testing.BaseTestCase):
         assert len(right_child.children) == 0
 
 
+class _NameCollectingTraverser(scratch.AbstractBlocksTraverser):
+
+    def __init__(self):
+        self.entered_names = []
+        self.visited_names = []
+
+    def _enter(self, script_element):
+        self.entered_names += [script_element.name]
+
+    def _visit(self, script_element):
+        self.visited_names += [script_element.name]
+
+
+class TestDeeplyNestedScripts(unittest.TestCase):
+    NESTING_DEPTH = 5000
+
+    def test_can_construct_script_with_deeply_nested_formula(self):
+        formula = 1
+        for _ in range(self.NESTING_DEPTH):
+            formula = ["+", formula, ""]
+        script = scratch.Script([0, 0, [["whenGreenFlag"], ["say:", formula]]])
+
+        script_element = script.script_element.children[0].children[0]
+        for _ in range(self.NESTING_DEPTH):
+            assert script_element.name == "+"
+            assert len(script_element.children) == 2
+            # empty values are replaced by zero
+            assert script_element.children[1].name == 0
+            script_element = script_element.children[0]
+        assert script_element.name == 1
+
+    def test_can_construct_script_with_deeply_nested_if_blocks(self):
+        blocks = [["say:", "Hello!"]]
+        for _ in range(self.NESTING_DEPTH):
+            blocks = [["doIf", ["=", 1, 1], blocks]]
+        script = scratch.Script([0, 0, [["whenGreenFlag"]] + blocks])
+
+        script_element = script.script_element.children[0]
+        for _ in range(self.NESTING_DEPTH):
+            assert script_element.name == "doIf"
+            assert [child.name for child in script_element.children[0].children] == [1, 1]
+            assert isinstance(script_element.children[1], scratch.BlockList)
+            script_element = script_element.children[1].children[0]
+        assert script_element.name == "say:"
+
+    def test_can_traverse_deeply_nested_script_elements(self):
+        formula = 1
+        for _ in range(self.NESTING_DEPTH):
+            formula = ["+", formula, 2]
+        script = scratch.Script([0, 0, [["whenGreenFlag"], ["say:", formula]]])
+
+        traverser = _NameCollectingTraverser()
+        traverser.traverse(script.script_element)
+        assert traverser.entered_names == ["<LIST>", "say:"] + ["+"] * self.NESTING_DEPTH + [1] + [2] * self.NESTING_DEPTH
+        assert traverser.visited_names == [1] + [2, "+"] * self.NESTING_DEPTH + ["say:", "<LIST>"]
+
+
 class TestTimerAndResetTimerBlockWorkarounds(unittest.TestCase):
     TIMER_HELPER_OBJECTS_DATA_TEMPLATE = {
         "objName": "Stage",
@@ -504,6 +665,22 @@ class TestTimerAndResetTimerBlockWorkarounds(unittest.TestCase):
         assert len(global_variables) == 1
         assert global_variables[0] == { "name": scratch.S2CC_TIMER_VARIABLE_NAME, "value": 0, "isPersistent": False }
 
+    def test_timer_block_with_shared_project_data(self):
+        cls = self.__class__
+        script_data = [0, 0, [["whenGreenFlag"], ["wait:elapsed:from:", ["+", ["timer"], ""]]]]
+        cls.TIMER_HELPER_OBJECTS_DATA_TEMPLATE["children"][0]["scripts"] = [script_data]
+        project_data = copy.deepcopy(cls.TIMER_HELPER_OBJECTS_DATA_TEMPLATE)
+        raw_project = scratch.RawProject(project_data, copy_on_write=True)
+        copied_raw_project = scratch.RawProject(cls.TIMER_HELPER_OBJECTS_DATA_TEMPLATE)
+
+        # the shared project data must not be modified by any workaround
+        assert project_data == cls.TIMER_HELPER_OBJECTS_DATA_TEMPLATE
+        for shared_object, copied_object in zip(raw_project.objects, copied_raw_project.objects):
+            assert shared_object.scripts == copied_object.scripts
+            assert shared_object._dict_object == copied_object._dict_object
+        [background_object, _] = raw_project.objects
+        assert len(background_object._dict_object["variables"]) == 1
+
     def test_same_timer_block_twice(self):
         cls = self.__class__
         script_data = [0, 0, [["whenGreenFlag"], ["wait:elapsed:from:", ["timer"]], ["wait:elapsed:from:", ["timer"]]]]
@@ -1532,6 +1709,70 @@ class TestGetAttributeBlockWorkarounds(unittest.TestCase):
             assert stage_object_variables[1] == { "name": variable_name, "value": 0, "isPersistent": False }
 
 
+class TestMergedHelperUpdateLoops(unittest.TestCase):
+
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+        self.root_info = {
+            "objName": "Stage",
+            "sounds": [],
+            "costumes": [],
+            "currentCostumeIndex": 0,
+            "penLayerMD5": "5c81a336fab8be57adc039a8a2b33ca9.png",
+            "penLayerID": 0,
+            "tempoBPM": 60,
+            "videoAlpha": 0.5,
+            "children": [{ "objName": "Sprite1", "scripts": [[0, 0, [
+                             ["whenGreenFlag"],
+                             ["say:", ["+", ["timer"], ["distanceTo:", "Sprite2"]]],
+                             ["say:", ["getAttribute:of:", "direction", "Sprite2"]]
+                         ]]] },
+                         { "objName": "Sprite2", "scripts": [] }],
+            "scripts": [],
+            "info": {}
+        }
+
+    def _raw_project_and_number_of_update_loops(self, merge_update_loops):
+        conversion_stats = stats.ConversionStats()
+        with stats.recording(conversion_stats):
+            raw_project = scratch.RawProject(self.root_info, merge_update_loops=merge_update_loops)
+        return raw_project, conversion_stats.as_dict()["counters"].get("helperUpdateLoops", 0)
+
+    def test_separate_update_loops_by_default(self):
+        raw_project, number_of_update_loops = self._raw_project_and_number_of_update_loops(False)
+        [background_object, first_object, second_object] = raw_project.objects
+        assert number_of_update_loops == 3
+        assert len(background_object.scripts) == 1
+        assert len(first_object.scripts) == 1
+        assert len(second_object.scripts) == 2
+
+    def test_merge_update_loops_of_each_object(self):
+        raw_project, number_of_update_loops = self._raw_project_and_number_of_update_loops(True)
+        [background_object, first_object, second_object] = raw_project.objects
+        position_x_var_name = scratch.S2CC_POSITION_X_VARIABLE_NAME_PREFIX + "Sprite2"
+        position_y_var_name = scratch.S2CC_POSITION_Y_VARIABLE_NAME_PREFIX + "Sprite2"
+        attribute_var_name = scratch.S2CC_GETATTRIBUTE_PREFIX + "Sprite2_heading"
+        expected_background_object_script_data = [0, 0, [["whenGreenFlag"], ["doForever", [
+            ["changeVar:by:", scratch.S2CC_TIMER_VARIABLE_NAME, scratch.UPDATE_HELPER_VARIABLE_TIMEOUT],
+            ["wait:elapsed:from:", scratch.UPDATE_HELPER_VARIABLE_TIMEOUT]
+        ]]]]
+        expected_second_object_script_data = [0, 0, [["whenGreenFlag"], ["doForever", [
+            ["setVar:to:", position_x_var_name, ["xpos"]],
+            ["setVar:to:", position_y_var_name, ["ypos"]],
+            ["setVar:to:", attribute_var_name, ["heading"]],
+            ["wait:elapsed:from:", scratch.UPDATE_HELPER_VARIABLE_TIMEOUT]
+        ]]]]
+
+        # validate
+        assert number_of_update_loops == 2
+        assert background_object.scripts == [scratch.Script(expected_background_object_script_data)]
+        assert len(first_object.scripts) == 1
+        assert second_object.scripts == [scratch.Script(expected_second_object_script_data)]
+        global_variable_names = [variable["name"] for variable in background_object._dict_object["variables"]]
+        assert set(global_variable_names) == {scratch.S2CC_TIMER_VARIABLE_NAME, position_x_var_name,
+                                              position_y_var_name, attribute_var_name}
+
+
 if __name__ == "__main__":
     # import sys;sys.argv = ['', 'Test.testName']
     unittest.main()
@@ -21,9 +21,11 @@
 #  along with this program.  If not, see http://www.gnu.org/licenses/.
 import unittest
 import os
+import socket
 
 from scratchtocatrobat.tools import common
 from scratchtocatrobat.tools import common_testing
+from scratchtocatrobat.tools import stats
 from scratchtocatrobat.scratch import scratch
 from scratchtocatrobat.scratch import scratchwebapi
 from datetime import datetime
@@ -340,6 +342,32 @@ class WebApiTest(common_testing.BaseTestCase):
             assert extracted_project_remixes == expected_project_remixes, \
                 "'{}' is not equal to '{}'".format(extracted_project_remixes,
                                                    expected_project_remixes)
+
+    def test_can_download_automatic_screenshot_in_background(self):
+        image_url = scratchwebapi.getMetaDataEntry(10205819, "image")
+        automatic_screenshot_download = scratchwebapi.AutomaticScreenshotDownload(image_url)
+        automatic_screenshot_content = automatic_screenshot_download.content()
+        assert automatic_screenshot_content is not None
+        assert len(automatic_screenshot_content) > 0
+
+    def test_skip_automatic_screenshot_on_wrong_url(self):
+        automatic_screenshot_download = scratchwebapi.AutomaticScreenshotDownload("http://localhost:1/screenshot.png")
+        assert automatic_screenshot_download.content() is None
+
+    def test_skip_automatic_screenshot_if_download_takes_too_long(self):
+        # accepts connections, but never answers
+        server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server_socket.bind(("localhost", 0))
+        server_socket.listen(1)
+        self.addCleanup(server_socket.close)
+        image_url = "http://localhost:{}/screenshot.png".format(server_socket.getsockname()[1])
+
+        conversion_stats = stats.ConversionStats()
+        with stats.recording(conversion_stats):
+            automatic_screenshot_download = scratchwebapi.AutomaticScreenshotDownload(image_url)
+            assert automatic_screenshot_download.content(timeout=0.1) is None
+        assert conversion_stats.as_dict()["counters"]["automaticScreenshotTimeouts"] == 1
+
     def test_extract_project_details(self):
         details =  scratchwebapi.extract_project_details(10205819, escape_quotes=True)
         assert details.as_dict()["modified_date"] != None
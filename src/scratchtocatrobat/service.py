@@ -0,0 +1,158 @@
+#  ScratchToCatrobat: A tool for converting Scratch projects into Catrobat programs.
+#  Copyright (C) 2013-2017 The Catrobat Team
+#  (http://developer.catrobat.org/credits)
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Affero General Public License as
+#  published by the Free Software Foundation, either version 3 of the
+#  License, or (at your option) any later version.
+#
+#  An additional term exception under section 7 of the GNU Affero
+#  General Public License, version 3, is available at
+#  http://developer.catrobat.org/license_additional_term
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU Affero General Public License for more details.
+#
+#  You should have received a copy of the GNU Affero General Public License
+#  along with this program.  If not, see http://www.gnu.org/licenses/.
+
+"""
+  Resident conversion service.
+  Keeps one Jython interpreter (and therefore one JVM) alive and runs the converter
+  in-process for each request received over a local TCP socket. This saves the
+  interpreter start-up and class loading costs that otherwise have to be paid for
+  every single conversion job.
+"""
+
+import json
+import logging
+import SocketServer
+import threading
+
+from scratchtocatrobat.tools import helpers
+from scratchtocatrobat.tools import logger
+
+log = logger.log
+_protocol = helpers.ConversionServiceProtocol
+
+SERVICE_HOST = helpers.config.get("CONVERTER_SERVICE", "host")
+SERVICE_PORT = int(helpers.config.get("CONVERTER_SERVICE", "port"))
+MAX_CONCURRENT_CONVERSIONS = int(helpers.config.get("CONVERTER_SERVICE", "max_concurrent_conversions"))
+
+
+class _SocketLineWriter(object):
+    """ File-like wrapper that forwards everything written to it to the client socket. """
+
+    def __init__(self, wfile):
+        self._wfile = wfile
+        self._lock = threading.Lock()
+        self.closed = False
+
+    def write(self, data):
+        if self.closed:
+            return
+        with self._lock:
+            try:
+                self._wfile.write(data.encode("utf-8") if isinstance(data, unicode) else data)
+                self._wfile.flush()
+            except IOError:
+                # client went away -> finish conversion anyway, but stop sending output
+                self.closed = True
+
+    def flush(self):
+        pass
+
+
+class _ThreadLogFilter(logging.Filter):
+    """ Lets only log records of the given thread pass, i.e. those of one conversion. """
+
+    def __init__(self, thread_ident):
+        logging.Filter.__init__(self)
+        self._thread_ident = thread_ident
+
+    def filter(self, record):
+        return record.thread == self._thread_ident
+
+
+class _ConversionRequestHandler(SocketServer.StreamRequestHandler):
+
+    def handle(self):
+        output_stream = _SocketLineWriter(self.wfile)
+        try:
+            request = json.loads(self.rfile.readline())
+            url = request[_protocol.KEY_URL].replace("http://", "https://")
+            output_dir = request[_protocol.KEY_OUTPUT_DIR]
+        except (ValueError, KeyError, TypeError) as e:
+            log.error("Invalid conversion request: %s", e)
+            output_stream.write(_protocol.exit_code_line(helpers.ExitCode.FAILURE))
+            return
+
+        log_handler = logging.StreamHandler(output_stream)
+        log_handler.setFormatter(logging.Formatter(helpers.config.get("LOG", "stdout_log_format").replace("\\", "")))
+        log_handler.setLevel(logging.INFO)
+        # conversions run concurrently -> each client only gets the log lines of its own conversion
+        log_handler.addFilter(_ThreadLogFilter(threading.current_thread().ident))
+        with self.server.conversion_slots:
+            log.addHandler(log_handler)
+            try:
+                log.info("Conversion service: converting %s", url)
+                exit_code = self.server.run_converter(url, output_dir,
+                                                      archive_name=request.get(_protocol.KEY_ARCHIVE_NAME),
+                                                      web_mode=request.get(_protocol.KEY_WEB_MODE, True),
+                                                      output_stream=output_stream)
+            except Exception as e:
+                log.exception(e)
+                exit_code = helpers.ExitCode.FAILURE
+            finally:
+                log.removeHandler(log_handler)
+        output_stream.write(_protocol.exit_code_line(exit_code))
+
+
+class ConversionServer(SocketServer.ThreadingMixIn, SocketServer.TCPServer):
+    """
+    Serves each request in its own thread. At most max_concurrent_conversions
+    conversions run at the same time, further requests wait for a free slot.
+    """
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, run_converter, host=SERVICE_HOST, port=SERVICE_PORT,
+                 max_concurrent_conversions=MAX_CONCURRENT_CONVERSIONS):
+        SocketServer.TCPServer.__init__(self, (host, port), _ConversionRequestHandler)
+        self.run_converter = run_converter
+        self.conversion_slots = threading.BoundedSemaphore(max(1, max_concurrent_conversions))
+
+
+def warm_up():
+    # loads the Catroid class hierarchy, XStream and Batik once, so that the first
+    # conversion request does not have to pay for it
+    from scratchtocatrobat.converter import converter  # @UnusedImport
+    from scratchtocatrobat.converter import catrobat
+    from scratchtocatrobat.tools import svgtopng, wavconverter
+    catrobat.xstream_serializer()
+    svgtopng._checked_batik_jar_path()
+    wavconverter._checked_sox_path()
+
+
+def serve_forever(run_converter, host=SERVICE_HOST, port=SERVICE_PORT):
+    try:
+        warm_up()
+    except ImportError:
+        log.error("Must be called with Jython interpreter.")
+        return helpers.ExitCode.FAILURE
+    except EnvironmentError as e:
+        log.error(e)
+        return helpers.ExitCode.FAILURE
+    server = ConversionServer(run_converter, host, port)
+    log.info("Conversion service listening on %s:%d", host, port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        log.info("Conversion service stopped")
+    finally:
+        server.server_close()
+    return helpers.ExitCode.SUCCESS
@@ -0,0 +1,106 @@
+#  ScratchToCatrobat: A tool for converting Scratch projects into Catrobat programs.
+#  Copyright (C) 2013-2017 The Catrobat Team
+#  (http://developer.catrobat.org/credits)
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Affero General Public License as
+#  published by the Free Software Foundation, either version 3 of the
+#  License, or (at your option) any later version.
+#
+#  An additional term exception under section 7 of the GNU Affero
+#  General Public License, version 3, is available at
+#  http://developer.catrobat.org/license_additional_term
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU Affero General Public License for more details.
+#
+#  You should have received a copy of the GNU Affero General Public License
+#  along with this program.  If not, see http://www.gnu.org/licenses/.
+import functools
+import json
+import os
+import shutil
+import unittest
+
+from scratchtocatrobat import batch
+from scratchtocatrobat import main
+from scratchtocatrobat.scratch import scratchwebapi
+from scratchtocatrobat.tools import common_testing
+from scratchtocatrobat.tools import helpers
+
+_run_converter_without_cache = functools.partial(main.run_converter, use_cache=False)
+
+
+class BatchTest(common_testing.ProjectTestCase):
+
+    def _batch_input_dir(self):
+        input_dir = os.path.join(self.temp_dir, "input")
+        os.makedirs(input_dir)
+        for project_filename in common_testing.TEST_PROJECT_FILENAME_TO_ID_MAP:
+            shutil.copy(common_testing.get_test_project_packed_file(project_filename), input_dir)
+        return input_dir
+
+    def _read_summary(self, output_path):
+        with open(os.path.join(output_path, batch.SUMMARY_FILE_NAME), "r") as summary_file:
+            return json.load(summary_file)
+
+    def test_can_collect_project_files_of_directory(self):
+        items = batch.collect_batch_items(self._batch_input_dir())
+        expected_archive_names = sorted(os.path.splitext(file_name)[0]
+                                        for file_name in common_testing.TEST_PROJECT_FILENAME_TO_ID_MAP)
+        assert [item.archive_name for item in items] == expected_archive_names
+
+    def test_can_collect_projects_of_manifest_file(self):
+        project_file_path = common_testing.get_test_project_packed_file("dancing_castle.zip")
+        manifest_path = os.path.join(self.temp_dir, "manifest.txt")
+        with open(manifest_path, "w") as manifest_file:
+            manifest_file.write("# comment\n\n10205819\nhttp://scratch.mit.edu/projects/10132588/\n%s\n" % project_file_path)
+
+        items = batch.collect_batch_items(manifest_path)
+        assert [item.archive_name for item in items] == ["10205819", "10132588", "dancing_castle"]
+        assert items[0].source == helpers.config.get("SCRATCH_API", "project_base_url") + "10205819"
+        assert items[1].source == "https://scratch.mit.edu/projects/10132588/"
+        assert items[2].source == project_file_path
+
+    def _assert_all_projects_converted(self, output_path):
+        summary = self._read_summary(output_path)
+        assert summary["numProjects"] == len(common_testing.TEST_PROJECT_FILENAME_TO_ID_MAP)
+        assert summary["numFailed"] == 0
+        for project_summary in summary["projects"]:
+            assert project_summary["status"] == batch.BatchStatus.SUCCESS
+            assert project_summary["durationSeconds"] > 0
+            project_filename = os.path.basename(project_summary["source"])
+            project_id = common_testing.TEST_PROJECT_FILENAME_TO_ID_MAP[project_filename]
+            project_name = scratchwebapi.getMetaDataEntry(project_id, "title")
+            self.assertValidCatrobatProgramPackageAndUnpackIf(project_summary["outputPath"], project_name)
+
+    def test_can_convert_directory_of_projects(self):
+        output_path = self._testresult_folder_path
+        exit_code = batch.run_batch(_run_converter_without_cache, self._batch_input_dir(), output_path, num_workers=1)
+        assert exit_code == helpers.ExitCode.SUCCESS
+        self._assert_all_projects_converted(output_path)
+
+    def test_can_convert_directory_of_projects_with_multiple_workers(self):
+        output_path = self._testresult_folder_path
+        exit_code = batch.run_batch(_run_converter_without_cache, self._batch_input_dir(), output_path, num_workers=2)
+        assert exit_code == helpers.ExitCode.SUCCESS
+        self._assert_all_projects_converted(output_path)
+
+    def test_failed_conversion_is_reported_in_summary(self):
+        input_dir = self._batch_input_dir()
+        with open(os.path.join(input_dir, "broken.sb2"), "w") as broken_file:
+            broken_file.write("no zip file")
+        output_path = self._testresult_folder_path
+
+        assert batch.run_batch(_run_converter_without_cache, input_dir, output_path) == helpers.ExitCode.FAILURE
+        summary = self._read_summary(output_path)
+        assert summary["numFailed"] == 1
+        failed_projects = [_ for _ in summary["projects"] if _["status"] == batch.BatchStatus.FAILURE]
+        assert failed_projects[0]["archiveName"] == "broken"
+        assert failed_projects[0]["outputPath"] is None
+
+
+if __name__ == "__main__":
+    unittest.main()
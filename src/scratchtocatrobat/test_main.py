@@ -75,7 +75,7 @@ class MainTest(common_testing.ProjectTestCase):
         output_path = self._testresult_folder_path
         if len(args) == 1:
             args += [output_path]
-        return_val = self.execute_run_script(args)
+        return_val = self.execute_run_script(args + ["--no-cache"])
         assert return_val == helpers.ExitCode.SUCCESS
 
         project_name = scratchwebapi.getMetaDataEntry(project_id, "title")
@@ -0,0 +1,107 @@
+#  ScratchToCatrobat: A tool for converting Scratch projects into Catrobat programs.
+#  Copyright (C) 2013-2017 The Catrobat Team
+#  (http://developer.catrobat.org/credits)
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Affero General Public License as
+#  published by the Free Software Foundation, either version 3 of the
+#  License, or (at your option) any later version.
+#
+#  An additional term exception under section 7 of the GNU Affero
+#  General Public License, version 3, is available at
+#  http://developer.catrobat.org/license_additional_term
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU Affero General Public License for more details.
+#
+#  You should have received a copy of the GNU Affero General Public License
+#  along with this program.  If not, see http://www.gnu.org/licenses/.
+import os
+import unittest
+
+from scratchtocatrobat import resultcache
+from scratchtocatrobat.tools import common_testing
+from scratchtocatrobat.tools import helpers
+from scratchtocatrobat.tools import stats
+
+
+class ConversionResultCacheTest(common_testing.BaseTestCase):
+
+    def _cache(self, max_size_in_bytes=1024 * 1024):
+        return resultcache.ConversionResultCache(os.path.join(self.temp_dir, "cache"), max_size_in_bytes)
+
+    def _program_file(self, file_name, size):
+        program_path = os.path.join(self.temp_dir, file_name)
+        with open(program_path, "wb") as fp:
+            fp.write("x" * size)
+        return program_path
+
+    def _project_dir(self, asset_content="asset"):
+        project_dir = os.path.join(self.temp_dir, "project_" + asset_content)
+        os.makedirs(project_dir)
+        with open(os.path.join(project_dir, "0.png"), "w") as fp:
+            fp.write(asset_content)
+        return project_dir
+
+    def test_can_compute_same_key_for_equal_project_code(self):
+        project_dir = self._project_dir()
+        key = resultcache.cache_key_for(project_dir, { "objName": "Stage", "children": [] })
+        assert key == resultcache.cache_key_for(project_dir, { "children": [], "objName": "Stage" })
+        assert key != resultcache.cache_key_for(project_dir, { "children": [], "objName": "Background" })
+        assert key != resultcache.cache_key_for(self._project_dir("other asset"), { "objName": "Stage", "children": [] })
+
+    def test_can_compute_other_key_for_other_converter_settings(self):
+        project_dir = self._project_dir()
+        key = resultcache.cache_key_for(project_dir, { "objName": "Stage", "children": [] })
+        converter_settings = helpers.config.section_items["CONVERTER"]
+        self.addCleanup(converter_settings.__setitem__, "optimize_formulas", converter_settings["optimize_formulas"])
+        converter_settings["optimize_formulas"] = "True" if converter_settings["optimize_formulas"] != "True" else "False"
+        assert key != resultcache.cache_key_for(project_dir, { "objName": "Stage", "children": [] })
+
+    def _output_path_of(self, project_name):
+        return os.path.join(self.temp_dir, "output_" + project_name + ".catrobat")
+
+    def test_can_copy_stored_conversion_result(self):
+        cache = self._cache()
+        conversion_stats = stats.ConversionStats()
+        with stats.recording(conversion_stats):
+            assert cache.copy_to("key", self._output_path_of) is None
+            cache.store("key", self._program_file("program.catrobat", 10), "My Project")
+            output_path = cache.copy_to("key", self._output_path_of)
+
+        assert output_path == self._output_path_of("My Project")
+        assert os.path.getsize(output_path) == 10
+        assert conversion_stats.as_dict()["counters"] == { "resultCacheHits": 1, "resultCacheMisses": 1 }
+        # only the entries themselves are left in the cache directory (no temporary files)
+        assert sorted(os.listdir(cache.cache_dir)) == ["key.catrobat", "key.json"]
+
+    def test_can_treat_entry_evicted_by_other_process_as_miss(self):
+        cache = self._cache()
+        cache.store("key", self._program_file("program.catrobat", 10), "My Project")
+        # the entry info is still there, but the program has been evicted meanwhile
+        os.remove(os.path.join(cache.cache_dir, "key.catrobat"))
+
+        assert cache.copy_to("key", self._output_path_of) is None
+        assert not os.path.exists(self._output_path_of("My Project"))
+
+    def test_can_evict_least_recently_used_conversion_results(self):
+        cache = self._cache(max_size_in_bytes=25)
+        for index, key in enumerate(["first", "second"]):
+            cache.store(key, self._program_file(key + ".catrobat", 10), key)
+            os.utime(os.path.join(cache.cache_dir, key + ".catrobat"), (index, index))
+        # "first" becomes the most recently used entry
+        cache.copy_to("first", self._output_path_of)
+        conversion_stats = stats.ConversionStats()
+        with stats.recording(conversion_stats):
+            cache.store("third", self._program_file("third.catrobat", 10), "third")
+
+        assert cache.copy_to("second", self._output_path_of) is None
+        assert cache.copy_to("first", self._output_path_of) is not None
+        assert cache.copy_to("third", self._output_path_of) is not None
+        assert conversion_stats.as_dict()["counters"] == { "resultCacheEvictions": 1 }
+
+
+if __name__ == "__main__":
+    unittest.main()
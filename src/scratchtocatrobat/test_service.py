@@ -0,0 +1,99 @@
+#  ScratchToCatrobat: A tool for converting Scratch projects into Catrobat programs.
+#  Copyright (C) 2013-2017 The Catrobat Team
+#  (http://developer.catrobat.org/credits)
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Affero General Public License as
+#  published by the Free Software Foundation, either version 3 of the
+#  License, or (at your option) any later version.
+#
+#  An additional term exception under section 7 of the GNU Affero
+#  General Public License, version 3, is available at
+#  http://developer.catrobat.org/license_additional_term
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU Affero General Public License for more details.
+#
+#  You should have received a copy of the GNU Affero General Public License
+#  along with this program.  If not, see http://www.gnu.org/licenses/.
+import functools
+import socket
+import threading
+import unittest
+
+from scratchtocatrobat import main
+from scratchtocatrobat import service
+from scratchtocatrobat.converter import converter
+from scratchtocatrobat.scratch import scratchwebapi
+from scratchtocatrobat.tools import common_testing
+from scratchtocatrobat.tools import helpers
+
+
+class ConversionServiceTest(common_testing.ProjectTestCase):
+
+    def setUp(self):
+        super(ConversionServiceTest, self).setUp()
+        self.server = service.ConversionServer(functools.partial(main.run_converter, use_cache=False), "localhost", 0)
+        self.server_thread = threading.Thread(target=self.server.serve_forever)
+        self.server_thread.daemon = True
+        self.server_thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        super(ConversionServiceTest, self).tearDown()
+
+    def _submit(self, request_line):
+        connection = socket.create_connection(self.server.server_address)
+        try:
+            connection.sendall(request_line)
+            lines = connection.makefile("r").readlines()
+        finally:
+            connection.close()
+        return lines
+
+    def test_can_convert_multiple_projects_with_one_service(self):
+        output_path = self._testresult_folder_path
+        for project_filename, project_id in common_testing.TEST_PROJECT_FILENAME_TO_ID_MAP.iteritems():
+            project_file_path = common_testing.get_test_project_packed_file(project_filename)
+            lines = self._submit(helpers.ConversionServiceProtocol.request_line(project_file_path, output_path))
+            exit_code = helpers.ConversionServiceProtocol.parse_exit_code_line(lines[-1])
+            assert exit_code == helpers.ExitCode.SUCCESS, "".join(lines)
+            assert any(line.startswith(helpers.ProgressBar.START_PROGRESS_INDICATOR) for line in lines)
+
+            project_name = scratchwebapi.getMetaDataEntry(project_id, "title")
+            catrobat_program_path = converter.ConvertedProject._converted_output_path(output_path, project_name)
+            self.assertValidCatrobatProgramPackageAndUnpackIf(catrobat_program_path, project_name)
+
+    def test_can_convert_projects_concurrently_with_separate_output(self):
+        output_path = self._testresult_folder_path
+        project_file_paths = [common_testing.get_test_project_packed_file(project_filename)
+                              for project_filename in common_testing.TEST_PROJECT_FILENAME_TO_ID_MAP][:2]
+        lines_of_project = {}
+
+        def submit(project_file_path):
+            lines_of_project[project_file_path] = self._submit(
+                helpers.ConversionServiceProtocol.request_line(project_file_path, output_path))
+
+        threads = [threading.Thread(target=submit, args=(project_file_path,)) for project_file_path in project_file_paths]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for project_file_path, other_project_file_path in zip(project_file_paths, reversed(project_file_paths)):
+            lines = lines_of_project[project_file_path]
+            exit_code = helpers.ConversionServiceProtocol.parse_exit_code_line(lines[-1])
+            assert exit_code == helpers.ExitCode.SUCCESS, "".join(lines)
+            assert any(project_file_path in line for line in lines)
+            assert not any(other_project_file_path in line for line in lines)
+
+    def test_fail_on_invalid_request(self):
+        lines = self._submit("no json\n")
+        assert helpers.ConversionServiceProtocol.parse_exit_code_line(lines[-1]) == helpers.ExitCode.FAILURE
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -19,7 +19,6 @@
 #  You should have received a copy of the GNU Affero General Public License
 #  along with this program.  If not, see http://www.gnu.org/licenses/.
 import copy
-import hashlib
 import os
 import sys
 import tempfile
@@ -35,6 +34,7 @@ from itertools import repeat
 from itertools import islice
 from scratchtocatrobat.tools import logger
 from scratchtocatrobat.tools import helpers
+from scratchtocatrobat.tools import filedigest
 
 log = logger.log
 
@@ -61,8 +61,7 @@ class ScratchtobatHTTP404Error(ScratchtobatError):
     pass
 
 def md5_hash(input_path):
-    with open(input_path, "rb") as fp:
-        return hashlib.md5(fp.read()).hexdigest()
+    return filedigest.md5_of(input_path)
 
 def makedirs(path):
     if not os.path.exists(path):
@@ -86,11 +85,27 @@ def pad(iterable, size, padding=None):
     return islice(pad_infinite(iterable, padding), size)
 
 class DictAccessWrapper(object):
-    def __init__(self, dict_object):
+    def __init__(self, dict_object, copy_on_write=False):
         if isinstance(dict_object, set):
             dict_object = dict.fromkeys(dict_object, None)
         assert isinstance(dict_object, dict)
-        self._dict_object = copy.deepcopy(dict_object)
+        # copy_on_write: the given dict is shared instead of deep-copied and must not be modified
+        # by the caller anymore. Values are only copied once they get modified via the wrapper.
+        self._is_shared_dict_object = copy_on_write
+        self._shared_keys = set(dict_object.keys()) if copy_on_write else set()
+        self._dict_object = dict_object if copy_on_write else copy.deepcopy(dict_object)
+
+    def _set_value(self, key, value):
+        if self._is_shared_dict_object:
+            self._dict_object = dict(self._dict_object)
+            self._is_shared_dict_object = False
+        self._shared_keys.discard(key)
+        self._dict_object[key] = value
+
+    def _modifiable_value_of(self, key):
+        if key in self._shared_keys:
+            self._set_value(key, copy.deepcopy(self._dict_object[key]))
+        return self._dict_object[key]
 
     def _checked_dict_access(self):
         dict_ = self._dict_access_object()
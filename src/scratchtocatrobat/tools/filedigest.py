@@ -0,0 +1,119 @@
+#  ScratchToCatrobat: A tool for converting Scratch projects into Catrobat programs.
+#  Copyright (C) 2013-2017 The Catrobat Team
+#  (http://developer.catrobat.org/credits)
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Affero General Public License as
+#  published by the Free Software Foundation, either version 3 of the
+#  License, or (at your option) any later version.
+#
+#  An additional term exception under section 7 of the GNU Affero
+#  General Public License, version 3, is available at
+#  http://developer.catrobat.org/license_additional_term
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU Affero General Public License for more details.
+#
+#  You should have received a copy of the GNU Affero General Public License
+#  along with this program.  If not, see http://www.gnu.org/licenses/.
+
+"""
+  MD5 digests of project files.
+  Files are hashed in chunks and every digest is remembered by path, size and
+  modification time, so that each file of a project only gets read once, no matter
+  how many parts of the converter ask for its digest.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from scratchtocatrobat.tools import helpers
+from scratchtocatrobat.tools import stats
+
+CHUNK_SIZE_IN_BYTES = 64 * 1024
+MAX_NUMBER_OF_REMEMBERED_DIGESTS = 10000
+MAX_CONCURRENT_THREADS = int(helpers.config.get("CONVERTER", "max_concurrent_digest_threads"))
+
+_digests = OrderedDict()
+_digests_lock = threading.Lock()
+
+
+def _digest_key_of(file_path):
+    file_stat = os.stat(file_path)
+    return (os.path.abspath(file_path), file_stat.st_size, file_stat.st_mtime)
+
+
+def _remember(digest_key, digest):
+    with _digests_lock:
+        _digests.pop(digest_key, None)
+        _digests[digest_key] = digest
+        while len(_digests) > MAX_NUMBER_OF_REMEMBERED_DIGESTS:
+            _digests.popitem(last=False)
+
+
+def _computed_md5_of(file_path):
+    file_hash = hashlib.md5()
+    with open(file_path, "rb") as fp:
+        for chunk in iter(lambda: fp.read(CHUNK_SIZE_IN_BYTES), b""):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+def md5_of(file_path):
+    digest_key = _digest_key_of(file_path)
+    with _digests_lock:
+        digest = _digests.get(digest_key)
+    if digest is not None:
+        stats.increment("fileDigestHits")
+        return digest
+    stats.increment("fileDigestMisses")
+    digest = _computed_md5_of(file_path)
+    _remember(digest_key, digest)
+    return digest
+
+
+def remember_md5_of(file_path, digest):
+    # for files whose digest is already known, e.g. files extracted from an archive
+    _remember(_digest_key_of(file_path), digest)
+
+
+def md5_of_all(file_paths, max_concurrent_threads=MAX_CONCURRENT_THREADS):
+    file_paths = list(file_paths)
+    number_of_threads = max(1, min(max_concurrent_threads, len(file_paths)))
+    if number_of_threads == 1:
+        return dict((file_path, md5_of(file_path)) for file_path in file_paths)
+
+    conversion_stats = stats.current()
+    digests = {}
+    errors = []
+
+    def hash_files(file_paths_of_thread):
+        try:
+            with stats.attached(conversion_stats):
+                for file_path in file_paths_of_thread:
+                    digests[file_path] = md5_of(file_path)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=hash_files, args=(file_paths[index::number_of_threads],))
+               for index in range(number_of_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if len(errors) > 0:
+        raise errors[0]
+    return digests
+
+
+def file_renamed(old_file_path, new_file_path):
+    # renaming keeps size and modification time -> digest stays valid for the new path
+    _, file_size, modification_time = _digest_key_of(new_file_path)
+    with _digests_lock:
+        digest = _digests.pop((os.path.abspath(old_file_path), file_size, modification_time), None)
+    if digest is not None:
+        _remember((os.path.abspath(new_file_path), file_size, modification_time), digest)
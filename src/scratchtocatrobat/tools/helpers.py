@@ -28,7 +28,6 @@ import ConfigParser
 import re
 import urllib2, json
 import progressbar
-import hashlib
 from functools import wraps
 
 ################################################################################
@@ -368,13 +367,6 @@ def isfloat(string):
     else:
         return True
 
-def md5_of_file(file_path):
-    file_hash = hashlib.md5()
-    with open(file_path, "rb") as f:
-        for chunk in iter(lambda: f.read(4096), b""):
-            file_hash.update(chunk)
-    return file_hash.hexdigest()
-
 
 class ProgressType(object):
     DOWNLOAD_CODE = 1
@@ -466,3 +458,61 @@ class ProgressBar(object):
             self._output_stream.write("{}{}{}\n".format(ProgressBar.START_PROGRESS_INDICATOR, \
                                                       round(percentage, 2), \
                                                       ProgressBar.END_PROGRESS_INDICATOR))
+
+
+class ConversionServiceProtocol(object):
+    """
+    Line based protocol spoken between the resident conversion service and its clients.
+    The client sends one JSON encoded request line and receives the converter output
+    (i.e. progress lines and log messages) followed by a final exit code line.
+    """
+
+    KEY_URL = "url"
+    KEY_OUTPUT_DIR = "outputDir"
+    KEY_ARCHIVE_NAME = "archiveName"
+    KEY_WEB_MODE = "webMode"
+
+    START_EXIT_CODE_INDICATOR = "#__exit("
+    END_EXIT_CODE_INDICATOR = ")__"
+
+    @classmethod
+    def request_line(cls, url, output_dir, archive_name=None, web_mode=True):
+        return json.dumps({ cls.KEY_URL: url, cls.KEY_OUTPUT_DIR: output_dir,
+                            cls.KEY_ARCHIVE_NAME: archive_name, cls.KEY_WEB_MODE: web_mode }) + "\n"
+
+    @classmethod
+    def exit_code_line(cls, exit_code):
+        return "{}{}{}\n".format(cls.START_EXIT_CODE_INDICATOR, exit_code, cls.END_EXIT_CODE_INDICATOR)
+
+    @classmethod
+    def parse_exit_code_line(cls, line):
+        line = line.rstrip()
+        if not (line.startswith(cls.START_EXIT_CODE_INDICATOR) and line.endswith(cls.END_EXIT_CODE_INDICATOR)):
+            return None
+        exit_code = line[len(cls.START_EXIT_CODE_INDICATOR):-len(cls.END_EXIT_CODE_INDICATOR)]
+        return int(exit_code) if exit_code.isdigit() else ExitCode.FAILURE
+
+
+class ConversionStatsProtocol(object):
+    """
+    In web mode the converter reports the statistics of a conversion (see tools/stats.py)
+    as one JSON encoded line in its output.
+    """
+
+    START_STATS_INDICATOR = "#__stats("
+    END_STATS_INDICATOR = ")__"
+
+    @classmethod
+    def stats_line(cls, stats_dict):
+        return "{}{}{}\n".format(cls.START_STATS_INDICATOR, json.dumps(stats_dict, sort_keys=True),
+                                 cls.END_STATS_INDICATOR)
+
+    @classmethod
+    def parse_stats_line(cls, line):
+        line = line.rstrip()
+        if not (line.startswith(cls.START_STATS_INDICATOR) and line.endswith(cls.END_STATS_INDICATOR)):
+            return None
+        try:
+            return json.loads(line[len(cls.START_STATS_INDICATOR):-len(cls.END_STATS_INDICATOR)])
+        except ValueError:
+            return None
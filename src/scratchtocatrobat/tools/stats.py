@@ -0,0 +1,202 @@
+#  ScratchToCatrobat: A tool for converting Scratch projects into Catrobat programs.
+#  Copyright (C) 2013-2017 The Catrobat Team
+#  (http://developer.catrobat.org/credits)
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Affero General Public License as
+#  published by the Free Software Foundation, either version 3 of the
+#  License, or (at your option) any later version.
+#
+#  An additional term exception under section 7 of the GNU Affero
+#  General Public License, version 3, is available at
+#  http://developer.catrobat.org/license_additional_term
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU Affero General Public License for more details.
+#
+#  You should have received a copy of the GNU Affero General Public License
+#  along with this program.  If not, see http://www.gnu.org/licenses/.
+
+"""
+  Per-phase statistics of a conversion.
+  For each phase the wall time, the CPU time of the process and the high-water mark of
+  the JVM heap are recorded. Phases are measured by the thread running the conversion,
+  i.e. the statistics of concurrent conversions within the same process are kept apart,
+  but CPU time and heap usage are process-wide figures. The heap high-water mark is the
+  maximum of the used heap sampled while the phase is open (the peak usage of the JVM
+  memory pools is never reset, since concurrent conversions would reset each other's peaks).
+"""
+
+import contextlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from java.lang.management import ManagementFactory
+
+DOWNLOAD = "download"
+EXTRACT = "extract"
+METADATA = "metadata"
+JSON_LOAD = "jsonLoad"
+PREPROCESS = "preprocess"
+SCRIPTS = "scripts"
+MEDIA = "media"
+SERIALIZATION = "serialization"
+ZIP = "zip"
+
+HEAP_SAMPLING_INTERVAL_IN_SECONDS = 0.05
+
+_current = threading.local()
+
+
+def _cpu_time():
+    user_time, system_time = os.times()[:2]
+    return user_time + system_time
+
+
+def _used_heap():
+    return ManagementFactory.getMemoryMXBean().getHeapMemoryUsage().getUsed()
+
+
+class _HeapSampler(threading.Thread):
+    # one thread per process samples the used heap for all phases currently open
+
+    def __init__(self):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self._lock = threading.Lock()
+        self._high_water_marks = {}
+
+    def _sample(self):
+        # must hold the lock
+        used_heap = _used_heap()
+        for measurement, high_water_mark in self._high_water_marks.items():
+            self._high_water_marks[measurement] = max(high_water_mark, used_heap)
+
+    def open_measurement(self):
+        measurement = object()
+        with self._lock:
+            self._high_water_marks[measurement] = 0
+            self._sample()
+        return measurement
+
+    def close_measurement(self, measurement):
+        with self._lock:
+            self._sample()
+            return self._high_water_marks.pop(measurement)
+
+    def run(self):
+        while True:
+            time.sleep(HEAP_SAMPLING_INTERVAL_IN_SECONDS)
+            with self._lock:
+                if len(self._high_water_marks) > 0:
+                    self._sample()
+
+
+_heap_sampler = None
+_heap_sampler_lock = threading.Lock()
+
+
+def _started_heap_sampler():
+    global _heap_sampler
+    with _heap_sampler_lock:
+        if _heap_sampler is None:
+            _heap_sampler = _HeapSampler()
+            _heap_sampler.start()
+    return _heap_sampler
+
+
+class ConversionStats(object):
+
+    def __init__(self, source=None):
+        self.source = source
+        self._lock = threading.Lock()
+        self._phases = OrderedDict()
+        self._counters = OrderedDict()
+        self._start_time = time.time()
+        self._end_time = None
+
+    def add_phase_measurement(self, phase_name, wall_time, cpu_time, heap_high_water_mark):
+        with self._lock:
+            if phase_name not in self._phases:
+                self._phases[phase_name] = { "calls": 0, "wallTimeSeconds": 0.0, "cpuTimeSeconds": 0.0,
+                                             "heapHighWaterMarkBytes": 0 }
+            phase = self._phases[phase_name]
+            phase["calls"] += 1
+            phase["wallTimeSeconds"] += wall_time
+            phase["cpuTimeSeconds"] += cpu_time
+            phase["heapHighWaterMarkBytes"] = max(phase["heapHighWaterMarkBytes"], heap_high_water_mark)
+
+    def increment(self, counter_name, value=1):
+        with self._lock:
+            self._counters[counter_name] = self._counters.get(counter_name, 0) + value
+
+    def finish(self):
+        self._end_time = time.time()
+
+    def as_dict(self):
+        with self._lock:
+            end_time = self._end_time if self._end_time is not None else time.time()
+            return {
+                "source": self.source,
+                "totalWallTimeSeconds": end_time - self._start_time,
+                "phases": OrderedDict((name, dict(phase)) for name, phase in self._phases.iteritems()),
+                "counters": dict(self._counters)
+            }
+
+    def write_to(self, file_path):
+        with open(file_path, "w") as fp:
+            json.dump(self.as_dict(), fp, indent=4)
+
+
+def current():
+    return getattr(_current, "stats", None)
+
+
+@contextlib.contextmanager
+def recording(conversion_stats):
+    previous_stats = current()
+    _current.stats = conversion_stats
+    try:
+        yield conversion_stats
+    finally:
+        _current.stats = previous_stats
+        conversion_stats.finish()
+
+
+@contextlib.contextmanager
+def attached(conversion_stats):
+    # lets a helper thread record into the statistics of the conversion it works for
+    previous_stats = current()
+    _current.stats = conversion_stats
+    try:
+        yield conversion_stats
+    finally:
+        _current.stats = previous_stats
+
+
+@contextlib.contextmanager
+def phase(phase_name):
+    conversion_stats = current()
+    if conversion_stats is None:
+        yield
+        return
+
+    heap_sampler = _started_heap_sampler()
+    heap_measurement = heap_sampler.open_measurement()
+    start_wall_time, start_cpu_time = time.time(), _cpu_time()
+    try:
+        yield
+    finally:
+        conversion_stats.add_phase_measurement(phase_name, time.time() - start_wall_time,
+                                               _cpu_time() - start_cpu_time,
+                                               heap_sampler.close_measurement(heap_measurement))
+
+
+def increment(counter_name, value=1):
+    conversion_stats = current()
+    if conversion_stats is not None:
+        conversion_stats.increment(counter_name, value)
@@ -67,6 +67,18 @@ class DictAccessWrapperTest(common_testing.BaseTestCase):
         test_dict[test_key] = "changed"
         assert value_before_dict_change == dict_wrapper[test_key]
 
+    def test_can_share_dict_content_and_copy_it_on_write(self):
+        test_dict = { "values": [1, 2], "other_values": [3] }
+        dict_wrapper = common.DictAccessWrapper(test_dict, copy_on_write=True)
+        assert dict_wrapper["values"] is test_dict["values"]
+
+        dict_wrapper._modifiable_value_of("values").append(3)
+        dict_wrapper._set_value("new_values", [4])
+        assert dict_wrapper["values"] == [1, 2, 3]
+        assert dict_wrapper["new_values"] == [4]
+        assert dict_wrapper["other_values"] is test_dict["other_values"]
+        assert test_dict == { "values": [1, 2], "other_values": [3] }
+
 
 class CommonTest(common_testing.BaseTestCase):
 
@@ -0,0 +1,85 @@
+#  ScratchToCatrobat: A tool for converting Scratch projects into Catrobat programs.
+#  Copyright (C) 2013-2017 The Catrobat Team
+#  (http://developer.catrobat.org/credits)
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Affero General Public License as
+#  published by the Free Software Foundation, either version 3 of the
+#  License, or (at your option) any later version.
+#
+#  An additional term exception under section 7 of the GNU Affero
+#  General Public License, version 3, is available at
+#  http://developer.catrobat.org/license_additional_term
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU Affero General Public License for more details.
+#
+#  You should have received a copy of the GNU Affero General Public License
+#  along with this program.  If not, see http://www.gnu.org/licenses/.
+
+import hashlib
+import os
+import unittest
+
+from scratchtocatrobat.tools import common
+from scratchtocatrobat.tools import common_testing
+from scratchtocatrobat.tools import filedigest
+from scratchtocatrobat.tools import stats
+
+
+def _create_file(file_path, content):
+    with open(file_path, "wb") as fp:
+        fp.write(content)
+    return file_path
+
+
+class FileDigestTest(common_testing.BaseTestCase):
+
+    def test_can_compute_md5_of_file_larger_than_chunk_size(self):
+        content = os.urandom(filedigest.CHUNK_SIZE_IN_BYTES * 2 + 123)
+        with common.TemporaryDirectory() as temp_dir:
+            file_path = _create_file(os.path.join(temp_dir, "large.png"), content)
+            assert filedigest.md5_of(file_path) == hashlib.md5(content).hexdigest()
+            assert common.md5_hash(file_path) == hashlib.md5(content).hexdigest()
+
+    def test_can_hash_each_file_only_once(self):
+        conversion_stats = stats.ConversionStats()
+        with common.TemporaryDirectory() as temp_dir, stats.recording(conversion_stats):
+            file_path = _create_file(os.path.join(temp_dir, "a.wav"), "sound")
+            filedigest.md5_of(file_path)
+            filedigest.md5_of(file_path)
+        assert conversion_stats.as_dict()["counters"] == { "fileDigestMisses": 1, "fileDigestHits": 1 }
+
+    def test_can_detect_modified_file(self):
+        with common.TemporaryDirectory() as temp_dir:
+            file_path = _create_file(os.path.join(temp_dir, "a.png"), "image")
+            filedigest.md5_of(file_path)
+            _create_file(file_path, "modified image")
+            assert filedigest.md5_of(file_path) == hashlib.md5("modified image").hexdigest()
+
+    def test_can_hash_files_concurrently(self):
+        conversion_stats = stats.ConversionStats()
+        with common.TemporaryDirectory() as temp_dir, stats.recording(conversion_stats):
+            file_paths = [_create_file(os.path.join(temp_dir, "{}.png".format(index)), str(index) * 1000)
+                          for index in range(20)]
+            digests = filedigest.md5_of_all(file_paths, max_concurrent_threads=4)
+        assert digests == dict((file_path, hashlib.md5(str(index) * 1000).hexdigest())
+                               for index, file_path in enumerate(file_paths))
+        assert conversion_stats.as_dict()["counters"] == { "fileDigestMisses": 20 }
+
+    def test_can_keep_digest_of_renamed_file(self):
+        conversion_stats = stats.ConversionStats()
+        with common.TemporaryDirectory() as temp_dir, stats.recording(conversion_stats):
+            file_path = _create_file(os.path.join(temp_dir, "a.svg"), "<svg/>")
+            digest = filedigest.md5_of(file_path)
+            new_file_path = os.path.join(temp_dir, digest + ".svg")
+            os.rename(file_path, new_file_path)
+            filedigest.file_renamed(file_path, new_file_path)
+            assert filedigest.md5_of(new_file_path) == digest
+        assert conversion_stats.as_dict()["counters"] == { "fileDigestMisses": 1, "fileDigestHits": 1 }
+
+
+if __name__ == "__main__":
+    unittest.main()
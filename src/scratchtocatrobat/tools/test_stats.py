@@ -0,0 +1,98 @@
+#  ScratchToCatrobat: A tool for converting Scratch projects into Catrobat programs.
+#  Copyright (C) 2013-2017 The Catrobat Team
+#  (http://developer.catrobat.org/credits)
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Affero General Public License as
+#  published by the Free Software Foundation, either version 3 of the
+#  License, or (at your option) any later version.
+#
+#  An additional term exception under section 7 of the GNU Affero
+#  General Public License, version 3, is available at
+#  http://developer.catrobat.org/license_additional_term
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU Affero General Public License for more details.
+#
+#  You should have received a copy of the GNU Affero General Public License
+#  along with this program.  If not, see http://www.gnu.org/licenses/.
+
+import json
+import os
+import time
+import unittest
+
+from scratchtocatrobat.tools import common
+from scratchtocatrobat.tools import common_testing
+from scratchtocatrobat.tools import helpers
+from scratchtocatrobat.tools import stats
+
+
+class ConversionStatsTest(common_testing.BaseTestCase):
+
+    def test_can_record_phases(self):
+        conversion_stats = stats.ConversionStats("test_project.sb2")
+        with stats.recording(conversion_stats):
+            with stats.phase(stats.SCRIPTS):
+                [str(number) for number in range(10000)]
+            with stats.phase(stats.SCRIPTS):
+                pass
+            with stats.phase(stats.ZIP):
+                pass
+            stats.increment("cacheHits")
+        assert stats.current() is None
+
+        stats_dict = conversion_stats.as_dict()
+        assert stats_dict["source"] == "test_project.sb2"
+        assert stats_dict["phases"].keys() == [stats.SCRIPTS, stats.ZIP]
+        assert stats_dict["phases"][stats.SCRIPTS]["calls"] == 2
+        assert stats_dict["counters"] == { "cacheHits": 1 }
+        for phase in stats_dict["phases"].values():
+            assert phase["wallTimeSeconds"] >= 0.0
+            assert phase["cpuTimeSeconds"] >= 0.0
+            assert phase["heapHighWaterMarkBytes"] > 0
+        assert stats_dict["totalWallTimeSeconds"] >= stats_dict["phases"][stats.SCRIPTS]["wallTimeSeconds"]
+
+    def test_can_record_heap_high_water_mark_of_overlapping_phases(self):
+        outer_stats, inner_stats = stats.ConversionStats(), stats.ConversionStats()
+        with stats.recording(outer_stats), stats.phase(stats.SCRIPTS):
+            with stats.recording(inner_stats), stats.phase(stats.MEDIA):
+                # allocated while both phases are open -> part of both high-water marks
+                data = [str(number) for number in range(100000)]
+                time.sleep(3 * stats.HEAP_SAMPLING_INTERVAL_IN_SECONDS)
+            del data
+        inner_high_water_mark = inner_stats.as_dict()["phases"][stats.MEDIA]["heapHighWaterMarkBytes"]
+        outer_high_water_mark = outer_stats.as_dict()["phases"][stats.SCRIPTS]["heapHighWaterMarkBytes"]
+        assert inner_high_water_mark > 0
+        # the inner phase did not reset what the outer phase had measured so far
+        assert outer_high_water_mark >= inner_high_water_mark
+
+    def test_can_not_record_phases_outside_of_recording(self):
+        conversion_stats = stats.ConversionStats()
+        with stats.phase(stats.SCRIPTS):
+            stats.increment("cacheHits")
+        assert conversion_stats.as_dict()["phases"] == {}
+        assert stats.current() is None
+
+    def test_can_write_stats_file(self):
+        conversion_stats = stats.ConversionStats()
+        with stats.recording(conversion_stats):
+            with stats.phase(stats.MEDIA):
+                pass
+        with common.TemporaryDirectory() as temp_dir:
+            stats_file_path = os.path.join(temp_dir, "stats.json")
+            conversion_stats.write_to(stats_file_path)
+            with open(stats_file_path) as fp:
+                assert json.load(fp)["phases"][stats.MEDIA]["calls"] == 1
+
+    def test_can_parse_stats_line(self):
+        stats_dict = { "source": "1234", "phases": { stats.ZIP: { "calls": 1 } } }
+        stats_line = helpers.ConversionStatsProtocol.stats_line(stats_dict)
+        assert helpers.ConversionStatsProtocol.parse_stats_line(stats_line) == stats_dict
+        assert helpers.ConversionStatsProtocol.parse_stats_line("#__(12.5%)__") is None
+
+
+if __name__ == "__main__":
+    unittest.main()
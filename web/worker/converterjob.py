@@ -20,8 +20,9 @@
 #  along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 """
-  This module implements a simple job that is run by a worker process and invokes the
-  converter run as child process.
+  This module implements a simple job that is run by a worker process and submits the
+  conversion to the resident conversion service (see scratchtocatrobat.service).
+  In case the service is disabled or not reachable, the converter is run as child process.
   The Job Handler is used to notify the scheduling-webserver (via a TCP connection).
   The scheduling-webserver maintains all websocket connections to the users and can
   further notify the users about the progress of the currently running job.
@@ -64,6 +65,55 @@ BUFFER_SIZE = int(helpers.config.get("CONVERTER_JOB", "buffer_size"))
 CERTIFICATE_PATH = helpers.config.get("JOBMONITOR_SERVER", "certificate_path")
 CATROBAT_FILE_EXT = helpers.config.get("CATROBAT", "file_extension")
 LINE_BUFFER_SIZE = 3
+CONVERTER_SERVICE_ENABLED = str(helpers.config.get("CONVERTER_SERVICE", "enabled")) in {"True", "1"}
+CONVERTER_SERVICE_HOST = helpers.config.get("CONVERTER_SERVICE", "host")
+CONVERTER_SERVICE_PORT = int(helpers.config.get("CONVERTER_SERVICE", "port"))
+
+
+class _ConversionServiceProcess(object):
+    """
+    Mimics the interface of subprocess.Popen used by run_job (i.e. stdout.readline() and wait()),
+    but talks to the resident conversion service instead of a child process.
+    """
+
+    def __init__(self, url, output_dir, archive_name):
+        self._socket = socket.create_connection((CONVERTER_SERVICE_HOST, CONVERTER_SERVICE_PORT))
+        self._socket.sendall(helpers.ConversionServiceProtocol.request_line(url, output_dir, archive_name))
+        self._reader = self._socket.makefile("r")
+        self._exit_code = None
+        self.stdout = self
+
+    def readline(self):
+        if self._exit_code is not None:
+            return ''
+        line = self._reader.readline()
+        if line == '':
+            # service died during conversion
+            self._exit_code = helpers.ExitCode.FAILURE
+            return ''
+        exit_code = helpers.ConversionServiceProtocol.parse_exit_code_line(line.rstrip())
+        if exit_code is not None:
+            self._exit_code = exit_code
+            return ''
+        return line
+
+    def wait(self):
+        while self._exit_code is None:
+            self.readline()
+        self._reader.close()
+        self._socket.close()
+        return self._exit_code
+
+
+def _start_conversion(url, output_dir, archive_name):
+    if CONVERTER_SERVICE_ENABLED:
+        try:
+            return _ConversionServiceProcess(url, output_dir, archive_name)
+        except socket.error as e:
+            _logger.warn("[%s]: Conversion service at %s:%d not reachable (%s). Spawning converter process instead."
+                         % (CLIENT, CONVERTER_SERVICE_HOST, CONVERTER_SERVICE_PORT, e))
+    exec_args = ["/usr/bin/env", "python", CONVERTER_RUN_SCRIPT_PATH, url, output_dir, archive_name, "--web-mode"]
+    return subprocess.Popen(exec_args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
 
 
 class ConverterJobHandler(jobhandler.JobHandler):
@@ -77,9 +127,7 @@ class ConverterJobHandler(jobhandler.JobHandler):
         assert isinstance(args["outputDir"], (str, unicode))
         job_ID, title, image_URL = args["jobID"], args["title"], args["imageURL"]
 
-        exec_args = ["/usr/bin/env", "python", CONVERTER_RUN_SCRIPT_PATH,
-                     args["url"], args["outputDir"], str(args["jobID"]), "--web-mode"]
-        process = subprocess.Popen(exec_args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        process = _start_conversion(args["url"], args["outputDir"], str(args["jobID"]))
         yield self.send_job_started_notification(job_ID, title, image_URL)
 
         start_progr_indicator = helpers.ProgressBar.START_PROGRESS_INDICATOR
@@ -107,6 +155,12 @@ class ConverterJobHandler(jobhandler.JobHandler):
                     yield self.send_job_progress_notification(job_ID, progress)
                 continue
 
+            # case: conversion statistics (only logged, not forwarded to the client)
+            conversion_stats = helpers.ConversionStatsProtocol.parse_stats_line(line)
+            if conversion_stats is not None:
+                _logger.info("[%s]: Conversion statistics: %s" % (CLIENT, json.dumps(conversion_stats, sort_keys=True)))
+                continue
+
             # case: console output
             _logger.debug("[%s]: %s" % (CLIENT, line))
             line_buffer += [line]